@@ -1,13 +1,27 @@
 """
 Cache Manager Service
-Implements intelligent query caching with TTL and LRU eviction
+Implements intelligent query caching with TTL and LRU eviction, plus embedding caches
 """
 
-from typing import Dict, Any, Optional
+import numpy as np
+from typing import Dict, Any, List, Optional
 from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+import json
 import logging
 import hashlib
+import os
+import re
+import threading
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+from api.services.vector_index import EmbeddingMatrix
 
 logger = logging.getLogger(__name__)
 
@@ -265,4 +279,251 @@ class QueryCache:
                 'expires_at': entry['expires_at'].isoformat()
             })
         
-        return export_data
\ No newline at end of file
+        return export_data
+
+
+class QueryEmbeddingCache:
+    """
+    Bounded LRU cache of query embeddings.
+    
+    Keys are normalized (lowercased, whitespace collapsed) so trivially
+    different spellings of the same query share one model encode. Unlike
+    QueryCache entries never expire: an embedding only depends on the
+    query text and the model. Safe to use from executor threads.
+    """
+    
+    def __init__(self, max_size: int = 1024):
+        """
+        Args:
+            max_size: Maximum number of cached embeddings (0 disables caching)
+        """
+        self.max_size = max_size
+        self.cache = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+    
+    @staticmethod
+    def normalize(query: str) -> str:
+        """Normalize a query for use as a cache key"""
+        return re.sub(r'\s+', ' ', query.lower()).strip()
+    
+    def get(self, query: str) -> Optional[Any]:
+        """Return the cached embedding for a query, or None"""
+        key = self.normalize(query)
+        with self._lock:
+            embedding = self.cache.get(key)
+            if embedding is None:
+                self.misses += 1
+                return None
+            self.cache.move_to_end(key)
+            self.hits += 1
+            return embedding
+    
+    def set(self, query: str, embedding: Any) -> None:
+        """Cache an embedding, evicting the least recently used entry if full"""
+        if self.max_size <= 0:
+            return
+        
+        key = self.normalize(query)
+        with self._lock:
+            self.cache[key] = embedding
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.max_size:
+                self.cache.popitem(last=False)
+    
+    def clear(self) -> None:
+        with self._lock:
+            self.cache.clear()
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total * 100, 2) if total else 0.0,
+            'current_size': len(self.cache),
+            'max_size': self.max_size
+        }
+
+
+class ChunkEmbeddingCache:
+    """
+    Content-addressed store of chunk embeddings.
+    
+    Entries are keyed by the SHA-256 of the model name and chunk text, so a
+    re-uploaded document or boilerplate repeated across documents is only
+    embedded once. Vectors are held normalized in an EmbeddingMatrix.
+    
+    With a `path` the cache is also persisted as fixed-size records
+    (32-byte key + float32 vector) appended to `<path>/records.bin`; a
+    torn trailing record left by a crash is ignored on load and cut off
+    before the next append. Worker processes sharing the directory append
+    under an exclusive file lock, so their records never interleave.
+    Switching to a model with another embedding dimension discards the
+    cached entries, in memory and on disk, and starts the cache afresh.
+    """
+    
+    KEY_BYTES = 32
+    
+    def __init__(self, model_name: str = "", path: Optional[str] = None, max_entries: int = 200000):
+        """
+        Args:
+            model_name: Embedding model name, mixed into every key
+            path: Directory to persist entries in (None = memory only)
+            max_entries: Entries kept; once full, new chunks are embedded but not cached
+        """
+        self.model_name = model_name
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._rows: Dict[bytes, int] = {}
+        self._vectors = EmbeddingMatrix(initial_capacity=256)
+        self._lock = threading.Lock()
+        
+        if path:
+            os.makedirs(path, exist_ok=True)
+            self._load()
+    
+    def __len__(self) -> int:
+        return len(self._rows)
+    
+    @property
+    def nbytes(self) -> int:
+        return self._vectors.nbytes
+    
+    def key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode('utf-8')).digest()
+    
+    def get_many(self, texts: List[str]) -> List[Optional[np.ndarray]]:
+        """Cached (normalized) embedding for each text, None where missing"""
+        keys = [self.key(text) for text in texts]
+        with self._lock:
+            rows = [self._rows.get(key) for key in keys]
+            vectors = self._vectors.vectors
+            found = [None if row is None else vectors[row].copy() for row in rows]
+            hits = sum(v is not None for v in found)
+            self.hits += hits
+            self.misses += len(found) - hits
+        return found
+    
+    def add_many(self, texts: List[str], embeddings) -> None:
+        """Cache embeddings for texts not seen before"""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if not len(embeddings):
+            return
+        with self._lock:
+            if self._vectors.dim not in (None, embeddings.shape[1]):
+                logger.warning(f"Chunk embeddings changed dimension from {self._vectors.dim} to "
+                               f"{embeddings.shape[1]}; discarding {len(self._rows)} cached entries")
+                self._rows = {}
+                self._vectors = EmbeddingMatrix(initial_capacity=256)
+            
+            keys, vectors = [], []
+            for text, embedding in zip(texts, embeddings):
+                key = self.key(text)
+                if key in self._rows or len(self._rows) + len(keys) >= self.max_entries:
+                    continue
+                keys.append(key)
+                vectors.append(embedding)
+            if not keys:
+                return
+            
+            rows = self._vectors.append(vectors)
+            for key, row in zip(keys, rows):
+                self._rows[key] = row
+            if self.path:
+                self._persist(keys, self._vectors.vectors[rows.start:rows.stop])
+    
+    def _records_path(self) -> str:
+        return os.path.join(self.path, 'records.bin')
+    
+    def _record_dtype(self, dim: int) -> np.dtype:
+        return np.dtype([('key', np.uint8, self.KEY_BYTES), ('vector', np.float32, dim)])
+    
+    @contextmanager
+    def _locked(self):
+        """Exclusive inter-process lock for writers"""
+        with open(os.path.join(self.path, 'cache.lock'), 'a') as lock_file:
+            if FCNTL_AVAILABLE:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if FCNTL_AVAILABLE:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def _meta_path(self) -> str:
+        return os.path.join(self.path, 'meta.json')
+    
+    def _write_meta(self, dim: int) -> None:
+        # Written aside and renamed, so a loading process never reads it half-written
+        meta_path = self._meta_path()
+        with open(meta_path + '.tmp', 'w') as f:
+            json.dump({'dim': dim}, f)
+        os.replace(meta_path + '.tmp', meta_path)
+    
+    def _read_dim(self) -> Optional[int]:
+        try:
+            with open(self._meta_path()) as f:
+                return json.load(f)['dim']
+        except FileNotFoundError:
+            return None
+    
+    def _load(self) -> None:
+        # Locked so a writer switching dimension cannot swap meta.json and records under us
+        with self._locked():
+            dim = self._read_dim()
+            if dim is None:
+                return
+            try:
+                with open(self._records_path(), 'rb') as f:
+                    data = f.read()
+            except FileNotFoundError:
+                logger.warning(f"Chunk embedding cache at {self.path} has no records file; starting empty")
+                return
+        
+        record = self._record_dtype(dim)
+        records = np.frombuffer(data, dtype=record, count=len(data) // record.itemsize)
+        records = records[:self.max_entries]
+        
+        rows = self._vectors.append(records['vector'])
+        for key, row in zip(records['key'], rows):
+            self._rows[key.tobytes()] = row
+        logger.info(f"Chunk embedding cache loaded {len(self._rows)} entries from {self.path}")
+    
+    def _persist(self, keys: List[bytes], vectors: np.ndarray) -> None:
+        record = self._record_dtype(vectors.shape[1])
+        block = np.empty(len(keys), dtype=record)
+        block['key'] = np.frombuffer(b''.join(keys), dtype=np.uint8).reshape(len(keys), self.KEY_BYTES)
+        block['vector'] = vectors
+        
+        with self._locked():
+            dim = self._read_dim()
+            if dim != vectors.shape[1]:
+                if dim is not None:
+                    logger.warning(f"Discarding chunk embedding cache records of dimension {dim} at {self.path}")
+                with open(self._records_path(), 'wb'):
+                    pass
+                self._write_meta(vectors.shape[1])
+            
+            with open(self._records_path(), 'ab') as f:
+                # Drop a torn record left by a crash so later records stay aligned
+                size = f.seek(0, os.SEEK_END)
+                if size % record.itemsize:
+                    f.truncate(size - size % record.itemsize)
+                f.write(block.tobytes())
+    
+    def get_statistics(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        total = self.hits + self.misses
+        return {
+            'entries': len(self._rows),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'dedup_ratio': round(self.hits / total, 4) if total else 0.0,
+            'persistent': bool(self.path)
+        }
@@ -0,0 +1,142 @@
+"""
+Chunk Table Service
+Columnar storage for chunk records: integer columns and one UTF-8 text arena
+"""
+
+from collections.abc import Sequence
+from typing import Any, Dict, Iterable
+
+import numpy as np
+
+
+class ChunkRecord:
+    """
+    One chunk, materialized on access. The chunk id is not stored; it is
+    derived from the document id and chunk index when needed.
+    """
+
+    __slots__ = ('doc_ord', 'chunk_index', 'text')
+
+    def __init__(self, doc_ord: int, chunk_index: int, text: str):
+        self.doc_ord = doc_ord
+        self.chunk_index = chunk_index
+        self.text = text
+
+    @classmethod
+    def from_dict(cls, record: Dict[str, Any]) -> 'ChunkRecord':
+        return cls(record['doc_ord'], record['chunk_index'], record['text'])
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {'doc_ord': self.doc_ord, 'chunk_index': self.chunk_index, 'text': self.text}
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, ChunkRecord) and \
+            (self.doc_ord, self.chunk_index, self.text) == (other.doc_ord, other.chunk_index, other.text)
+
+    def __repr__(self) -> str:
+        return f"ChunkRecord(doc_ord={self.doc_ord}, chunk_index={self.chunk_index}, text={self.text[:40]!r})"
+
+
+class ChunkTable(Sequence):
+    """
+    Append-only columnar table of chunk records.
+
+    Document ordinals and chunk indexes are int32 columns. All texts are
+    encoded back to back in one UTF-8 byte arena, and row i spans
+    arena[offsets[i]:offsets[i + 1]]. A million chunks cost a few arrays
+    instead of a million dicts and strings. Rows are returned as ChunkRecords
+    built on access.
+
+    Rows are immutable once appended, and the row count is published after
+    the row's data is written. A reader that stays below a length it has
+    already seen can run alongside a writer that appends.
+    """
+
+    __slots__ = ('_doc_ords', '_chunk_indexes', '_offsets', '_arena', '_size')
+
+    def __init__(self, initial_capacity: int = 1024, initial_arena: int = 1 << 16):
+        self._doc_ords = np.empty(initial_capacity, dtype=np.int32)
+        self._chunk_indexes = np.empty(initial_capacity, dtype=np.int32)
+        self._offsets = np.zeros(initial_capacity + 1, dtype=np.int64)
+        self._arena = np.empty(initial_arena, dtype=np.uint8)
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def __getitem__(self, row: int) -> ChunkRecord:
+        if row < 0:
+            row += self._size
+        if not 0 <= row < self._size:
+            raise IndexError("chunk row out of range")
+        return ChunkRecord(int(self._doc_ords[row]), int(self._chunk_indexes[row]), self.text(row))
+
+    def text(self, row: int) -> str:
+        """Text of one row, decoded from the arena"""
+        offsets = self._offsets
+        return self._arena[offsets[row]:offsets[row + 1]].tobytes().decode('utf-8')
+
+    @property
+    def doc_ords(self) -> np.ndarray:
+        return self._doc_ords[:self._size]
+
+    @property
+    def chunk_indexes(self) -> np.ndarray:
+        return self._chunk_indexes[:self._size]
+
+    @staticmethod
+    def _grown(array: np.ndarray, used: int, needed: int) -> np.ndarray:
+        """`array`, or a copy with at least `needed` elements if it is too small"""
+        if array.shape[0] >= needed:
+            return array
+        grown = np.empty(max(needed, 2 * array.shape[0]), dtype=array.dtype)
+        grown[:used] = array[:used]
+        return grown
+
+    def append(self, doc_ords: Iterable[int], chunk_indexes: Iterable[int], texts: Iterable[str]) -> range:
+        """
+        Append rows given column-wise.
+
+        Args:
+            doc_ords: Document ordinal of each row
+            chunk_indexes: Position of each chunk within its document
+            texts: Chunk texts
+
+        Returns:
+            Range of the new rows
+        """
+        payloads = [text.encode('utf-8') for text in texts]
+        start, stop = self._size, self._size + len(payloads)
+        if not payloads:
+            return range(start, stop)
+
+        ends = np.cumsum([len(p) for p in payloads], dtype=np.int64) + self._offsets[start]
+        used = int(self._offsets[start])
+        self._arena = self._grown(self._arena, used, int(ends[-1]))
+        self._arena[used:ends[-1]] = np.frombuffer(b''.join(payloads), dtype=np.uint8)
+
+        self._offsets = self._grown(self._offsets, start + 1, stop + 1)
+        self._offsets[start + 1:stop + 1] = ends
+        self._doc_ords = self._grown(self._doc_ords, start, stop)
+        self._doc_ords[start:stop] = np.fromiter(doc_ords, dtype=np.int32, count=len(payloads))
+        self._chunk_indexes = self._grown(self._chunk_indexes, start, stop)
+        self._chunk_indexes[start:stop] = np.fromiter(chunk_indexes, dtype=np.int32, count=len(payloads))
+
+        # Publish the rows only once all their columns are written
+        self._size = stop
+        return range(start, stop)
+
+    def extend(self, records: Iterable[ChunkRecord]) -> range:
+        """Append ChunkRecords (e.g. rows copied from another table)"""
+        records = list(records)
+        return self.append((r.doc_ord for r in records), (r.chunk_index for r in records),
+                           [r.text for r in records])
+
+    def memory_usage(self) -> Dict[str, int]:
+        """Allocated bytes per column"""
+        return {
+            'text_arena': self._arena.nbytes,
+            'offsets': self._offsets.nbytes,
+            'doc_ords': self._doc_ords.nbytes,
+            'chunk_indexes': self._chunk_indexes.nbytes,
+        }
@@ -10,12 +10,27 @@ except ImportError:
     np = None
 
 import numpy as np
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterable, Optional, Tuple
+import asyncio
+import copy
 import logging
 from datetime import datetime
 import hashlib
+import math
 import re
-import io
+import threading
+import time
+
+from api.services.cache_manager import ChunkEmbeddingCache, QueryEmbeddingCache
+from api.services.chunk_table import ChunkRecord
+from api.services.embedding_executor import EmbeddingExecutor, MicroBatcher, encode_in_worker, encode_texts
+from api.services.hashing_embedder import HashingEmbedder
+from api.services.metadata_index import MetadataIndex
+from api.services.segment_index import IndexSnapshot, Segment
+from api.services.text_extraction import HANDLERS, extract_txt
+from api.services.vector_index import (BinaryHashIndex, EmbeddingMatrix, HNSWIndex, Int8EmbeddingStore, IVFIndex,
+                                       PQEmbeddingStore)
+from api.services.vector_store import MappedEmbeddingMatrix, PersistentVectorStore
 
 logger = logging.getLogger(__name__)
 
@@ -26,95 +41,272 @@ class DocumentProcessor:
     - Multi-format support (PDF, DOCX, TXT, CSV)
     - Intelligent chunking based on document structure
     - Batch embedding generation
-    - Fast similarity search
+    - Segmented index: new chunks land in a small append-only head segment,
+      full heads are sealed, and sealed segments are merged by size tier in
+      the background. Searches run lock-free against an immutable snapshot.
     """
     
-    def __init__(self, embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"):
+    SEARCH_MODES = ('dense', 'lexical', 'hybrid')
+    
+    # State replaced as a whole when compacting a persistent store renumbers it
+    _LAYOUT_ATTRIBUTES = ('store', 'documents', '_doc_ordinals', '_doc_keys', '_deleted', '_visible',
+                          'metadata_index', '_head', '_snapshot', '_synced_rows', '_store_generation')
+    
+    def __init__(self, embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2",
+                 index_type: str = "flat", ivf_nlist: Optional[int] = None,
+                 ivf_nprobe: int = 8, hnsw_m: int = 16, hnsw_ef_construction: int = 100,
+                 hnsw_ef_search: int = 50, binary_rerank_k: int = 200, ann_min_size: int = 10000,
+                 storage: str = "float32", pq_subspaces: int = 48,
+                 pq_train_size: int = 5000, pq_rescore_k: int = 100,
+                 int8_train_size: int = 1000, int8_rescore_k: int = 200,
+                 store_path: Optional[str] = None, search_mode: str = "dense",
+                 hybrid_dense_candidates: int = 100, hybrid_lexical_candidates: int = 100,
+                 hybrid_stage_timeout_ms: Optional[float] = None, rrf_k: int = 60,
+                 query_cache_size: int = 1024, chunk_cache_path: Optional[str] = None,
+                 chunk_cache_size: int = 200000, model_loading: str = "eager",
+                 model_wait_timeout: Optional[float] = 30.0, embedding_executor: str = "thread",
+                 embedding_workers: Optional[int] = None, embedding_queue_size: int = 64,
+                 query_batch_size: int = 32, query_batch_wait_ms: float = 2.0,
+                 compaction_threshold: Optional[float] = 0.3, segment_size: int = 2048,
+                 merge_factor: int = 4):
+        """
+        Args:
+            embedding_model: Sentence-transformers model name
+            index_type: 'flat' for exact search, 'ivf' for an inverted-file index,
+                'hnsw' for a navigable small-world graph index or 'binary' for a
+                sign-bit Hamming prefilter re-ranked with the full vectors
+            ivf_nlist: Number of IVF cells (None = sized from the corpus)
+            ivf_nprobe: IVF cells scanned per query
+            hnsw_m: HNSW links per node
+            hnsw_ef_construction: HNSW beam width while inserting
+            hnsw_ef_search: HNSW beam width while searching
+            binary_rerank_k: Binary-index candidates re-ranked exactly
+            ann_min_size: Segment size below which exact search is used
+            storage: 'float32' for a full-precision matrix, 'int8' for
+                per-dimension scalar-quantized codes or 'pq' for
+                product-quantized codes (compressed storage: flat index only)
+            pq_subspaces: Bytes per PQ-encoded embedding
+            pq_train_size: Embeddings buffered before the quantizer is trained
+            pq_rescore_k: PQ candidates re-ranked exactly (0 disables rescoring)
+            int8_train_size: Embeddings buffered before the int8 scales are fitted
+            int8_rescore_k: Int8 candidates re-ranked exactly (0 disables rescoring)
+            store_path: Directory of a persistent, memory-mapped vector store
+                (float32 storage only); opened on first use or by open_store()
+            search_mode: Default retrieval mode: 'dense' (embeddings), 'lexical'
+                (BM25 keyword matching) or 'hybrid' (both, fused with RRF)
+            hybrid_dense_candidates: Dense candidates fed into hybrid fusion
+            hybrid_lexical_candidates: Lexical candidates fed into hybrid fusion
+            hybrid_stage_timeout_ms: Per-stage latency budget in hybrid mode; a
+                stage that overruns is dropped from fusion (None = no limit)
+            rrf_k: Reciprocal-rank fusion constant
+            query_cache_size: Query embeddings kept in the LRU cache (0 disables it)
+            chunk_cache_path: Directory persisting the content-addressed chunk
+                embedding cache (None = in memory only)
+            chunk_cache_size: Chunk embeddings kept in that cache (0 disables it)
+            model_loading: 'eager' to load the embedding model in the constructor,
+                'background' to defer it to start_model_loading()
+            model_wait_timeout: Seconds a request needing embeddings waits for the
+                model before degrading (None = wait indefinitely)
+            embedding_executor: 'thread' or 'process' pool that runs model calls
+            embedding_workers: Embedding pool size (None = number of CPUs)
+            embedding_queue_size: Embedding jobs queued at once before callers wait
+            query_batch_size: Most concurrent query encodes merged into one model call
+            query_batch_wait_ms: Longest a query encode waits to be batched with
+                others (0 = only batch queries that are already waiting)
+            compaction_threshold: Fraction of tombstoned (deleted or superseded)
+                rows that triggers a background compaction (None or 0 disables it)
+            segment_size: Rows at which the head segment is sealed
+            merge_factor: Sealed segments of one size tier merged together
+                (0 or 1 disables merging)
+        """
         self.documents = []
-        self.chunks = []
-        self.embeddings = []
+        self._doc_ordinals: Dict[str, int] = {}
+        # Logical document key -> ordinal of its current version
+        self._doc_keys: Dict[str, int] = {}
+        # Whether each document (by ordinal) is searchable; segment masks
+        # are derived from it. Only the event loop reads or writes it.
+        self._visible = np.zeros(0, dtype=bool)
+        self._deleted = set()
+        # Metadata bitmaps by document ordinal, for filtered searches
+        self.metadata_index = MetadataIndex()
+        self.segment_size = segment_size
+        self.merge_factor = merge_factor
+        self._head = None
+        # Replaced, never mutated: searches read it once and use only that
+        self._snapshot = IndexSnapshot(documents=self.documents)
+        self._maintenance = None
+        self._maintenance_lock = asyncio.Lock()
+        # Held while a persistent store is re-indexed into a new layout
+        self._reopen_lock = asyncio.Lock()
+        self.merges = 0
+        self.compaction_threshold = compaction_threshold
+        self.compactions = 0
+        self.storage = storage
+        self.pq_subspaces = pq_subspaces
+        self.pq_train_size = pq_train_size
+        self.pq_rescore_k = pq_rescore_k
+        self.int8_train_size = int8_train_size
+        self.int8_rescore_k = int8_rescore_k
+        self.index_type = index_type
+        self.ivf_nlist = ivf_nlist
+        self.ivf_nprobe = ivf_nprobe
+        self.hnsw_m = hnsw_m
+        self.hnsw_ef_construction = hnsw_ef_construction
+        self.hnsw_ef_search = hnsw_ef_search
+        self.binary_rerank_k = binary_rerank_k
+        self.ann_min_size = ann_min_size
+        # Reject unsupported storage/index combinations up front
+        self._create_embedding_store()
+        self._create_ann_index()
+        self.search_mode = search_mode
+        self.hybrid_dense_candidates = hybrid_dense_candidates
+        self.hybrid_lexical_candidates = hybrid_lexical_candidates
+        self.hybrid_stage_timeout_ms = hybrid_stage_timeout_ms
+        self.rrf_k = rrf_k
+        self.query_cache = QueryEmbeddingCache(max_size=query_cache_size)
+        if search_mode not in self.SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {search_mode}")
+        self.store_path = store_path
+        self.store = None
+        self._store_generation = None
+        self._synced_rows = 0
+        self._store_loading = None
+        if store_path and storage != 'float32':
+            raise ValueError("A persistent vector store requires float32 embedding storage")
         self.embedding_model_name = embedding_model
         self.embedding_model = None
         self.embedding_dim = 384  # Dimension for all-MiniLM-L6-v2
+        self.chunk_cache = ChunkEmbeddingCache(model_name=embedding_model, path=chunk_cache_path,
+                                               max_entries=chunk_cache_size)
+        
+        self.embedding_executor = EmbeddingExecutor(kind=embedding_executor, workers=embedding_workers,
+                                                    max_pending=embedding_queue_size)
+        self.query_batcher = MicroBatcher(self._encode_queries, max_batch=query_batch_size,
+                                          max_wait_ms=query_batch_wait_ms)
+        
+        if model_loading not in ('eager', 'background'):
+            raise ValueError(f"Unknown model loading strategy: {model_loading}")
+        self.model_wait_timeout = model_wait_timeout
+        # 'pending' -> 'importing' -> 'loading' -> 'ready' | 'failed'
+        self.model_status = 'pending'
+        self.model_error = None
+        self._model_ready = threading.Event()
+        self._model_thread = None
+        self._model_lock = threading.Lock()
+        self._model_load_started = None
+        self._model_load_seconds = None
         
-        # Initialize embedding model lazily
-        self._init_embedding_model()
+        if model_loading == 'eager':
+            self._init_embedding_model()
         
         # Document type handlers
-        self.handlers = {
-            'application/pdf': self._process_pdf,
-            'application/vnd.openxmlformats-officedocument.wordprocessingml.document': self._process_docx,
-            'text/plain': self._process_txt,
-            'text/csv': self._process_csv,
-        }
+        self.handlers = dict(HANDLERS)
     
     def _init_embedding_model(self):
-        """Initialize embedding model (lazy loading)"""
+        """Initialize embedding model (runs in the constructor or on the loader thread)"""
+        self._model_load_started = time.monotonic()
+        status = 'ready'
         try:
             # Using a simple embedding simulation for demo
             # In production, use actual sentence-transformers
+            self.model_status = 'importing'
             from sentence_transformers import SentenceTransformer
+            self.model_status = 'loading'
             self.embedding_model = SentenceTransformer(self.embedding_model_name)
             logger.info(f"Loaded embedding model: {self.embedding_model_name}")
         except ImportError:
-            logger.warning("sentence-transformers not available, using mock embeddings")
+            logger.warning("sentence-transformers not available, using feature-hashing embeddings")
+            self.embedding_model = None
+        except Exception as e:
+            logger.error(f"Failed to load embedding model {self.embedding_model_name}: {str(e)}")
             self.embedding_model = None
+            self.model_error = str(e)
+            status = 'failed'
+        
+        # Hashed-feature vectors must never be served as real-model embeddings
+        self.chunk_cache.model_name = self.embedding_model_name if self.embedding_model else HashingEmbedder.NAME
+        self._model_load_seconds = time.monotonic() - self._model_load_started
+        self.model_status = status
+        self._model_ready.set()
+    
+    def start_model_loading(self) -> None:
+        """Start loading the embedding model on a background thread (no-op if already started)"""
+        with self._model_lock:
+            if self._model_thread is not None or self._model_ready.is_set():
+                return
+            self._model_thread = threading.Thread(target=self._init_embedding_model,
+                                                  name='embedding-model-loader', daemon=True)
+            self._model_thread.start()
+    
+    @property
+    def model_ready(self) -> bool:
+        return self._model_ready.is_set() and self.model_status == 'ready'
+    
+    async def wait_for_model(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for the embedding model, starting the warm-up if needed.
+        
+        Returns:
+            True if embeddings are available, False on timeout or load failure
+        """
+        if not self._model_ready.is_set():
+            self.start_model_loading()
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._model_ready.wait, timeout)
+        return self.model_ready
+    
+    def model_load_status(self) -> Dict[str, Any]:
+        """Warm-up progress for health checks"""
+        if self._model_load_seconds is not None:
+            elapsed = self._model_load_seconds
+        elif self._model_load_started is not None:
+            elapsed = time.monotonic() - self._model_load_started
+        else:
+            elapsed = None
+        
+        return {
+            'model': self.embedding_model_name,
+            'status': self.model_status,
+            'ready': self.model_ready,
+            'backend': None if not self._model_ready.is_set()
+                       else 'sentence-transformers' if self.embedding_model else 'hashing',
+            'elapsed_seconds': None if elapsed is None else round(elapsed, 3),
+            'error': self.model_error
+        }
     
-    async def process_document(self, filename: str, content: bytes, content_type: str) -> Dict[str, Any]:
+    async def process_document(self, filename: str, content: bytes, content_type: str,
+                               doc_key: Optional[str] = None) -> Dict[str, Any]:
         """
         Process a single document: extract text, chunk, and generate embeddings.
         
+        A document whose key matches an existing document replaces it: only
+        chunks that changed are embedded again, and the new version becomes
+        searchable in the same step that hides the old one.
+        
         Args:
             filename: Name of the file
             content: File content as bytes
             content_type: MIME type of the file
+            doc_key: Logical document identity (defaults to the filename)
             
         Returns:
             Processing result with document ID and stats
         """
         try:
-            # Generate unique document ID
-            doc_id = hashlib.md5(f"{filename}{datetime.now().isoformat()}".encode()).hexdigest()
+            await self.require_model()
             
             # Extract text based on file type
-            handler = self.handlers.get(content_type, self._process_txt)
+            handler = self.handlers.get(content_type, extract_txt)
             text = handler(content)
             
-            # Intelligent chunking
-            chunks = self._dynamic_chunking(text, self._detect_document_type(filename, text))
-            
-            # Generate embeddings in batches
-            chunk_embeddings = await self._generate_embeddings_batch(chunks)
-            
-            # Store document metadata
-            document = {
-                'id': doc_id,
-                'filename': filename,
-                'content_type': content_type,
-                'processed_at': datetime.now().isoformat(),
-                'num_chunks': len(chunks),
-                'total_length': len(text)
-            }
-            
-            self.documents.append(document)
-            
-            # Store chunks with embeddings
-            for i, (chunk, embedding) in enumerate(zip(chunks, chunk_embeddings)):
-                self.chunks.append({
-                    'doc_id': doc_id,
-                    'chunk_id': f"{doc_id}_{i}",
-                    'text': chunk,
-                    'embedding': embedding,
-                    'chunk_index': i
-                })
+            document, chunks = self.prepare_document(filename, content_type, text, doc_key=doc_key)
             
-            logger.info(f"Processed document {filename}: {len(chunks)} chunks created")
+            # Generate embeddings in batches, skipping chunks embedded before
+            previous = await self.previous_chunk_vectors(document['doc_key'])
+            chunk_embeddings, num_embedded = await self.embed_chunks(chunks, previous=previous)
+            chunks_reused = sum(self.chunk_digest(chunk) in previous for chunk in chunks)
             
-            return {
-                'success': True,
-                'doc_id': doc_id,
-                'chunks_created': len(chunks)
-            }
+            return await self.commit_document(document, chunks, chunk_embeddings, num_embedded, chunks_reused)
             
         except Exception as e:
             logger.error(f"Document processing failed for {filename}: {str(e)}")
@@ -123,56 +315,592 @@ class DocumentProcessor:
                 'error': str(e)
             }
     
-    def _process_pdf(self, content: bytes) -> str:
-        """Extract text from PDF"""
-        try:
-            import PyPDF2
-            pdf_file = io.BytesIO(content)
-            pdf_reader = PyPDF2.PdfReader(pdf_file)
-            
-            text = ""
-            for page in pdf_reader.pages:
-                text += page.extract_text() + "\n"
-            
-            return text
-        except ImportError:
-            logger.warning("PyPDF2 not available, using placeholder text")
-            return "PDF content placeholder - install PyPDF2 for actual extraction"
+    async def require_model(self) -> None:
+        """Wait for the embedding model; vectors from different models must never be mixed in one index"""
+        if not await self.wait_for_model(self.model_wait_timeout):
+            raise RuntimeError(f"Embedding model not available (status: {self.model_status})")
     
-    def _process_docx(self, content: bytes) -> str:
-        """Extract text from DOCX"""
-        try:
-            import docx
-            doc = docx.Document(io.BytesIO(content))
-            return "\n".join([paragraph.text for paragraph in doc.paragraphs])
-        except ImportError:
-            logger.warning("python-docx not available, using placeholder text")
-            return "DOCX content placeholder - install python-docx for actual extraction"
+    def prepare_document(self, filename: str, content_type: str, text: str,
+                         content_sha256: Optional[str] = None,
+                         doc_key: Optional[str] = None) -> Tuple[Dict[str, Any], List[str]]:
+        """
+        Chunk extracted text and build the document's metadata.
+        
+        Args:
+            content_sha256: Hash of the uploaded file, recorded in the metadata if given
+            doc_key: Logical document identity (defaults to the filename)
+        
+        Returns:
+            Tuple of (document metadata, chunk texts)
+        """
+        # Intelligent chunking
+        doc_type, chunks = self.chunk_text(filename, text)
+        
+        document = self.new_document(filename, content_type, len(chunks), len(text), content_sha256, doc_key,
+                                     doc_type)
+        return document, chunks
     
-    def _process_txt(self, content: bytes) -> str:
-        """Extract text from plain text file"""
-        try:
-            return content.decode('utf-8')
-        except UnicodeDecodeError:
-            return content.decode('latin-1')
+    def chunk_text(self, filename: str, text: str, doc_type: Optional[str] = None) -> Tuple[str, List[str]]:
+        """
+        Chunk text with the strategy for its document type.
+        
+        Streamed documents are chunked segment by segment; pass the type
+        detected on the first segment so every segment is chunked alike.
+        
+        Returns:
+            Tuple of (document type, chunk texts)
+        """
+        doc_type = doc_type or self._detect_document_type(filename, text)
+        return doc_type, self._dynamic_chunking(text, doc_type)
+    
+    def new_document(self, filename: str, content_type: str, num_chunks: int, total_length: int,
+                     content_sha256: Optional[str] = None, doc_key: Optional[str] = None,
+                     doc_type: Optional[str] = None) -> Dict[str, Any]:
+        """Build document metadata with a fresh document ID"""
+        # Generate unique document ID
+        doc_id = hashlib.md5(f"{filename}{datetime.now().isoformat()}".encode()).hexdigest()
+        
+        document = {
+            'id': doc_id,
+            'doc_key': doc_key or filename,
+            'filename': filename,
+            'content_type': content_type,
+            'doc_type': doc_type,
+            'processed_at': datetime.now().isoformat(),
+            'num_chunks': num_chunks,
+            'total_length': total_length
+        }
+        if content_sha256:
+            document['content_sha256'] = content_sha256
+        return document
+    
+    async def commit_document(self, document: Dict[str, Any], chunks: List[str], chunk_embeddings,
+                              num_embedded: Optional[int] = None,
+                              chunks_reused: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Store a prepared document with its chunk embeddings and make it searchable.
+        
+        If a document with the same key exists, the new version replaces it
+        atomically: searches see either the old version or the new one.
+        Writes to a persistent store (fsyncs, and waits for its writer lock)
+        run on a worker thread, not the event loop.
+        
+        Args:
+            num_embedded: Chunks that needed a model call, for dedup stats (if known)
+            chunks_reused: Chunks whose vectors were carried over from the replaced version
+        
+        Returns:
+            Processing result with document ID and stats
+        """
+        await self._refresh_store()
+        replaced = self.current_document(self.document_key(document))
+        await self._store_document(document, chunks, chunk_embeddings)
+        
+        logger.info(f"Processed document {document['filename']}: {len(chunks)} chunks created")
+        
+        result = {
+            'success': True,
+            'doc_id': document['id'],
+            'chunks_created': len(chunks)
+        }
+        if replaced is not None:
+            result['replaced_doc_id'] = replaced['id']
+        if num_embedded is not None:
+            result['chunks_embedded'] = num_embedded
+            result['dedup_ratio'] = round(1 - num_embedded / len(chunks), 4) if chunks else 0.0
+        if chunks_reused is not None:
+            result['chunks_reused'] = chunks_reused
+        self._schedule_maintenance()
+        return result
+    
+    def open_store(self) -> None:
+        """
+        Open the persistent vector store if one is configured, on the calling thread.
+        
+        Embeddings are memory-mapped and paged in on demand, but every chunk
+        is read into the lexical index and every document into the metadata
+        index, which takes seconds for large stores. A server should call
+        start_store_loading() instead.
+        """
+        if not self.store_path or self.store is not None:
+            return
+        
+        self._attach_store(PersistentVectorStore(self.store_path))
+        self._sync_store()
+    
+    def start_store_loading(self) -> None:
+        """
+        Attach the persistent store and index it on a worker thread (no-op
+        without a store, or if it is already open). Requests served meanwhile
+        see the documents indexed so far: none until the load completes.
+        """
+        if not self.store_path or self.store is not None:
+            return
+        
+        self._attach_store(PersistentVectorStore(self.store_path))
+        # Not indexed yet: _refresh_store() treats the layout as stale and rebuilds it off the event loop
+        self._store_generation = None
+        self._store_loading = asyncio.get_running_loop().create_task(self._refresh_store())
+        self._store_loading.add_done_callback(self._log_store_loading_failure)
+    
+    @staticmethod
+    def _log_store_loading_failure(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Loading the vector store failed: {task.exception()}")
+    
+    def _attach_store(self, store: PersistentVectorStore) -> None:
+        """Reset the index layout to an empty one over `store`; _sync_store() then indexes its rows"""
+        self.store = store
+        self._store_generation = store.generation
+        self.documents = store.documents
+        self._doc_ordinals, self._doc_keys, self._deleted = {}, {}, set()
+        self._visible = np.zeros(0, dtype=bool)
+        self.metadata_index = MetadataIndex()
+        self._head = None
+        self._snapshot = IndexSnapshot(documents=store.documents)
+        self._synced_rows = 0
+    
+    def _index_store(self, compact_drop: Optional[List[str]] = None) -> 'DocumentProcessor':
+        """
+        Open the persistent store afresh (compacting it first if `compact_drop`
+        is given) and index every row on a shallow copy of the processor.
+        Runs on a worker thread; the live state is untouched until the copy's
+        layout is swapped in with _install_layout().
+        """
+        store = PersistentVectorStore(self.store_path)
+        if compact_drop is not None:
+            store.compact(compact_drop)
+        
+        shadow = copy.copy(self)
+        shadow._attach_store(store)
+        shadow._sync_store()
+        return shadow
+    
+    def _install_layout(self, shadow: 'DocumentProcessor') -> None:
+        """Swap in a layout built by _index_store, then sync changes committed meanwhile"""
+        for name in self._LAYOUT_ATTRIBUTES:
+            setattr(self, name, getattr(shadow, name))
+        self._sync_store()
+    
+    async def _refresh_store(self) -> None:
+        """
+        Open the persistent store, or pick up what other processes committed,
+        without blocking the event loop.
+        
+        Opening the store, or re-opening it after another process compacted
+        it, indexes every row; that runs on a worker thread. Meanwhile other
+        requests keep searching the current snapshot instead of waiting.
+        """
+        if not self.store_path:
+            return
+        if self.store is not None and (self._sync_store() or self._reopen_lock.locked()):
+            return
+        
+        async with self._reopen_lock:
+            if self.store is not None and self._sync_store():
+                return
+            shadow = await asyncio.get_running_loop().run_in_executor(None, self._index_store)
+            self._install_layout(shadow)
+    
+    def _sync_store(self) -> bool:
+        """
+        Pick up documents and rows committed to the store by this or another worker process.
+        
+        Returns:
+            False if another process compacted the store: row numbers changed,
+            and the store must be re-indexed (see _refresh_store)
+        """
+        if self.store is None:
+            return True
+        
+        self.store.refresh()
+        if self.store.generation != self._store_generation:
+            return False
+        
+        first = len(self._doc_ordinals)
+        for ordinal in range(first, len(self.documents)):
+            self._doc_ordinals[self.documents[ordinal]['id']] = ordinal
+        
+        start, end = self._synced_rows, len(self.store.vectors)
+        if end > start:
+            head = self._writable_head()
+            head.index(range(len(head), len(head) + end - start))
+            self._synced_rows = end
+        deleted = self.store.deleted - self._deleted
+        if first < len(self.documents) or deleted:
+            self._publish(range(first, len(self.documents)), deleted)
+        return True
+    
+    def _writable_head(self) -> Segment:
+        """The head segment, starting a new one once the current head is sealed"""
+        if self._head is None:
+            if self.store is not None:
+                # Store rows from here on; the embedding view follows the store as it grows
+                self._head = Segment(MappedEmbeddingMatrix(self.store, self._synced_rows),
+                                     self.store.chunks, offset=self._synced_rows)
+            else:
+                self._head = Segment(EmbeddingMatrix())
+        return self._head
+    
+    async def _store_document(self, document: Dict[str, Any], chunks: List[str], chunk_embeddings) -> None:
+        """
+        Append a document, its chunk texts and their embeddings (same order) to storage.
+        The document ordinal is assigned here and stamped on every chunk record.
+        """
+        if self.store is not None:
+            records = [{'doc_ord': 0, 'chunk_index': i, 'text': chunk} for i, chunk in enumerate(chunks)]
+            await asyncio.get_running_loop().run_in_executor(
+                None, self.store.append, [document], records, chunk_embeddings)
+            await self._refresh_store()
+            return
+        
+        ordinal = len(self.documents)
+        self.documents.append(document)
+        self._doc_ordinals[document['id']] = ordinal
+        head = self._writable_head()
+        rows = head.embeddings.append(chunk_embeddings)
+        head.chunks.append([ordinal] * len(chunks), range(len(chunks)), chunks)
+        head.index(rows)
+        self._publish(range(ordinal, ordinal + 1))
+    
+    def _publish(self, ordinals: range, deleted: Iterable[int] = ()) -> None:
+        """
+        Make newly stored documents searchable, hiding the versions they
+        replace and tombstoning deleted documents.
+        
+        The next snapshot is built aside and swapped in with one assignment,
+        so a concurrent search sees either a document's old version or its
+        new one, never both or a mix of the two.
+        """
+        if len(self._visible) < len(self.documents):
+            visible = np.zeros(max(len(self.documents), 2 * len(self._visible)), dtype=bool)
+            visible[:len(self._visible)] = self._visible
+            self._visible = visible
+        
+        changed = set()
+        for ordinal in ordinals:
+            self.metadata_index.add(ordinal, self.documents[ordinal])
+            key = self.document_key(self.documents[ordinal])
+            replaced = self._doc_keys.get(key)
+            if replaced is not None:
+                self._visible[replaced] = False
+                changed.add(replaced)
+            self._visible[ordinal] = True
+            self._doc_keys[key] = ordinal
+        for ordinal in deleted:
+            self._visible[ordinal] = False
+            changed.add(ordinal)
+            key = self.document_key(self.documents[ordinal])
+            if self._doc_keys.get(key) == ordinal:
+                del self._doc_keys[key]
+            self._deleted.add(ordinal)
+        
+        snapshot = self._snapshot
+        segments, masks = list(snapshot.segments), list(snapshot.masks)
+        head = self._head
+        if head is not None and not any(segment is head for segment in segments):
+            segments.append(head)
+            masks.append(None)
+        for i, segment in enumerate(segments):
+            if segment is head or any(ordinal in segment.doc_rows for ordinal in changed):
+                masks[i] = segment.visibility(self._visible)
+        self._snapshot = IndexSnapshot(segments, masks, self.documents)
+        
+        if head is not None and (len(head) >= self.segment_size or self._rewrite_due(masks[segments.index(head)])):
+            self._seal_head()
+    
+    def _seal_head(self) -> None:
+        """Freeze the head segment; the next rows start a new one"""
+        head, self._head = self._head, None
+        if isinstance(head.embeddings, MappedEmbeddingMatrix):
+            head.embeddings = head.embeddings.view(head.offset, head.offset + len(head))
+        head.sealed = True
+    
+    @staticmethod
+    def document_key(document: Dict[str, Any]) -> str:
+        """Logical identity of a document: its explicit key, else its filename"""
+        return document.get('doc_key') or document['filename']
+    
+    @staticmethod
+    def chunk_digest(text: str) -> bytes:
+        """Content hash identifying a chunk between versions of a document"""
+        return hashlib.sha256(text.encode('utf-8')).digest()
+    
+    @property
+    def document_count(self) -> int:
+        """Number of current documents (superseded versions excluded)"""
+        return len(self._doc_keys)
+    
+    @property
+    def chunks(self) -> IndexSnapshot:
+        """Chunk records of the current snapshot, including tombstoned ones"""
+        return self._snapshot
+    
+    @property
+    def segments(self) -> Tuple[Segment, ...]:
+        return self._snapshot.segments
+    
+    def current_document(self, doc_key: str) -> Optional[Dict[str, Any]]:
+        """Metadata of the current version of a logical document, if any"""
+        ordinal = self._doc_keys.get(doc_key)
+        return None if ordinal is None else self.documents[ordinal]
+    
+    def _document_rows(self, ordinal: Optional[int]) -> Tuple[Optional[Segment], range]:
+        """Segment holding a document's chunks and their rows in it"""
+        for segment in self._snapshot.segments:
+            rows = segment.doc_rows.get(ordinal)
+            if rows is not None:
+                return segment, rows
+        return None, range(0)
+    
+    async def previous_chunk_vectors(self, doc_key: str) -> Dict[bytes, np.ndarray]:
+        """
+        Stored vectors of the current version of a logical document.
+        
+        Returns:
+            Dict of chunk_digest(text) -> normalized embedding; empty for a new
+            key, or when the storage keeps no exact vectors to carry over
+        """
+        await self._refresh_store()
+        segment, rows = self._document_rows(self._doc_keys.get(doc_key))
+        if not rows:
+            return {}
+        
+        vectors = segment.embeddings.take(np.arange(rows.start, rows.stop))
+        if vectors is None:
+            return {}
+        return {self.chunk_digest(segment.chunk(row).text): vector for row, vector in zip(rows, vectors)}
+    
+    async def delete_document(self, doc_id: str) -> Dict[str, Any]:
+        """
+        Delete a document. Its chunks are tombstoned, so searches skip them
+        at once; their storage is reclaimed when their segment is rewritten.
+        
+        Returns:
+            Result with the number of chunks removed from search
+        """
+        await self._refresh_store()
+        ordinal = self._doc_ordinals.get(doc_id)
+        if ordinal is None or self._doc_keys.get(self.document_key(self.documents[ordinal])) != ordinal:
+            return {'success': False, 'error': f"Document not found: {doc_id}"}
+        
+        if self.store is not None:
+            # Waits for the store's writer lock, which a compaction may hold for a while
+            await asyncio.get_running_loop().run_in_executor(None, self.store.delete, [doc_id])
+            await self._refresh_store()
+        else:
+            self._publish(range(0), [ordinal])
+        
+        logger.info(f"Deleted document {self.documents[ordinal]['filename']} ({doc_id})")
+        self._schedule_maintenance()
+        return {'success': True, 'doc_id': doc_id, 'chunks_deleted': len(self._document_rows(ordinal)[1])}
+    
+    @property
+    def tombstone_ratio(self) -> float:
+        """Fraction of stored rows hidden from search (deleted or superseded)"""
+        snapshot = self._snapshot
+        return 1 - snapshot.live_rows / len(snapshot) if len(snapshot) else 0.0
     
-    def _process_csv(self, content: bytes) -> str:
-        """Extract text from CSV"""
+    def _schedule_maintenance(self) -> None:
+        """Start background merges, or a store compaction, if any are due"""
+        if self._maintenance is not None and not self._maintenance.done():
+            return
+        if not self._store_compaction_due() and self._plan_merge() is None:
+            return
         try:
-            import csv
-            text = content.decode('utf-8')
-            reader = csv.DictReader(io.StringIO(text))
-            
-            # Convert CSV to readable text
-            rows = []
-            for row in reader:
-                row_text = ", ".join([f"{k}: {v}" for k, v in row.items()])
-                rows.append(row_text)
-            
-            return "\n".join(rows)
-        except Exception as e:
-            logger.error(f"CSV processing error: {str(e)}")
-            return self._process_txt(content)
+            self._maintenance = asyncio.get_running_loop().create_task(self._maintain())
+        except RuntimeError:
+            return  # No event loop: maintenance waits for the next trigger or an explicit call
+        self._maintenance.add_done_callback(self._log_maintenance_failure)
+    
+    async def _maintain(self) -> None:
+        if self._store_compaction_due():
+            await self.compact()
+        await self.merge_segments()
+    
+    @staticmethod
+    def _log_maintenance_failure(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Background index maintenance failed: {task.exception()}")
+    
+    def _store_compaction_due(self) -> bool:
+        """A persistent store is compacted as a whole once tombstones pass the threshold"""
+        return (self.store is not None and bool(self.compaction_threshold)
+                and self.tombstone_ratio >= self.compaction_threshold)
+    
+    def _rewrite_due(self, mask: np.ndarray) -> bool:
+        """Whether an in-memory segment holds enough tombstones to be rewritten without them"""
+        dead = len(mask) - np.count_nonzero(mask)
+        return self.store is None and bool(self.compaction_threshold) and dead > 0 and \
+            dead >= self.compaction_threshold * len(mask)
+    
+    def _segment_rows(self, segment: Segment, mask: np.ndarray) -> int:
+        """Rows a merge would keep: live rows in memory; every row of a store range"""
+        return len(segment) if self.store is not None else int(np.count_nonzero(mask))
+    
+    def _plan_merge(self) -> Optional[Tuple[List[Segment], List[np.ndarray]]]:
+        """
+        Next background rewrite, as (input segments, their masks), or None.
+        
+        In order of priority: a sealed segment that still needs its configured
+        storage or ANN index; in memory, a segment whose tombstone ratio
+        passed the compaction threshold; then `merge_factor` adjacent sealed
+        segments of the same size tier, where tier t holds segments of
+        segment_size * merge_factor**t live rows or more.
+        """
+        snapshot = self._snapshot
+        sealed = [(i, segment, mask) for i, (segment, mask) in enumerate(zip(snapshot.segments, snapshot.masks))
+                  if segment.sealed]
+        
+        for _, segment, mask in sealed:
+            if segment.built:
+                continue
+            needs_ann = self.index_type != 'flat' and self._segment_rows(segment, mask) >= self.ann_min_size
+            if needs_ann or self.storage != 'float32':
+                return [segment], [mask]
+        
+        for _, segment, mask in sealed:
+            if self._rewrite_due(mask):
+                return [segment], [mask]
+        
+        if self.merge_factor < 2:
+            return None
+        run = []
+        for i, segment, mask in sealed:
+            rows = self._segment_rows(segment, mask)
+            tier = int(math.log(max(rows, self.segment_size) / self.segment_size, self.merge_factor))
+            if run and (run[-1][0] != i - 1 or run[-1][3] != tier):
+                run = []
+            run.append((i, segment, mask, tier))
+            if len(run) == self.merge_factor:
+                return [item[1] for item in run], [item[2] for item in run]
+        return None
+    
+    async def merge_segments(self) -> int:
+        """
+        Run background segment rewrites until none is due (see _plan_merge).
+        Each rewrite is built on a worker thread and swapped into the snapshot.
+        
+        Returns:
+            Number of rewrites installed
+        """
+        installed = 0
+        loop = asyncio.get_running_loop()
+        async with self._maintenance_lock:
+            while True:
+                plan = self._plan_merge()
+                if plan is None:
+                    return installed
+                inputs, masks = plan
+                dead = sum(len(mask) - int(np.count_nonzero(mask)) for mask in masks)
+                merged = await loop.run_in_executor(None, self._build_segment, inputs, masks)
+                if not self._install_segment(inputs, merged):
+                    continue
+                installed += 1
+                self.merges += 1
+                if dead and self.store is None:
+                    self.compactions += 1
+    
+    def _build_segment(self, inputs: List[Segment], masks: List[np.ndarray]) -> Optional[Segment]:
+        """
+        Build one sealed segment from adjacent sealed segments (worker thread).
+        
+        In memory, only rows visible in `masks` are copied, so tombstones are
+        dropped. A persistent store's rows cannot move: the new segment spans
+        the inputs' store rows and is indexed afresh.
+        
+        Returns:
+            The new segment, or None if no row survives
+        """
+        if isinstance(inputs[0].embeddings, MappedEmbeddingMatrix):
+            start, stop = inputs[0].offset, inputs[-1].offset + len(inputs[-1])
+            segment = Segment(inputs[0].embeddings.view(start, stop), inputs[0].chunks, offset=start)
+            segment.index(range(stop - start))
+        else:
+            segment = Segment(self._create_embedding_store())
+            for source, mask in zip(inputs, masks):
+                rows = np.flatnonzero(mask)
+                if len(rows):
+                    segment.embeddings.append(source.take(rows))
+                    segment.chunks.extend(source.chunk(row) for row in rows)
+            segment.index(range(len(segment.chunks)))
+        if not len(segment):
+            return None
+        
+        if self.index_type != 'flat' and len(segment) >= self.ann_min_size:
+            segment.build_ann(self._create_ann_index())
+        segment.sealed = segment.built = True
+        return segment
+    
+    def _install_segment(self, inputs: List[Segment], merged: Optional[Segment]) -> bool:
+        """
+        Swap a rewritten segment in for its inputs. Its mask is computed
+        from current document visibility, so deletions and replacements made
+        while it was built still apply.
+        
+        Returns:
+            False if the inputs are gone (the store was reopened meanwhile)
+        """
+        snapshot = self._snapshot
+        positions = [i for i, segment in enumerate(snapshot.segments) if any(segment is s for s in inputs)]
+        if len(positions) != len(inputs):
+            return False
+        
+        segments, masks = list(snapshot.segments), list(snapshot.masks)
+        replacement = [] if merged is None else [merged]
+        replacement_masks = [] if merged is None else [merged.visibility(self._visible)]
+        segments[positions[0]:positions[-1] + 1] = replacement
+        masks[positions[0]:positions[-1] + 1] = replacement_masks
+        self._snapshot = IndexSnapshot(segments, masks, snapshot.documents)
+        return True
+    
+    async def compact(self) -> bool:
+        """
+        Drop deleted and superseded versions from storage and indexes.
+        
+        In memory, the head segment is sealed and every segment holding
+        tombstones is rewritten on a worker thread and swapped in. A
+        persistent store is compacted on disk and its new generation indexed
+        off the event loop; changes made meanwhile are synced on top.
+        
+        Returns:
+            True if anything was reclaimed
+        """
+        await self._refresh_store()
+        if self._snapshot.live_rows == len(self._snapshot):
+            return False
+        
+        started = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        async with self._maintenance_lock:
+            if self.store is not None:
+                current_ids = {self.documents[o]['id'] for o in self._doc_keys.values()}
+                drop = [d['id'] for d in self.documents if d['id'] not in current_ids]
+                async with self._reopen_lock:
+                    shadow = await loop.run_in_executor(None, self._index_store, drop)
+                    self._install_layout(shadow)
+            else:
+                if self._head is not None and len(self._head):
+                    self._seal_head()
+                snapshot = self._snapshot
+                plan = [(segment, mask) for segment, mask in zip(snapshot.segments, snapshot.masks)
+                        if np.count_nonzero(mask) < len(mask)]
+                for segment, mask in plan:
+                    merged = await loop.run_in_executor(None, self._build_segment, [segment], [mask])
+                    self._install_segment([segment], merged)
+        self.compactions += 1
+        
+        logger.info(f"Compacted to {len(self._snapshot)} chunks in {time.perf_counter() - started:.2f}s")
+        return True
+    
+    def get_document(self, doc_id: str) -> Optional[Dict[str, Any]]:
+        """Look up document metadata by id"""
+        ordinal = self._doc_ordinals.get(doc_id)
+        return None if ordinal is None else self.documents[ordinal]
+    
+    def get_chunk_id(self, chunk: ChunkRecord) -> str:
+        """Derive the stable chunk id ('<doc_id>_<chunk_index>') on demand"""
+        return f"{self.documents[chunk.doc_ord]['id']}_{chunk.chunk_index}"
     
     def _detect_document_type(self, filename: str, text: str) -> str:
         """
@@ -314,6 +1042,9 @@ class DocumentProcessor:
         """
         Generate embeddings in batches for efficiency.
         
+        Texts already in the chunk embedding cache are served from it, and
+        each distinct novel text is encoded once.
+        
         Args:
             texts: List of text chunks
             batch_size: Number of texts to process at once
@@ -321,88 +1052,347 @@ class DocumentProcessor:
         Returns:
             List of embedding vectors
         """
-        if self.embedding_model is None:
-            # Use mock embeddings for demo
-            return [self._generate_mock_embedding(text) for text in texts]
-        
-        embeddings = []
+        embeddings, _ = await self.embed_chunks(texts, batch_size)
+        return embeddings
+    
+    async def embed_chunks(self, texts: List[str], batch_size: int = 32,
+                           previous: Optional[Dict[bytes, np.ndarray]] = None) -> Tuple[List[np.ndarray], int]:
+        """
+        Embed texts through the chunk cache; returns (embeddings, number of texts encoded).
         
-        for i in range(0, len(texts), batch_size):
-            batch = texts[i:i + batch_size]
-            batch_embeddings = self.embedding_model.encode(batch, show_progress_bar=False)
-            embeddings.extend(batch_embeddings)
+        Args:
+            previous: Vectors of a replaced document version by chunk_digest
+                (see previous_chunk_vectors); unchanged chunks reuse them
+        """
+        embeddings = [previous.get(self.chunk_digest(text)) for text in texts] if previous else [None] * len(texts)
+        uncached = [text for text, e in zip(texts, embeddings) if e is None]
+        if uncached:
+            cached = iter(self.chunk_cache.get_many(uncached))
+            embeddings = [next(cached) if e is None else e for e in embeddings]
+        novel = list(dict.fromkeys(text for text, e in zip(texts, embeddings) if e is None))
+        if not novel:
+            return embeddings, 0
         
-        return embeddings
+        encoded = dict(zip(novel, await self._encode_texts(novel, batch_size)))
+        self.chunk_cache.add_many(novel, [encoded[text] for text in novel])
+        embeddings = [encoded[text] if e is None else e for text, e in zip(texts, embeddings)]
+        return embeddings, len(novel)
     
-    def _generate_mock_embedding(self, text: str):
-        """Generate mock embedding for testing"""
-        if not NUMPY_AVAILABLE:
-        # Return simple list instead
-            return [0.1] * self.embedding_dim
-        # Create deterministic embedding based on text
-        hash_val = int(hashlib.md5(text.encode()).hexdigest(), 16)
-        np.random.seed(hash_val % (2**32))
-        return np.random.randn(self.embedding_dim).astype(np.float32)
+    async def _encode_texts(self, texts: List[str], batch_size: int = 32) -> List[np.ndarray]:
+        """
+        Run the embedding model over texts in batches on the embedding pool.
+        Batches are submitted together so they spread across the pool's workers.
+        """
+        batches = [texts[i:i + batch_size] for i in range(0, len(texts), batch_size)]
+        results = await asyncio.gather(*[
+            self.embedding_executor.run(*self._encode_job(batch, batch_size)) for batch in batches
+        ])
+        return [embedding for block in results for embedding in block]
+    
+    def _encode_job(self, texts: List[str], batch_size: int = 32):
+        """(function, *args) encoding texts on the embedding pool"""
+        if self.embedding_executor.kind == 'process':
+            # Workers load their own copy of the model; only its name is shipped
+            model_name = self.embedding_model_name if self.embedding_model else None
+            return encode_in_worker, model_name, texts, batch_size, self.embedding_dim
+        return encode_texts, self.embedding_model, texts, batch_size, self.embedding_dim
     
-    async def search_documents(self, query: str, top_k: int = 5) -> List[Dict[str, Any]]:
+    async def search_documents(self, query: str, top_k: int = 5, mode: Optional[str] = None,
+                               filters: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
         """
-        Search documents using semantic similarity.
+        Search documents using semantic similarity, BM25 keyword matching or both.
         
         Args:
             query: Search query
             top_k: Number of results to return
+            mode: 'dense', 'lexical' or 'hybrid' (defaults to the processor's search_mode)
+            filters: Metadata filter expression (see MetadataIndex), e.g.
+                {'doc_type': 'review', 'processed_at': {'$gte': '2026-10-01'}}
             
         Returns:
             List of relevant document chunks with metadata
         """
-        if not self.chunks:
-            return []
+        retrieval = await self.retrieve(query, top_k=top_k, mode=mode, filters=filters)
+        return retrieval['results']
+    
+    async def retrieve(self, query: str, top_k: int = 5, mode: Optional[str] = None,
+                       filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Search documents and report per-stage timings.
         
-        try:
-            # Generate query embedding
-            if self.embedding_model:
-                query_embedding = self.embedding_model.encode([query])[0]
-            else:
-                query_embedding = self._generate_mock_embedding(query)
+        Args:
+            query: Search query
+            top_k: Number of results to return
+            mode: 'dense', 'lexical' or 'hybrid' (defaults to the processor's search_mode)
+            filters: Metadata filter expression applied before scoring
             
-            # Calculate similarities
-            similarities = []
-            for chunk in self.chunks:
-                similarity = self._cosine_similarity(query_embedding, chunk['embedding'])
-                similarities.append((similarity, chunk))
+        Returns:
+            Dict with 'results' (as from search_documents) and 'timings'
+            (milliseconds per stage plus candidate counts)
             
-            # Sort by similarity and get top_k
-            similarities.sort(key=lambda x: x[0], reverse=True)
-            top_results = similarities[:top_k]
+        Raises:
+            ValueError: For an unknown mode or a malformed filter expression
+        """
+        mode = mode or self.search_mode
+        if mode not in self.SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+        
+        start = time.perf_counter()
+        timings = {'mode': mode}
+        
+        if mode != 'lexical' and not await self.wait_for_model(self.model_wait_timeout):
+            # Degrade to keyword search rather than fail while the model warms up
+            timings['degraded_from'] = mode
+            timings['mode'] = mode = 'lexical'
+        
+        await self._refresh_store()
+        # Every stage searches, and results are formatted against, this one snapshot
+        snapshot = self._snapshot
+        if filters:
+            snapshot, timings['filter_ms'] = self._filtered(snapshot, filters)
+            timings['filtered_chunks'] = snapshot.live_rows
+        if not len(snapshot):
+            return {'results': [], 'timings': timings}
+        
+        try:
+            if mode == 'hybrid':
+                rows, scores = await self._hybrid_candidates(snapshot, query, top_k, timings)
+            elif mode == 'lexical':
+                rows, scores, timings['lexical_ms'] = self._timed(self._lexical_search, snapshot, query, top_k)
+            else:
+                rows, scores, timings['dense_ms'] = await asyncio.get_running_loop().run_in_executor(
+                    None, self._timed, self._dense_search, snapshot, query, top_k)
+            results = self._format_results(snapshot, rows, scores)
             
-            # Format results
+        except Exception as e:
+            logger.error(f"Document search error: {str(e)}")
             results = []
-            for similarity, chunk in top_results:
-                doc = next((d for d in self.documents if d['id'] == chunk['doc_id']), None)
-                
-                results.append({
-                    'doc_name': doc['filename'] if doc else 'Unknown',
-                    'excerpt': self._create_excerpt(chunk['text']),
-                    'relevance_score': float(similarity),
-                    'chunk_index': chunk['chunk_index']
-                })
+        
+        timings['total_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        return {'results': results, 'timings': timings}
+    
+    async def search_documents_batch(self, queries: List[str], top_k: int = 5, mode: Optional[str] = None,
+                                     filters: Optional[Dict[str, Any]] = None) -> List[List[Dict[str, Any]]]:
+        """
+        Search documents for many queries at once.
+        
+        Args:
+            queries: Search queries
+            top_k: Number of results to return per query
+            mode: 'dense', 'lexical' or 'hybrid' (defaults to the processor's search_mode)
+            filters: Metadata filter expression applied to every query
+            
+        Returns:
+            One result list per query, in input order
+        """
+        retrieval = await self.retrieve_batch(queries, top_k=top_k, mode=mode, filters=filters)
+        return retrieval['results']
+    
+    async def retrieve_batch(self, queries: List[str], top_k: int = 5, mode: Optional[str] = None,
+                             filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Search documents for many queries at once and report how they were served.
+        
+        All queries are embedded together in one pass through the query
+        cache and micro-batcher. In dense mode, exact float32 segments are
+        scored with a single matrix-matrix product per block of queries, and
+        ANN/compressed segments are searched query by query with the same
+        embeddings. Lexical and hybrid searches run per query, hybrid reusing
+        the batch embeddings.
+        
+        Args:
+            queries: Search queries
+            top_k: Number of results to return per query
+            mode: 'dense', 'lexical' or 'hybrid' (defaults to the processor's search_mode)
+            filters: Metadata filter expression applied to every query
             
-            return results
+        Returns:
+            Dict with 'results' (one result list per query, in input order) and
+            'timings' (mode used, 'degraded_from' if the model was unavailable,
+            total milliseconds)
             
+        Raises:
+            ValueError: For an unknown mode or a malformed filter expression
+        """
+        mode = mode or self.search_mode
+        if mode not in self.SEARCH_MODES:
+            raise ValueError(f"Unknown search mode: {mode}")
+        
+        start = time.perf_counter()
+        timings = {'mode': mode}
+        
+        if mode != 'lexical' and not await self.wait_for_model(self.model_wait_timeout):
+            # Degrade to keyword search rather than fail while the model warms up
+            timings['degraded_from'] = mode
+            timings['mode'] = mode = 'lexical'
+        
+        await self._refresh_store()
+        snapshot = self._snapshot
+        if filters:
+            snapshot, timings['filter_ms'] = self._filtered(snapshot, filters)
+        if not queries or not len(snapshot):
+            return {'results': [[] for _ in queries], 'timings': timings}
+        
+        loop = asyncio.get_running_loop()
+        try:
+            if mode == 'lexical':
+                rankings = [self._lexical_search(snapshot, query, top_k) for query in queries]
+            else:
+                query_embeddings = await loop.run_in_executor(None, self._embed_queries, queries)
+                if mode == 'dense':
+                    rankings = zip(*await loop.run_in_executor(None, snapshot.search_batch, query_embeddings, top_k))
+                else:
+                    rankings = [await self._hybrid_candidates(snapshot, query, top_k, {}, embedding)
+                                for query, embedding in zip(queries, query_embeddings)]
+            results = [self._format_results(snapshot, rows, scores) for rows, scores in rankings]
         except Exception as e:
-            logger.error(f"Document search error: {str(e)}")
-            return []
+            logger.error(f"Batch document search error: {str(e)}")
+            results = [[] for _ in queries]
+        
+        timings['total_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        return {'results': results, 'timings': timings}
     
-    def _cosine_similarity(self, vec1: np.ndarray, vec2: np.ndarray) -> float:
-        """Calculate cosine similarity between two vectors"""
-        dot_product = np.dot(vec1, vec2)
-        norm1 = np.linalg.norm(vec1)
-        norm2 = np.linalg.norm(vec2)
+    def _embed_queries(self, queries: List[str]) -> np.ndarray:
+        """
+        Embed queries, serving repeats from the query cache and encoding all
+        misses through the micro-batcher, which merges them with concurrent
+        queries into one model call. Blocks; call it from a worker thread,
+        not the event loop.
+        """
+        embeddings = [self.query_cache.get(query) for query in queries]
+        missing = [i for i, embedding in enumerate(embeddings) if embedding is None]
         
-        if norm1 == 0 or norm2 == 0:
-            return 0.0
+        if missing:
+            texts = [QueryEmbeddingCache.normalize(queries[i]) for i in missing]
+            encoded = self.query_batcher.encode(texts)
+            
+            for i, embedding in zip(missing, encoded):
+                embedding = np.asarray(embedding, dtype=np.float32)
+                self.query_cache.set(queries[i], embedding)
+                embeddings[i] = embedding
         
-        return dot_product / (norm1 * norm2)
+        return np.stack(embeddings)
+    
+    def _encode_queries(self, texts: List[str]) -> np.ndarray:
+        """Encode one (micro-)batch of query texts on the embedding pool"""
+        return self.embedding_executor.call(*self._encode_job(texts, max(len(texts), 32)))
+    
+    @staticmethod
+    def _timed(fn, *args):
+        """Run fn(*args) -> (rows, scores) and append the elapsed milliseconds"""
+        start = time.perf_counter()
+        rows, scores = fn(*args)
+        return rows, scores, round((time.perf_counter() - start) * 1000, 3)
+    
+    def _filtered(self, snapshot: IndexSnapshot, filters: Dict[str, Any]):
+        """Restrict a snapshot to the documents a filter expression selects; returns (snapshot, ms)"""
+        start = time.perf_counter()
+        documents = self.metadata_index.evaluate(filters)
+        return snapshot.filtered(documents), round((time.perf_counter() - start) * 1000, 3)
+    
+    def _dense_search(self, snapshot: IndexSnapshot, query: str, top_k: int,
+                      query_embedding: Optional[np.ndarray] = None):
+        """Embed the query (unless already embedded) and find the closest visible chunk rows of the snapshot"""
+        if query_embedding is None:
+            query_embedding = self._embed_queries([query])[0]
+        return snapshot.search(query_embedding, top_k)
+    
+    def _lexical_search(self, snapshot: IndexSnapshot, query: str, top_k: int):
+        """BM25 search over the visible rows of the snapshot"""
+        return snapshot.lexical_search(query, top_k)
+    
+    async def _hybrid_candidates(self, snapshot: IndexSnapshot, query: str, top_k: int,
+                                 timings: Dict[str, Any], query_embedding: Optional[np.ndarray] = None):
+        """
+        Run dense and lexical candidate generation concurrently and fuse the two
+        rankings with reciprocal-rank fusion. Each stage is capped by its
+        candidate budget and, optionally, by a latency budget; a stage that
+        overruns is left out of the fusion rather than delaying the response.
+        The dense stage embeds the query unless `query_embedding` is given.
+        """
+        loop = asyncio.get_running_loop()
+        timeout = self.hybrid_stage_timeout_ms / 1000 if self.hybrid_stage_timeout_ms else None
+        stages = {
+            'dense': loop.run_in_executor(None, self._timed, self._dense_search, snapshot, query,
+                                          max(top_k, self.hybrid_dense_candidates), query_embedding),
+            'lexical': loop.run_in_executor(None, self._timed, self._lexical_search, snapshot, query,
+                                            max(top_k, self.hybrid_lexical_candidates)),
+        }
+        
+        async def bounded(name, future):
+            try:
+                return name, await asyncio.wait_for(future, timeout)
+            except asyncio.TimeoutError:
+                logger.warning(f"Hybrid {name} stage exceeded its {self.hybrid_stage_timeout_ms}ms budget")
+                return name, None
+        
+        rankings = []
+        for name, outcome in await asyncio.gather(*(bounded(n, f) for n, f in stages.items())):
+            if outcome is None:
+                timings[f'{name}_timed_out'] = True
+                continue
+            rows, _, timings[f'{name}_ms'] = outcome
+            timings[f'{name}_candidates'] = len(rows)
+            rankings.append(rows)
+        
+        start = time.perf_counter()
+        rows, scores = self._reciprocal_rank_fusion(rankings, top_k)
+        timings['fusion_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        return rows, scores
+    
+    def _reciprocal_rank_fusion(self, rankings: List, top_k: int):
+        """Fuse ranked row lists: score(row) = sum over lists of 1 / (rrf_k + rank)"""
+        fused: Dict[int, float] = {}
+        for ranking in rankings:
+            for rank, row in enumerate(ranking, start=1):
+                row = int(row)
+                fused[row] = fused.get(row, 0.0) + 1.0 / (self.rrf_k + rank)
+        
+        best = sorted(fused.items(), key=lambda item: item[1], reverse=True)[:top_k]
+        return [row for row, _ in best], [score for _, score in best]
+    
+    def _format_results(self, snapshot: IndexSnapshot, rows, scores) -> List[Dict[str, Any]]:
+        """Turn ranked snapshot rows into API result dicts"""
+        results = []
+        for row, score in zip(rows, scores):
+            chunk = snapshot[int(row)]
+            doc = snapshot.documents[chunk.doc_ord]
+            
+            results.append({
+                'doc_id': doc['id'],
+                'doc_name': doc['filename'],
+                'excerpt': self._create_excerpt(chunk.text),
+                'relevance_score': float(score),
+                'chunk_index': chunk.chunk_index
+            })
+        
+        return results
+    
+    def _create_embedding_store(self):
+        """Create the configured embedding storage for a sealed segment (head segments are float32)"""
+        if self.storage == 'float32':
+            return EmbeddingMatrix()
+        if self.storage == 'pq':
+            return PQEmbeddingStore(m=self.pq_subspaces, train_size=self.pq_train_size,
+                                    rescore_k=self.pq_rescore_k)
+        if self.storage == 'int8':
+            return Int8EmbeddingStore(train_size=self.int8_train_size, rescore_k=self.int8_rescore_k)
+        raise ValueError(f"Unknown embedding storage: {self.storage}")
+    
+    def _create_ann_index(self):
+        """Create the configured approximate nearest-neighbour index"""
+        if self.index_type == 'flat':
+            return None
+        if self.storage != 'float32':
+            raise ValueError(f"Index type '{self.index_type}' requires float32 embedding storage")
+        if self.index_type == 'ivf':
+            return IVFIndex(nlist=self.ivf_nlist, nprobe=self.ivf_nprobe)
+        if self.index_type == 'hnsw':
+            return HNSWIndex(M=self.hnsw_m, ef_construction=self.hnsw_ef_construction,
+                             ef_search=self.hnsw_ef_search)
+        if self.index_type == 'binary':
+            return BinaryHashIndex(rerank_k=self.binary_rerank_k)
+        raise ValueError(f"Unknown index type: {self.index_type}")
     
     def _create_excerpt(self, text: str, max_length: int = 200) -> str:
         """Create a readable excerpt from chunk"""
@@ -418,11 +1408,45 @@ class DocumentProcessor:
         
         return excerpt + '...'
     
+    def _memory_usage(self, snapshot: IndexSnapshot) -> Dict[str, int]:
+        """Heap bytes of the index by component (ANN sizes where the index reports them)"""
+        usage = {'embeddings': 0, 'ann_index': 0, 'chunk_text': 0, 'chunk_columns': 0}
+        for segment in snapshot.segments:
+            for component, nbytes in segment.memory_usage().items():
+                usage[component] += nbytes
+        usage['row_masks'] = sum(mask.nbytes for mask in snapshot.masks) + self._visible.nbytes
+        usage['metadata_index'] = self.metadata_index.nbytes
+        usage['total'] = sum(usage.values())
+        return usage
+    
     def get_statistics(self) -> Dict[str, Any]:
         """Get document processing statistics"""
+        snapshot = self._snapshot
+        live_chunks = snapshot.live_rows
         return {
-            'total_documents': len(self.documents),
-            'total_chunks': len(self.chunks),
-            'avg_chunks_per_doc': len(self.chunks) / len(self.documents) if self.documents else 0,
-            'embedding_model': self.embedding_model_name
+            'total_documents': self.document_count,
+            'total_chunks': live_chunks,
+            'avg_chunks_per_doc': live_chunks / self.document_count if self.document_count else 0,
+            'superseded_documents': len(self.documents) - self.document_count - len(self._deleted),
+            'deleted_documents': len(self._deleted),
+            'tombstoned_chunks': len(snapshot) - live_chunks,
+            'tombstone_ratio': round(self.tombstone_ratio, 4),
+            'compactions': self.compactions,
+            'segments': len(snapshot.segments),
+            'segment_merges': self.merges,
+            'embedding_model': self.embedding_model_name,
+            'index_type': self.index_type,
+            'embedding_storage': self.storage,
+            'embedding_bytes': sum(segment.embeddings.nbytes for segment in snapshot.segments),
+            'search_mode': self.search_mode,
+            'lexical_vocabulary': snapshot.vocabulary_size,
+            'metadata_index': self.metadata_index.get_statistics(),
+            'memory_bytes': self._memory_usage(snapshot),
+            'embedding_model_status': self.model_status,
+            'embedding_executor': self.embedding_executor.get_statistics(),
+            'query_batching': self.query_batcher.get_statistics(),
+            'query_embedding_cache': self.query_cache.get_statistics(),
+            'chunk_embedding_cache': self.chunk_cache.get_statistics(),
+            'store_path': self.store_path,
+            'ann_index_ready': any(segment.ann_index is not None for segment in snapshot.segments)
         }
\ No newline at end of file
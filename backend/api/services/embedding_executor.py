@@ -0,0 +1,244 @@
+"""
+Embedding Executor Service
+Runs CPU-bound embedding model calls on a dedicated worker pool, off the event loop
+"""
+
+import numpy as np
+from collections import Counter
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+from api.services.hashing_embedder import HashingEmbedder
+
+logger = logging.getLogger(__name__)
+
+# Models loaded inside process-pool workers, by name
+_worker_models: Dict[str, Any] = {}
+
+
+def encode_texts(model, texts: List[str], batch_size: int = 32, dim: int = 384) -> np.ndarray:
+    """
+    Encode texts with a loaded sentence-transformers model, or with the
+    feature-hashing embedder if `model` is None.
+
+    Returns:
+        float32 array of shape (len(texts), dim)
+    """
+    if model is None:
+        return HashingEmbedder(dim).encode(texts)
+    return np.asarray(model.encode(texts, batch_size=batch_size, show_progress_bar=False), dtype=np.float32)
+
+
+def encode_in_worker(model_name: Optional[str], texts: List[str], batch_size: int = 32,
+                     dim: int = 384) -> np.ndarray:
+    """
+    Process-pool entry point: load the model once per worker process, then encode.
+    A `model_name` of None selects the feature-hashing embedder.
+    """
+    model = None
+    if model_name is not None:
+        model = _worker_models.get(model_name)
+        if model is None:
+            from sentence_transformers import SentenceTransformer
+            model = _worker_models[model_name] = SentenceTransformer(model_name)
+    return encode_texts(model, texts, batch_size, dim)
+
+
+class EmbeddingExecutor:
+    """
+    Bounded worker pool for embedding jobs.
+
+    At most `max_pending` jobs are queued or running at once; callers beyond
+    that wait for a slot (asynchronously on the event loop, blocking in
+    worker threads), so a large upload applies back-pressure instead of
+    queueing unbounded work ahead of interactive queries.
+
+    'thread' workers share the loaded model (the model releases the GIL in
+    its native kernels); 'process' workers each load their own copy, which
+    costs memory but scales pure-Python tokenization across cores.
+    """
+
+    KINDS = ('thread', 'process')
+
+    def __init__(self, kind: str = 'thread', workers: Optional[int] = None, max_pending: int = 64):
+        """
+        Args:
+            kind: 'thread' or 'process'
+            workers: Pool size (None = number of CPUs)
+            max_pending: Jobs allowed in the pool's queue at once
+        """
+        if kind not in self.KINDS:
+            raise ValueError(f"Unknown embedding executor: {kind}")
+        if max_pending < 1:
+            raise ValueError("max_pending must be at least 1")
+
+        self.kind = kind
+        self.workers = workers or os.cpu_count() or 1
+        self.max_pending = max_pending
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._pending = 0
+        self.completed = 0
+        self.queue_waits = 0
+
+    def _get_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                if self.kind == 'process':
+                    # spawn: forking a parent that holds a loaded model is unsafe
+                    self._pool = ProcessPoolExecutor(self.workers,
+                                                     mp_context=multiprocessing.get_context('spawn'))
+                else:
+                    self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix='embedding')
+            return self._pool
+
+    def _submit(self, fn: Callable, *args) -> Future:
+        """Submit a job into an already acquired slot"""
+        try:
+            future = self._get_pool().submit(fn, *args)
+        except Exception:
+            self._slots.release()
+            raise
+        self._pending += 1
+        future.add_done_callback(self._on_done)
+        return future
+
+    def _on_done(self, _future: Future) -> None:
+        self._pending -= 1
+        self.completed += 1
+        self._slots.release()
+
+    async def run(self, fn: Callable, *args) -> Any:
+        """Run fn(*args) on the pool without blocking the event loop"""
+        if not self._slots.acquire(blocking=False):
+            self.queue_waits += 1
+            # Poll rather than block a helper thread, so cancellation never leaks a slot
+            while not self._slots.acquire(blocking=False):
+                await asyncio.sleep(0.005)
+        return await asyncio.wrap_future(self._submit(fn, *args))
+
+    def call(self, fn: Callable, *args) -> Any:
+        """Run fn(*args) on the pool from a synchronous (non event-loop) thread"""
+        if not self._slots.acquire(blocking=False):
+            self.queue_waits += 1
+            self._slots.acquire()
+        return self._submit(fn, *args).result()
+
+    def shutdown(self) -> None:
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            'kind': self.kind,
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            'pending': self._pending,
+            'completed': self.completed,
+            'queue_waits': self.queue_waits
+        }
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-query encodes into one model batch.
+
+    Callers block on `encode`; a dispatcher thread takes the first waiting
+    request, gathers more for up to `max_wait_ms` or until `max_batch`
+    texts are collected, encodes them in one call and fans the vectors
+    back out. While a batch is running, new requests queue up and form
+    the next batch, so batch size grows with load on its own.
+    """
+
+    def __init__(self, encode: Callable[[List[str]], Any], max_batch: int = 32, max_wait_ms: float = 2.0):
+        """
+        Args:
+            encode: Encodes a list of texts to an array of vectors
+            max_batch: Most texts per model call
+            max_wait_ms: Longest time the first request waits for company
+        """
+        self._encode = encode
+        self.max_batch = max_batch
+        self.max_wait_ms = max_wait_ms
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batch_sizes = Counter()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """Encode texts, sharing model calls with concurrent callers"""
+        if len(texts) >= self.max_batch:
+            # Already a full batch: nothing to gain from waiting
+            self.batch_sizes[len(texts)] += 1
+            return np.asarray(self._encode(texts), dtype=np.float32)
+
+        self._ensure_running()
+        futures = []
+        for text in texts:
+            future = Future()
+            self._queue.put((text, future))
+            futures.append(future)
+        return np.stack([future.result() for future in futures])
+
+    def _ensure_running(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='query-batcher', daemon=True)
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait_ms / 1000
+            while len(batch) < self.max_batch:
+                try:
+                    item = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                batch.append(item)
+            self._dispatch(batch)
+
+    def _dispatch(self, batch) -> None:
+        try:
+            vectors = np.asarray(self._encode([text for text, _ in batch]), dtype=np.float32)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.batch_sizes[len(batch)] += 1
+        for (_, future), vector in zip(batch, vectors):
+            future.set_result(vector)
+
+    def shutdown(self) -> None:
+        with self._lock:
+            if self._thread is not None:
+                self._queue.put(None)
+                self._thread = None
+
+    def get_statistics(self) -> Dict[str, Any]:
+        batches = sum(self.batch_sizes.values())
+        texts = sum(size * count for size, count in self.batch_sizes.items())
+        return {
+            'max_batch': self.max_batch,
+            'max_wait_ms': self.max_wait_ms,
+            'batches': batches,
+            'avg_batch_size': round(texts / batches, 2) if batches else 0.0,
+            'batch_size_histogram': {str(size): self.batch_sizes[size] for size in sorted(self.batch_sizes)}
+        }
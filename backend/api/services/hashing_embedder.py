@@ -0,0 +1,143 @@
+"""
+Hashing Embedder Service
+Model-free text embeddings from hashed word and character n-gram features
+"""
+
+import numpy as np
+from typing import List, Sequence
+import re
+
+# 64-bit odd multiplier for the polynomial rolling hash, and its inverse mod 2**64
+_BASE = 0x100000001B3
+_BASE_INVERSE = pow(_BASE, -1, 1 << 64)
+_BIGRAM_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+_WORD_BYTE = np.zeros(256, dtype=bool)
+_WORD_BYTE[[ord(c) for c in '0123456789abcdefghijklmnopqrstuvwxyz_']] = True
+_WORD_BYTE[128:] = True  # UTF-8 bytes of non-ASCII letters
+_SEPARATORS = re.compile(r'[^\w]+')
+
+
+def _mix(hashes: np.ndarray) -> np.ndarray:
+    """splitmix64 finalizer: spreads rolling-hash values over all 64 bits"""
+    z = hashes ^ (hashes >> np.uint64(30))
+    z = z * np.uint64(0xBF58476D1CE4E5B9)
+    z = z ^ (z >> np.uint64(27))
+    z = z * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def _powers(base: int, n: int) -> np.ndarray:
+    """base**0 .. base**(n-1) mod 2**64"""
+    powers = np.full(n, base, dtype=np.uint64)
+    powers[0] = 1
+    return np.cumprod(powers, dtype=np.uint64)
+
+
+class HashingEmbedder:
+    """
+    Deterministic embedder built from hashed text features.
+
+    Text is lower-cased, runs of non-word characters collapse to a single
+    space, and three feature groups are extracted:
+    - words
+    - word bigrams
+    - character n-grams, which also match inflections and typos
+    Each feature is hashed into one of `dim` buckets with a hash-derived
+    sign, so collisions cancel out instead of piling up. Bucket counts are
+    term frequencies damped with log(1 + tf). Each group is L2-normalized,
+    the groups are weighted and summed, and the result is normalized again.
+
+    A whole batch is hashed at once. Texts are concatenated into one byte
+    array, and polynomial prefix hashes over it give the hash of any
+    substring in O(1), so every n-gram of every text is hashed with a few
+    vectorized array operations. Nothing depends on process state, so
+    threads and worker processes produce identical vectors.
+    """
+
+    NAME = 'feature-hashing-v1'
+
+    def __init__(self, dim: int = 384, char_ngrams: Sequence[int] = (3, 4, 5),
+                 word_weight: float = 1.0, bigram_weight: float = 0.5, char_weight: float = 1.0):
+        """
+        Args:
+            dim: Embedding dimension (number of hash buckets)
+            char_ngrams: Character n-gram lengths, in UTF-8 bytes
+            word_weight: Weight of the word group
+            bigram_weight: Weight of the word-bigram group
+            char_weight: Weight of the character n-gram group
+        """
+        self.dim = dim
+        self.char_ngrams = tuple(char_ngrams)
+        self.weights = (word_weight, bigram_weight, char_weight)
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """
+        Embed a batch of texts.
+
+        Returns:
+            float32 array of shape (len(texts), dim), rows L2-normalized
+            (all-zero for texts without word characters)
+        """
+        n = len(texts)
+        if n == 0:
+            return np.empty((0, self.dim), dtype=np.float32)
+
+        # ' text ' per input, so word and n-gram boundaries are marked by spaces
+        encoded = [f" {_SEPARATORS.sub(' ', text.lower()).strip()} ".encode('utf-8') for text in texts]
+        lengths = np.fromiter((len(b) for b in encoded), dtype=np.int64, count=n)
+        data = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+        owner = np.repeat(np.arange(n), lengths)
+
+        # prefix[i] = hash of data[:i]; hash(data[s:e]) = prefix[e] - prefix[s] * BASE**(e - s)
+        size = data.shape[0]
+        powers = _powers(_BASE, size + 1)
+        inverse = _powers(_BASE_INVERSE, size)
+        prefix = np.zeros(size + 1, dtype=np.uint64)
+        prefix[1:] = powers[:size] * np.cumsum(data.astype(np.uint64) * inverse, dtype=np.uint64)
+
+        def substring_hashes(starts: np.ndarray, stops: np.ndarray) -> np.ndarray:
+            return prefix[stops] - prefix[starts] * powers[stops - starts]
+
+        # Words: maximal runs of word bytes
+        word = _WORD_BYTE[data]
+        edges = np.diff(word.astype(np.int8), prepend=np.int8(0), append=np.int8(0))
+        starts, stops = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+        word_hashes = _mix(substring_hashes(starts, stops))
+        word_owner = owner[starts]
+
+        same_text = word_owner[1:] == word_owner[:-1]
+        bigram_hashes = _mix(word_hashes[:-1][same_text] * _BIGRAM_MULTIPLIER + word_hashes[1:][same_text])
+        bigram_owner = word_owner[:-1][same_text]
+
+        char_hashes, char_owner = [], []
+        for length in self.char_ngrams:
+            grams = np.arange(max(size - length + 1, 0))
+            grams = grams[owner[grams] == owner[grams + length - 1]]
+            # Salt by length so n-grams of different sizes land in different buckets
+            char_hashes.append(_mix(substring_hashes(grams, grams + length) ^ np.uint64(length)))
+            char_owner.append(owner[grams])
+
+        groups = [
+            (word_hashes, word_owner),
+            (bigram_hashes, bigram_owner),
+            (np.concatenate(char_hashes), np.concatenate(char_owner)),
+        ]
+        embeddings = np.zeros((n, self.dim), dtype=np.float32)
+        for weight, (hashes, owners) in zip(self.weights, groups):
+            if weight and len(hashes):
+                embeddings += weight * self._term_frequencies(hashes, owners, n)
+        return self._normalize(embeddings)
+
+    def _term_frequencies(self, hashes: np.ndarray, owners: np.ndarray, n: int) -> np.ndarray:
+        """Signed, log-damped bucket counts per text, L2-normalized"""
+        buckets = (hashes % np.uint64(self.dim)).astype(np.int64)
+        signs = np.where(hashes >> np.uint64(63), -1.0, 1.0)
+        counts = np.bincount(owners * self.dim + buckets, weights=signs, minlength=n * self.dim)
+        counts = counts.reshape(n, self.dim)
+        return self._normalize(np.sign(counts) * np.log1p(np.abs(counts)))
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return (vectors / norms).astype(np.float32)
@@ -0,0 +1,261 @@
+"""
+Ingestion Pipeline Service
+Staged, backpressured multi-file ingestion: streamed parsing -> chunking -> batched embedding
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+
+from api.services.text_extraction import PROCESS_POOL_TYPES, Source, extract_text, extract_txt, iter_pdf_pages
+
+logger = logging.getLogger(__name__)
+
+# (filename, content_type, file bytes or spooled file path, content SHA-256 if known,
+#  logical document key or None for the filename)
+IngestionFile = Tuple[str, str, Source, Optional[str], Optional[str]]
+
+
+class _StageStats:
+    """Items and wall-clock activity span of one pipeline stage"""
+
+    def __init__(self):
+        self.items = 0
+        self.busy_seconds = 0.0
+        self._first_start = None
+        self._last_end = None
+
+    def record(self, items: int, started: float) -> None:
+        now = time.perf_counter()
+        self.items += items
+        self.busy_seconds += now - started
+        self._first_start = started if self._first_start is None else min(self._first_start, started)
+        self._last_end = now
+
+    def as_dict(self) -> Dict[str, Any]:
+        span = (self._last_end - self._first_start) if self.items else 0.0
+        return {
+            'items': self.items,
+            'busy_seconds': round(self.busy_seconds, 3),
+            'items_per_second': round(self.items / span, 2) if span > 0 else None
+        }
+
+
+class IngestionPipeline:
+    """
+    Ingests many files concurrently in three stages connected by bounded queues:
+
+    - parse: up to `parse_workers` files are extracted at once. PDFs are
+      streamed page by page while later page ranges are parsed in parallel
+      in a process pool; DOCX extraction also runs in the pool (spooled
+      files are passed by path, not by content), plain text inline
+    - chunk: each text segment (a PDF page, or a whole file) is chunked
+      with the strategy detected on the document's first segment
+    - embed: chunks from any documents are packed into batches of about
+      `embed_batch_size` for the embedding pool; a document is committed
+      once its last segment has been embedded
+
+    A document's first chunks are therefore embedded before its last page
+    is parsed. A file whose key matches a stored document replaces it:
+    chunks unchanged since that version reuse its vectors instead of being
+    embedded again. A full queue suspends the stage feeding it, so a slow
+    embedder bounds how much parsed text is held in memory. Per-stage item
+    counts (segments for parse/chunk, chunks for embed) and throughput are
+    written into the job status as they change.
+    """
+
+    def __init__(self, processor, parse_workers: Optional[int] = None, queue_size: int = 8,
+                 embed_batch_size: int = 256, pdf_pages_per_task: int = 8,
+                 pdf_max_pages: Optional[int] = None, pdf_max_chars: Optional[int] = None):
+        """
+        Args:
+            processor: DocumentProcessor that chunks, embeds and stores documents
+            parse_workers: Files parsed concurrently / parse processes (None = number of CPUs)
+            queue_size: Capacity of each inter-stage queue, in segments
+            embed_batch_size: Target chunks per embedding batch
+            pdf_pages_per_task: PDF pages extracted per parse-pool task
+            pdf_max_pages: Pages of a PDF that are ingested (None = all)
+            pdf_max_chars: Characters of a PDF that are ingested (None = all)
+        """
+        self.processor = processor
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+        self.queue_size = queue_size
+        self.embed_batch_size = embed_batch_size
+        self.pdf_pages_per_task = pdf_pages_per_task
+        self.pdf_max_pages = pdf_max_pages
+        self.pdf_max_chars = pdf_max_chars
+        self._parse_pool = None
+
+    def _get_parse_pool(self) -> ProcessPoolExecutor:
+        if self._parse_pool is None:
+            self._parse_pool = ProcessPoolExecutor(self.parse_workers,
+                                                   mp_context=multiprocessing.get_context('spawn'))
+        return self._parse_pool
+
+    def shutdown(self) -> None:
+        if self._parse_pool is not None:
+            self._parse_pool.shutdown(wait=False, cancel_futures=True)
+            self._parse_pool = None
+
+    async def _extract_segments(self, source: Source, content_type: str) -> AsyncIterator[str]:
+        """Yield a document's text in segments"""
+        if content_type == 'application/pdf':
+            async for page in iter_pdf_pages(source, self._get_parse_pool(), self.pdf_pages_per_task,
+                                             self.pdf_max_pages, self.pdf_max_chars,
+                                             max_in_flight=self.parse_workers):
+                yield page
+        elif content_type in PROCESS_POOL_TYPES:
+            loop = asyncio.get_running_loop()
+            yield await loop.run_in_executor(self._get_parse_pool(), extract_text, source, content_type)
+        else:
+            yield self.processor.handlers.get(content_type, extract_txt)(source)
+
+    @staticmethod
+    def _fail(job: Dict[str, Any], doc: Dict[str, Any], error: Exception) -> None:
+        """Record a document's failure once; later stages then skip it"""
+        if doc['failed']:
+            return
+        doc['failed'] = True
+        job['errors'].append(f"{doc['filename']}: {str(error)}")
+        logger.error(f"Error processing {doc['filename']}: {str(error)}")
+
+    async def run(self, files: List[IngestionFile], job: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Ingest files, updating `job` (an ingestion job status dict) in place.
+
+        Returns:
+            The job dict
+        """
+        job.setdefault('processed', 0)
+        job.setdefault('errors', [])
+        job['chunks_created'] = 0
+        job['chunks_embedded'] = 0
+        job['chunks_reused'] = 0
+        job['documents_replaced'] = 0
+        stats = {name: _StageStats() for name in ('parse', 'chunk', 'embed')}
+        job['stages'] = {name: s.as_dict() for name, s in stats.items()}
+
+        def record(name: str, items: int, started: float) -> None:
+            stats[name].record(items, started)
+            job['stages'][name] = stats[name].as_dict()
+
+        docs = [
+            {'filename': filename, 'content_type': content_type, 'source': source,
+             'content_sha256': content_sha256, 'doc_key': doc_key or filename, 'doc_type': None,
+             'length': 0, 'chunks': [], 'embeddings': [], 'previous': {}, 'reused': 0, 'failed': False}
+            for filename, content_type, source, content_sha256, doc_key in files
+        ]
+
+        try:
+            await self.processor.require_model()
+        except RuntimeError as e:
+            for doc in docs:
+                self._fail(job, doc, e)
+            return job
+
+        pending = iter(docs)
+        # Items are (document state, segment text or chunk list, is last segment)
+        parsed = asyncio.Queue(self.queue_size)
+        prepared = asyncio.Queue(self.queue_size)
+
+        async def parse_worker():
+            # Workers share one iterator, so each file is taken exactly once
+            for doc in pending:
+                try:
+                    doc['previous'] = await self.processor.previous_chunk_vectors(doc['doc_key'])
+                    started = time.perf_counter()
+                    async for text in self._extract_segments(doc['source'], doc['content_type']):
+                        record('parse', 1, started)
+                        await parsed.put((doc, text, False))
+                        started = time.perf_counter()
+                except Exception as e:
+                    self._fail(job, doc, e)
+                await parsed.put((doc, None, True))
+
+        async def chunk_stage():
+            while (item := await parsed.get()) is not None:
+                doc, text, last = item
+                chunks = []
+                if text is not None and text.strip() and not doc['failed']:
+                    started = time.perf_counter()
+                    try:
+                        doc['doc_type'], chunks = self.processor.chunk_text(doc['filename'], text, doc['doc_type'])
+                        doc['length'] += len(text)
+                    except Exception as e:
+                        self._fail(job, doc, e)
+                    record('chunk', 1, started)
+                await prepared.put((doc, chunks, last))
+            await prepared.put(None)
+
+        async def embed_stage():
+            finished = False
+            while not finished:
+                batch, size = [], 0
+                item = await prepared.get()
+                while item is not None:
+                    batch.append(item)
+                    size += len(item[1])
+                    # Flush a full batch, or a partial one rather than idle-wait for more
+                    if size >= self.embed_batch_size or prepared.empty():
+                        break
+                    item = prepared.get_nowait()
+                finished = item is None
+                if batch:
+                    await self._embed_and_commit(batch, job, record)
+
+        workers = [asyncio.create_task(parse_worker()) for _ in range(min(self.parse_workers, len(docs)) or 1)]
+        downstream = [asyncio.create_task(chunk_stage()), asyncio.create_task(embed_stage())]
+        await asyncio.gather(*workers)
+        await parsed.put(None)
+        await asyncio.gather(*downstream)
+        return job
+
+    async def _embed_and_commit(self, batch, job: Dict[str, Any], record) -> None:
+        """Embed the chunks of a batch of segments in one pass, then commit completed documents"""
+        started = time.perf_counter()
+        live = [(doc, chunks, last) for doc, chunks, last in batch if not doc['failed']]
+        texts = [chunk for _, chunks, _ in live for chunk in chunks]
+        previous = {}
+        for doc, _, _ in live:
+            previous.update(doc['previous'])
+        embeddings = []
+        if texts:
+            try:
+                embeddings, num_embedded = await self.processor.embed_chunks(texts, previous=previous)
+                job['chunks_embedded'] += num_embedded
+            except Exception as e:
+                for doc, _, _ in live:
+                    self._fail(job, doc, e)
+                return
+            record('embed', len(texts), started)
+
+        offset = 0
+        for doc, chunks, last in live:
+            if doc['previous']:
+                doc['reused'] += sum(self.processor.chunk_digest(chunk) in doc['previous'] for chunk in chunks)
+            doc['chunks'].extend(chunks)
+            doc['embeddings'].extend(embeddings[offset:offset + len(chunks)])
+            offset += len(chunks)
+            if last:
+                await self._commit(doc, job)
+
+    async def _commit(self, doc: Dict[str, Any], job: Dict[str, Any]) -> None:
+        chunks = doc['chunks']
+        try:
+            document = self.processor.new_document(doc['filename'], doc['content_type'], len(chunks),
+                                                   doc['length'], doc['content_sha256'], doc['doc_key'],
+                                                   doc['doc_type'])
+            result = await self.processor.commit_document(document, chunks, doc['embeddings'],
+                                                          chunks_reused=doc['reused'])
+            job['processed'] += 1
+            job['chunks_created'] += len(chunks)
+            job['chunks_reused'] += doc['reused']
+            job['documents_replaced'] += 'replaced_doc_id' in result
+        except Exception as e:
+            self._fail(job, doc, e)
+        # Release the document's text and vectors as soon as it is stored
+        doc['chunks'], doc['embeddings'], doc['previous'] = [], [], {}
@@ -0,0 +1,278 @@
+"""
+Lexical Index Service
+Incremental BM25 inverted index with early-terminating top-k retrieval over document chunks
+"""
+
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+from collections import Counter
+import logging
+import math
+import re
+
+from api.services.vector_index import top_k_indices, visible_rows
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase alphanumeric tokens"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class _Postings:
+    """Growable arrays of row ids (ascending) and term frequencies for one term"""
+
+    __slots__ = ('_rows', '_tfs', 'size', 'max_tf')
+
+    def __init__(self):
+        self._rows = np.empty(4, dtype=np.int32)
+        self._tfs = np.empty(4, dtype=np.float32)
+        self.size = 0
+        self.max_tf = 0
+
+    def append(self, row_id: int, tf: int) -> None:
+        if self.size == self._rows.shape[0]:
+            self._rows = np.resize(self._rows, self.size * 2)
+            self._tfs = np.resize(self._tfs, self.size * 2)
+        self._rows[self.size] = row_id
+        self._tfs[self.size] = tf
+        self.size += 1
+        if tf > self.max_tf:
+            self.max_tf = tf
+
+    def view(self) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Row ids and term frequencies, read at one size. Appends write past
+        `size` and resizing copies, so the view stays valid while a
+        concurrent append grows the list.
+        """
+        size = self.size
+        return self._rows[:size], self._tfs[:size]
+
+    @property
+    def nbytes(self) -> int:
+        return self._rows.nbytes + self._tfs.nbytes
+
+
+class CorpusStats:
+    """
+    Collection statistics summed over several BM25 indexes (the segments
+    of one corpus), so that scores computed by each index are comparable.
+    """
+
+    def __init__(self, indexes: List['BM25Index']):
+        self.indexes = indexes
+        self.num_docs = sum(len(index) for index in indexes)
+        total_length = sum(index.total_length for index in indexes)
+        self.avg_length = total_length / self.num_docs if self.num_docs else 0.0
+
+    def document_frequency(self, term: str) -> int:
+        return sum(index.document_frequency(term) for index in self.indexes)
+
+
+class BM25Index:
+    """
+    Incremental BM25 inverted index.
+
+    Rows are added in increasing order as chunks are ingested, so every
+    postings list stays sorted without re-sorting. Disjunctive queries use
+    MaxScore, the term-at-a-time member of the WAND family: terms are
+    processed from highest to lowest score bound, and once no unseen row
+    can reach the current top-k threshold the remaining postings are only
+    intersected with the surviving candidates instead of being scanned.
+    Conjunctive queries intersect postings, shortest list first.
+
+    Searches may run while rows are added: pass a mask no longer than the
+    rows published so far and later rows are ignored.
+    """
+
+    def __init__(self, k1: float = 1.2, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings: Dict[str, _Postings] = {}
+        self._doc_lengths = np.zeros(1024, dtype=np.float32)
+        self._num_docs = 0
+        self._total_length = 0
+        self._min_length = None
+
+    def __len__(self) -> int:
+        return self._num_docs
+
+    @property
+    def num_docs(self) -> int:
+        return self._num_docs
+
+    @property
+    def total_length(self) -> int:
+        return self._total_length
+
+    @property
+    def vocabulary_size(self) -> int:
+        return len(self._postings)
+
+    @property
+    def vocabulary(self):
+        """View of the indexed terms"""
+        return self._postings.keys()
+
+    def document_frequency(self, term: str) -> int:
+        postings = self._postings.get(term)
+        return 0 if postings is None else postings.size
+
+    @property
+    def avg_length(self) -> float:
+        return self._total_length / self._num_docs if self._num_docs else 0.0
+
+    @property
+    def nbytes(self) -> int:
+        """Approximate bytes held by postings and length arrays"""
+        return self._doc_lengths.nbytes + sum(p.nbytes for p in self._postings.values())
+
+    def add(self, row_id: int, text: str) -> None:
+        """
+        Index one chunk. Row ids must be added in increasing order.
+
+        Args:
+            row_id: Embedding row / chunk position
+            text: Chunk text
+        """
+        terms = Counter(tokenize(text))
+        length = sum(terms.values())
+
+        if row_id >= self._doc_lengths.shape[0]:
+            grown = np.zeros(max(row_id + 1, self._doc_lengths.shape[0] * 2), dtype=np.float32)
+            grown[:self._doc_lengths.shape[0]] = self._doc_lengths
+            self._doc_lengths = grown
+        self._doc_lengths[row_id] = length
+        self._num_docs += 1
+        self._total_length += length
+        self._min_length = length if self._min_length is None else min(self._min_length, length)
+
+        for term, tf in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = _Postings()
+            postings.append(row_id, tf)
+
+    @staticmethod
+    def _idf(df: int, num_docs: int) -> float:
+        return math.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+
+    def _term_scores(self, idf: float, tfs: np.ndarray, rows: np.ndarray, avg_length: float) -> np.ndarray:
+        norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[rows] / avg_length)
+        return idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+    def _upper_bound(self, idf: float, postings: _Postings, avg_length: float) -> float:
+        """Largest score the term can contribute: max tf in the shortest chunk"""
+        tf = postings.max_tf
+        norm = self.k1 * (1 - self.b + self.b * self._min_length / avg_length)
+        return idf * tf * (self.k1 + 1) / (tf + norm)
+
+    def search(self, query: str, top_k: int, match_all: bool = False,
+               mask: Optional[np.ndarray] = None,
+               stats: Optional[CorpusStats] = None) -> Tuple[List[int], List[float]]:
+        """
+        Rank rows by BM25 score.
+
+        Args:
+            query: Free-text query
+            top_k: Number of results to return
+            match_all: Only return rows containing every query term
+            mask: Boolean row visibility (see visible_rows); None = all rows
+            stats: Corpus-wide statistics when this index is one segment of
+                a larger corpus (None = this index's own)
+
+        Returns:
+            Tuple of (row ids, scores), best match first
+        """
+        query_terms = list(dict.fromkeys(tokenize(query)))
+        terms = [t for t in query_terms if t in self._postings]
+        if top_k <= 0 or not terms:
+            return [], []
+        if match_all and len(terms) < len(query_terms):
+            return [], []
+
+        stats = stats or self
+        idfs = {t: self._idf(stats.document_frequency(t), stats.num_docs) for t in terms}
+        avg_length = stats.avg_length
+        if match_all:
+            rows, scores = self._search_conjunctive(terms, idfs, avg_length)
+            if mask is not None:
+                keep = visible_rows(rows, mask)
+                rows, scores = rows[keep], scores[keep]
+        else:
+            rows, scores = self._search_maxscore(terms, idfs, top_k, avg_length, mask)
+
+        idx = top_k_indices(scores, top_k)
+        return rows[idx].tolist(), scores[idx].tolist()
+
+    def _search_conjunctive(self, terms: List[str], idfs: Dict[str, float],
+                            avg_length: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Intersect postings, shortest list first, accumulating scores for the survivors"""
+        ordered = sorted(terms, key=lambda t: self._postings[t].size)
+
+        rows, tfs = self._postings[ordered[0]].view()
+        scores = self._term_scores(idfs[ordered[0]], tfs, rows, avg_length)
+        for term in ordered[1:]:
+            postings_rows, tfs = self._postings[term].view()
+            pos, hit = self._locate(postings_rows, rows)
+            rows, scores, pos = rows[hit], scores[hit], pos[hit]
+            scores += self._term_scores(idfs[term], tfs[pos], rows, avg_length)
+            if rows.size == 0:
+                break
+
+        return rows, scores
+
+    def _search_maxscore(self, terms: List[str], idfs: Dict[str, float], top_k: int, avg_length: float,
+                         mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Disjunctive top-k with MaxScore pruning. Hidden rows are dropped as
+        postings are merged, so they never raise the pruning threshold.
+        """
+        plan = []
+        for term in terms:
+            postings = self._postings[term]
+            idf = idfs[term]
+            plan.append((self._upper_bound(idf, postings, avg_length), idf, postings))
+        plan.sort(key=lambda item: item[0], reverse=True)
+
+        # remaining[i]: best score a row can still gain from terms i..end
+        remaining = np.cumsum([ub for ub, _, _ in plan][::-1])[::-1]
+
+        rows = np.empty(0, dtype=np.int32)
+        scores = np.empty(0, dtype=np.float32)
+        for i, (_, idf, postings) in enumerate(plan):
+            threshold = -np.inf
+            if rows.size >= top_k:
+                threshold = np.partition(scores, rows.size - top_k)[rows.size - top_k]
+
+            if remaining[i] < threshold:
+                # Unseen rows cannot reach the top-k any more: drop hopeless
+                # candidates and only look the rest up in this postings list
+                keep = scores + remaining[i] >= threshold
+                rows, scores = rows[keep], scores[keep]
+                postings_rows, tfs = postings.view()
+                pos, hit = self._locate(postings_rows, rows)
+                scores[hit] += self._term_scores(idf, tfs[pos[hit]], rows[hit], avg_length)
+            else:
+                postings_rows, tfs = postings.view()
+                if mask is not None:
+                    keep = visible_rows(postings_rows, mask)
+                    postings_rows, tfs = postings_rows[keep], tfs[keep]
+                contrib = self._term_scores(idf, tfs, postings_rows, avg_length)
+                merged_rows, inverse = np.unique(np.concatenate([rows, postings_rows]), return_inverse=True)
+                merged = np.bincount(inverse, weights=np.concatenate([scores, contrib]))
+                rows, scores = merged_rows.astype(np.int32), merged.astype(np.float32)
+
+        return rows, scores
+
+    @staticmethod
+    def _locate(postings_rows: np.ndarray, rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Positions of `rows` in a sorted postings list and which of them are present"""
+        pos = np.searchsorted(postings_rows, rows)
+        pos = np.minimum(pos, max(postings_rows.size - 1, 0))
+        hit = postings_rows[pos] == rows if postings_rows.size else np.zeros(rows.size, dtype=bool)
+        return pos, hit
@@ -0,0 +1,212 @@
+"""
+Metadata Index Service
+Bitmap index over document metadata and filter expressions evaluated to document masks
+"""
+
+from datetime import datetime
+from typing import Any, Dict, Optional
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+class MetadataIndex:
+    """
+    Bitmap index over document metadata, addressed by document ordinal.
+
+    Categorical fields keep one packed bitmap (a bit per document) per
+    distinct value; processed_at is kept as a column of POSIX timestamps
+    for range predicates. A filter expression is evaluated with bitwise
+    operations on the packed bitmaps and unpacked once into a boolean mask
+    over document ordinals, which searches AND into their row masks before
+    scoring.
+
+    Filter expressions are dicts, with entries ANDed:
+        {'doc_type': 'resume'}                                  equality
+        {'content_type': ['application/pdf', 'text/plain']}     any of
+        {'filename': {'$ne': 'old.txt'}}                        $eq, $ne, $in, $nin
+        {'processed_at': {'$gte': '2026-10-01'}}                $gt, $gte, $lt, $lte
+        {'$or': [...]}, {'$and': [...]}, {'$not': {...}}        boolean combinations
+
+    Documents are only ever added; ordinals of replaced or deleted documents
+    keep their bits and are hidden by the snapshot's visibility masks.
+    """
+
+    CATEGORICAL_FIELDS = ('doc_type', 'content_type', 'filename')
+    TIME_FIELDS = ('processed_at',)
+    _RANGE_OPERATORS = {
+        '$gt': np.greater, '$gte': np.greater_equal,
+        '$lt': np.less, '$lte': np.less_equal,
+    }
+
+    def __init__(self):
+        self.size = 0
+        self._bitmaps: Dict[str, Dict[Any, np.ndarray]] = {field: {} for field in self.CATEGORICAL_FIELDS}
+        self._times = {field: np.empty(0, dtype=np.float64) for field in self.TIME_FIELDS}
+
+    def __len__(self) -> int:
+        return self.size
+
+    @property
+    def nbytes(self) -> int:
+        bitmaps = sum(bitmap.nbytes for values in self._bitmaps.values() for bitmap in values.values())
+        return bitmaps + sum(column.nbytes for column in self._times.values())
+
+    def add(self, ordinal: int, document: Dict[str, Any]) -> None:
+        """
+        Index a document's metadata.
+
+        Args:
+            ordinal: Document ordinal (documents may be added in any order)
+            document: Document metadata record
+        """
+        byte, bit = divmod(ordinal, 8)
+        for field, values in self._bitmaps.items():
+            value = document.get(field)
+            bitmap = values.get(value)
+            if bitmap is None or bitmap.shape[0] <= byte:
+                grown = np.zeros(max(byte + 1, 2 * (0 if bitmap is None else bitmap.shape[0])), dtype=np.uint8)
+                if bitmap is not None:
+                    grown[:bitmap.shape[0]] = bitmap
+                bitmap = grown
+            # np.packbits order: the first ordinal of a byte is its high bit
+            bitmap[byte] |= np.uint8(0x80 >> bit)
+            values[value] = bitmap
+
+        for field, column in self._times.items():
+            if column.shape[0] <= ordinal:
+                grown = np.full(max(ordinal + 1, 2 * column.shape[0]), np.nan)
+                grown[:column.shape[0]] = column
+                column = grown
+            column[ordinal] = self._timestamp(document.get(field), field, strict=False)
+            self._times[field] = column
+
+        self.size = max(self.size, ordinal + 1)
+
+    def evaluate(self, expression: Optional[Dict[str, Any]]) -> Optional[np.ndarray]:
+        """
+        Evaluate a filter expression.
+
+        Args:
+            expression: Filter expression (see class docstring); None or {} = no filter
+
+        Returns:
+            Boolean mask over document ordinals, or None when there is no filter
+
+        Raises:
+            ValueError: For unknown fields or operators and malformed values
+        """
+        if not expression:
+            return None
+        size = self.size
+        packed = self._evaluate(expression, size)
+        return np.unpackbits(packed, count=size).astype(bool)
+
+    def _evaluate(self, expression: Dict[str, Any], size: int) -> np.ndarray:
+        if not isinstance(expression, dict):
+            raise ValueError(f"Filter expression must be an object, got {expression!r}")
+
+        result = self._all(size)
+        for key, value in expression.items():
+            if key == '$and':
+                for part in self._expressions(key, value):
+                    result &= self._evaluate(part, size)
+            elif key == '$or':
+                matched = self._none(size)
+                for part in self._expressions(key, value):
+                    matched |= self._evaluate(part, size)
+                result &= matched
+            elif key == '$not':
+                result &= self._invert(self._evaluate(value, size), size)
+            elif key in self._bitmaps:
+                result &= self._categorical(key, value, size)
+            elif key in self._times:
+                result &= self._time_range(key, value, size)
+            else:
+                raise ValueError(f"Unknown filter field: {key}")
+        return result
+
+    @staticmethod
+    def _expressions(operator: str, value) -> list:
+        if not isinstance(value, list):
+            raise ValueError(f"{operator} takes a list of filter expressions")
+        return value
+
+    def _categorical(self, field: str, condition, size: int) -> np.ndarray:
+        if isinstance(condition, list):
+            condition = {'$in': condition}
+        elif not isinstance(condition, dict):
+            condition = {'$eq': condition}
+
+        result = self._all(size)
+        for operator, value in condition.items():
+            if operator in ('$eq', '$ne'):
+                matched = self._values(field, [value], size)
+            elif operator in ('$in', '$nin'):
+                if not isinstance(value, list):
+                    raise ValueError(f"{operator} takes a list of values")
+                matched = self._values(field, value, size)
+            else:
+                raise ValueError(f"Unsupported operator for {field}: {operator}")
+            result &= self._invert(matched, size) if operator in ('$ne', '$nin') else matched
+        return result
+
+    def _values(self, field: str, values: list, size: int) -> np.ndarray:
+        """Packed bitmap of the documents whose field has any of the values"""
+        result = self._none(size)
+        for value in values:
+            try:
+                bitmap = self._bitmaps[field].get(value)
+            except TypeError:
+                raise ValueError(f"Invalid {field} value: {value!r}")
+            if bitmap is not None:
+                n = min(bitmap.shape[0], result.shape[0])
+                result[:n] |= bitmap[:n]
+        return result
+
+    def _time_range(self, field: str, condition, size: int) -> np.ndarray:
+        if not isinstance(condition, dict):
+            raise ValueError(f"{field} filters take range operators ($gt, $gte, $lt, $lte)")
+
+        column = self._times[field][:size]
+        matched = np.ones(size, dtype=bool)
+        for operator, value in condition.items():
+            compare = self._RANGE_OPERATORS.get(operator)
+            if compare is None:
+                raise ValueError(f"Unsupported operator for {field}: {operator}")
+            # Missing timestamps are NaN and never match a range
+            matched &= compare(column, self._timestamp(value, field))
+        return np.packbits(matched)
+
+    @staticmethod
+    def _timestamp(value, field: str, strict: bool = True) -> float:
+        """POSIX timestamp of an ISO-8601 string or a number; NaN for missing values when not strict"""
+        try:
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                return float(value)
+            return datetime.fromisoformat(value).timestamp()
+        except (TypeError, ValueError):
+            if strict:
+                raise ValueError(f"Invalid {field} value: {value!r}")
+            return float('nan')
+
+    @staticmethod
+    def _all(size: int) -> np.ndarray:
+        return np.packbits(np.ones(size, dtype=bool))
+
+    @staticmethod
+    def _none(size: int) -> np.ndarray:
+        return np.zeros((size + 7) // 8, dtype=np.uint8)
+
+    def _invert(self, packed: np.ndarray, size: int) -> np.ndarray:
+        # Padding bits past the last document stay clear
+        return ~packed & self._all(size)
+
+    def get_statistics(self) -> Dict[str, Any]:
+        return {
+            'documents': self.size,
+            'distinct_values': {field: len(values) for field, values in self._bitmaps.items()},
+            'bytes': self.nbytes,
+        }
@@ -0,0 +1,260 @@
+"""
+Quantization Service
+Compact codes for chunk embeddings: product quantization with asymmetric distance tables,
+per-dimension int8 scalar quantization scored with integer dot products and sign-bit
+binary codes compared by Hamming distance
+"""
+
+import numpy as np
+from typing import Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _kmeans(points: np.ndarray, k: int, iters: int, rng: np.random.Generator) -> np.ndarray:
+    """Euclidean k-means (Lloyd) returning float32 centroids"""
+    centroids = points[rng.choice(points.shape[0], k, replace=False)].copy()
+    point_norms = (points ** 2).sum(axis=1, keepdims=True)
+
+    for _ in range(iters):
+        dists = point_norms - 2 * points @ centroids.T + (centroids ** 2).sum(axis=1)
+        assign = np.argmin(dists, axis=1)
+        counts = np.bincount(assign, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, points)
+
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # Re-seed empty clusters from random points
+        if not filled.all():
+            centroids[~filled] = points[rng.choice(points.shape[0], int((~filled).sum()))]
+
+    return centroids.astype(np.float32)
+
+
+class ProductQuantizer:
+    """
+    Product quantizer with 8-bit codes.
+
+    The vector is split into `m` sub-vectors and each one is replaced by the
+    id of its nearest centroid in a per-subspace codebook, so a 384-dim
+    float32 embedding (1536 bytes) becomes `m` bytes. Inner products against
+    a query are estimated with asymmetric distance computation: the query is
+    kept exact and one lookup table per subspace is summed over the codes.
+    """
+
+    def __init__(self, m: int = 48, ksub: int = 256, kmeans_iters: int = 15,
+                 max_train_points: int = 20000, seed: int = 0):
+        """
+        Args:
+            m: Number of subspaces (bytes per code); must divide the dimension
+            ksub: Centroids per subspace (at most 256 for uint8 codes)
+            kmeans_iters: Lloyd iterations per subspace
+            max_train_points: Cap on vectors sampled for training
+            seed: Random seed
+        """
+        if not 1 < ksub <= 256:
+            raise ValueError("ksub must be between 2 and 256 for uint8 codes")
+
+        self.m = m
+        self.ksub = ksub
+        self.kmeans_iters = kmeans_iters
+        self.max_train_points = max_train_points
+        self.seed = seed
+        self.dim = None
+        self.codebooks = None  # shape (m, ksub, dsub)
+
+    @property
+    def is_trained(self) -> bool:
+        return self.codebooks is not None
+
+    @property
+    def dsub(self) -> int:
+        return self.dim // self.m
+
+    @property
+    def code_size(self) -> int:
+        return self.m
+
+    code_dtype = np.uint8
+
+    def train(self, vectors: np.ndarray) -> None:
+        """Learn one codebook per subspace"""
+        n, dim = vectors.shape
+        if dim % self.m != 0:
+            raise ValueError(f"PQ subspaces ({self.m}) must divide the embedding dimension ({dim})")
+
+        rng = np.random.default_rng(self.seed)
+        if n > self.max_train_points:
+            vectors = vectors[rng.choice(n, self.max_train_points, replace=False)]
+
+        self.dim = dim
+        ksub = min(self.ksub, vectors.shape[0])
+        sub = vectors.reshape(vectors.shape[0], self.m, self.dsub)
+
+        self.codebooks = np.stack([
+            _kmeans(np.ascontiguousarray(sub[:, j]), ksub, self.kmeans_iters, rng)
+            for j in range(self.m)
+        ])
+        logger.info(f"PQ trained: {self.m} subspaces x {ksub} centroids on {vectors.shape[0]} vectors")
+
+    def encode(self, vectors: np.ndarray, batch_size: int = 8192) -> np.ndarray:
+        """Encode vectors to uint8 codes of shape (n, m)"""
+        vectors = np.asarray(vectors, dtype=np.float32)
+        codes = np.empty((vectors.shape[0], self.m), dtype=np.uint8)
+        centroid_norms = (self.codebooks ** 2).sum(axis=2)
+
+        for start in range(0, vectors.shape[0], batch_size):
+            sub = vectors[start:start + batch_size].reshape(-1, self.m, self.dsub)
+            for j in range(self.m):
+                dists = centroid_norms[j] - 2 * sub[:, j] @ self.codebooks[j].T
+                codes[start:start + batch_size, j] = np.argmin(dists, axis=1)
+
+        return codes
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """Reconstruct approximate vectors from codes"""
+        parts = [self.codebooks[j][codes[:, j]] for j in range(self.m)]
+        return np.concatenate(parts, axis=1)
+
+    def inner_product_table(self, query: np.ndarray) -> np.ndarray:
+        """Per-subspace lookup table of query/centroid inner products, shape (m, ksub)"""
+        q = np.asarray(query, dtype=np.float32).reshape(self.m, self.dsub)
+        return np.einsum('jkd,jd->jk', self.codebooks, q)
+
+    def score(self, table: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Asymmetric inner-product estimates for every code row"""
+        scores = np.zeros(codes.shape[0], dtype=np.float32)
+        for j in range(self.m):
+            scores += table[j][codes[:, j]]
+        return scores
+
+    def estimate(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Inner-product estimates of a query against every code row"""
+        return self.score(self.inner_product_table(query), codes)
+
+
+class ScalarQuantizer:
+    """
+    Per-dimension int8 scalar quantizer.
+
+    Each dimension gets its own scale, chosen so that the largest absolute
+    training value maps to 127, and every component is rounded to an int8
+    code. This keeps a quarter of the float32 bytes. Inner products are
+    estimated in integer arithmetic. The query is folded with the scales
+    and rounded to int16 weights, and each code row is dotted with them
+    using int32 accumulation.
+    """
+
+    code_dtype = np.int8
+
+    def __init__(self):
+        self.dim = None
+        self.scales = None  # shape (dim,)
+
+    @property
+    def is_trained(self) -> bool:
+        return self.scales is not None
+
+    @property
+    def code_size(self) -> int:
+        return self.dim
+
+    def train(self, vectors: np.ndarray) -> None:
+        """Fit one scale per dimension"""
+        self.dim = vectors.shape[1]
+        scales = np.abs(vectors).max(axis=0) / 127
+        scales[scales == 0] = 1.0
+        self.scales = scales.astype(np.float32)
+        logger.info(f"Int8 quantizer trained on {vectors.shape[0]} vectors")
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Encode vectors to int8 codes of shape (n, dim); values outside the training range saturate"""
+        codes = np.rint(np.asarray(vectors, dtype=np.float32) / self.scales)
+        return np.clip(codes, -127, 127).astype(np.int8)
+
+    def decode(self, codes: np.ndarray) -> np.ndarray:
+        """Reconstruct approximate vectors from codes"""
+        return codes.astype(np.float32) * self.scales
+
+    def query_weights(self, query: np.ndarray) -> Tuple[np.ndarray, float]:
+        """
+        Integer weights for scoring codes against a query.
+
+        Returns:
+            Tuple of (int16 weights, float factor); the inner product with a
+            code row is approximately factor * (codes @ weights)
+        """
+        folded = np.asarray(query, dtype=np.float32) * self.scales
+        # Keep dim * 127 * max|weight| within int32
+        limit = min(32767, (2 ** 31 - 1) // (127 * self.dim))
+        peak = float(np.abs(folded).max())
+        factor = peak / limit if peak > 0 else 1.0
+        return np.rint(folded / factor).astype(np.int16), factor
+
+    def estimate(self, query: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Inner-product estimates of a query against every code row"""
+        weights, factor = self.query_weights(query)
+        dots = np.einsum('ij,j->i', codes, weights, dtype=np.int32)
+        return (dots * np.float32(factor)).astype(np.float32)
+
+
+if hasattr(np, 'bitwise_count'):
+    def popcount(words: np.ndarray) -> np.ndarray:
+        """Set bits in each element of an unsigned integer array"""
+        return np.bitwise_count(words)
+else:
+    # NumPy < 2 has no popcount ufunc: count 16 bits at a time with a lookup table
+    _POPCOUNT16 = np.array([bin(i).count('1') for i in range(1 << 16)], dtype=np.uint8)
+
+    def popcount(words: np.ndarray) -> np.ndarray:
+        """Set bits in each element of an unsigned integer array"""
+        words = np.ascontiguousarray(words)
+        halves = _POPCOUNT16[words.view(np.uint16)].reshape(words.shape + (-1,))
+        return halves.sum(axis=-1, dtype=np.uint8)
+
+
+class BinaryQuantizer:
+    """
+    Sign-bit binary quantizer.
+
+    Every dimension becomes one bit: set when the component is above that
+    dimension's training mean. Centering first keeps the bits balanced for
+    embeddings that all lean the same way. Bits are packed into uint64
+    words, so a 384-dim embedding (1536 bytes) becomes 6 words (48 bytes).
+    The Hamming distance between codes tracks the angle between vectors
+    and is computed with XOR and popcount.
+    """
+
+    code_dtype = np.uint64
+
+    def __init__(self):
+        self.dim = None
+        self.thresholds = None  # shape (dim,)
+
+    @property
+    def is_trained(self) -> bool:
+        return self.thresholds is not None
+
+    @property
+    def code_size(self) -> int:
+        """uint64 words per code"""
+        return -(-self.dim // 64)
+
+    def train(self, vectors: np.ndarray) -> None:
+        """Fit one threshold per dimension"""
+        self.dim = vectors.shape[1]
+        self.thresholds = np.asarray(vectors, dtype=np.float32).mean(axis=0)
+
+    def encode(self, vectors: np.ndarray) -> np.ndarray:
+        """Encode vectors to packed sign bits of shape (n, code_size)"""
+        bits = np.atleast_2d(np.asarray(vectors, dtype=np.float32)) > self.thresholds
+        packed = np.packbits(bits, axis=1)
+        padded = np.zeros((packed.shape[0], self.code_size * 8), dtype=np.uint8)
+        padded[:, :packed.shape[1]] = packed
+        return padded.view(np.uint64)
+
+    def hamming(self, query_code: np.ndarray, codes: np.ndarray) -> np.ndarray:
+        """Hamming distance from one packed code to every code row"""
+        return popcount(codes ^ query_code).sum(axis=1, dtype=np.int32)
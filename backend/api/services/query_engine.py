@@ -5,7 +5,7 @@ Processes natural language queries and generates appropriate SQL
 
 import sqlalchemy  
 from sqlalchemy import create_engine, text
-from typing import Dict, List, Any, Optional
+from typing import Dict, Any, Optional
 import logging
 import re
 from datetime import datetime
@@ -27,9 +27,10 @@ class QueryEngine:
         self.schema = schema
         self.cache = cache
     
-    async def process_query(self, query, document_processor):
+    async def process_query(self, query, document_processor, mode: Optional[str] = None,
+                            filters: Optional[Dict[str, Any]] = None):
         logger.info(f"Processing query: {query}")
-        """Main query processing pipeline"""
+        """Main query processing pipeline; mode and filters apply to the document search"""
         try:
             query_type = self._classify_query(query)
             logger.info(f"Query: '{query}' classified as: {query_type}")
@@ -38,7 +39,8 @@ class QueryEngine:
                 'query_type': query_type,
                 'sql_results': None,
                 'document_results': None,
-                'generated_sql': None
+                'generated_sql': None,
+                'retrieval_timings': None
             }
             
             if query_type == 'sql' or query_type == 'hybrid':
@@ -48,8 +50,9 @@ class QueryEngine:
                 logger.info(f"Generated SQL: {sql_result['sql']}")
             
             if query_type == 'document' or query_type == 'hybrid':
-                doc_results = await self._process_document_query(query, document_processor)
-                result['document_results'] = doc_results
+                retrieval = await self._process_document_query(query, document_processor, mode, filters)
+                result['document_results'] = retrieval['results']
+                result['retrieval_timings'] = retrieval['timings']
         
             return result
         
@@ -332,18 +335,23 @@ class QueryEngine:
                 'data': {'columns': [], 'rows': []}
             }
     
-    async def _process_document_query(self, query: str, document_processor: Any) -> List[Dict[str, Any]]:
-        """Search documents"""
+    async def _process_document_query(self, query: str, document_processor: Any, mode: Optional[str] = None,
+                                      filters: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Search documents, keeping stage timings. An unknown mode or malformed
+        filter raises ValueError; other search errors yield no results.
+        """
         try:
             if not document_processor or len(document_processor.documents) == 0:
-                return []
+                return {'results': [], 'timings': None}
             
-            results = await document_processor.search_documents(query, top_k=5)
-            return results
+            return await document_processor.retrieve(query, top_k=5, mode=mode, filters=filters)
             
+        except ValueError:
+            raise
         except Exception as e:
             logger.error(f"Document search error: {str(e)}")
-            return []
+            return {'results': [], 'timings': None}
     
     def validate_sql(self, sql: str) -> bool:
         """Validate SQL for safety"""
@@ -0,0 +1,269 @@
+"""
+Segment Index Service
+Segmented chunk index: an append-only head segment, immutable sealed segments
+and atomically swapped snapshots, so searches never wait for ingestion
+"""
+
+from bisect import bisect_right
+from collections.abc import Sequence
+from typing import Dict, List, Optional, Tuple
+import logging
+
+import numpy as np
+
+from api.services.chunk_table import ChunkRecord, ChunkTable
+from api.services.lexical_index import BM25Index, CorpusStats
+from api.services.vector_index import EmbeddingMatrix, selected_rows, top_k_indices, top_k_indices_2d
+
+logger = logging.getLogger(__name__)
+
+
+class Segment:
+    """
+    A run of chunk rows with its own embedding storage, BM25 index and,
+    once sealed, an optional ANN index. Rows are numbered from 0 within
+    the segment.
+
+    The head segment only ever grows by appending, and rows a snapshot has
+    published are never modified, so searches can read it while ingestion
+    appends to it. Sealed segments never change; merges build new ones.
+    """
+
+    def __init__(self, embeddings, chunks=None, offset: int = 0):
+        """
+        Args:
+            embeddings: Embedding storage whose row i belongs to segment row i
+            chunks: Sequence of ChunkRecords (a new ChunkTable if omitted)
+            offset: Position of segment row 0 in `chunks`
+        """
+        self.embeddings = embeddings
+        self.chunks = ChunkTable() if chunks is None else chunks
+        self.offset = offset
+        self.lexical_index = BM25Index()
+        self.ann_index = None
+        # Document ordinal -> its (contiguous) rows in this segment
+        self.doc_rows: Dict[int, range] = {}
+        self.sealed = False
+        # Built by a merge: configured storage and, if large enough, an ANN index
+        self.built = False
+        self.size = 0
+        self._doc_ords = np.empty(256, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def chunk(self, row: int) -> ChunkRecord:
+        return self.chunks[self.offset + row]
+
+    def index(self, rows: range) -> None:
+        """
+        Index rows whose chunks and embeddings were just appended.
+
+        Args:
+            rows: New segment rows, continuing from the current size
+        """
+        if rows.stop > self._doc_ords.shape[0]:
+            grown = np.empty(max(rows.stop, self._doc_ords.shape[0] * 2), dtype=np.int64)
+            grown[:self.size] = self._doc_ords[:self.size]
+            self._doc_ords = grown
+
+        for row in rows:
+            chunk = self.chunk(row)
+            self.lexical_index.add(row, chunk.text)
+            ordinal = chunk.doc_ord
+            self._doc_ords[row] = ordinal
+            span = self.doc_rows.get(ordinal)
+            self.doc_rows[ordinal] = range(row if span is None else span.start, row + 1)
+        self.size = max(self.size, rows.stop)
+
+    def visibility(self, visible_documents: np.ndarray) -> np.ndarray:
+        """Mask of the rows whose document is visible, for the rows indexed so far"""
+        ords = self._doc_ords[:self.size]
+        mask = np.zeros(self.size, dtype=bool)
+        inside = ords < len(visible_documents)
+        mask[inside] = visible_documents[ords[inside]]
+        return mask
+
+    def take(self, rows) -> np.ndarray:
+        """Vectors of the given rows: exact where stored, else reconstructed from compressed codes"""
+        vectors = self.embeddings.take(rows)
+        return vectors if vectors is not None else self.embeddings.reconstruct(rows)
+
+    def memory_usage(self) -> Dict[str, int]:
+        """
+        Heap bytes held by the segment, by component. Memory-mapped store
+        rows and chunk records live in the page cache and count as 0.
+        """
+        columns = self.chunks.memory_usage() if isinstance(self.chunks, ChunkTable) else {}
+        text = columns.pop('text_arena', 0)
+        return {
+            'embeddings': self.embeddings.nbytes,
+            'ann_index': getattr(self.ann_index, 'nbytes', 0),
+            'chunk_text': text,
+            'chunk_columns': sum(columns.values()) + self._doc_ords.nbytes,
+        }
+
+    def build_ann(self, index) -> None:
+        """Train (if needed) and fill an ANN index over every row of a sealed segment"""
+        vectors = self.embeddings.vectors
+        if index.requires_training:
+            index.train(vectors)
+        index.add(vectors, range(len(vectors)))
+        self.ann_index = index
+
+    @property
+    def batchable(self) -> bool:
+        """Whether search_batch scores the segment exactly with matrix products"""
+        return self.ann_index is None and isinstance(self.embeddings, EmbeddingMatrix)
+
+    def search(self, query: np.ndarray, top_k: int, mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Closest visible rows, through the ANN index if the segment has one and
+        the mask leaves too many rows to score them all exactly
+        """
+        if self.ann_index is not None and selected_rows(mask) is None:
+            return self.ann_index.search(self.embeddings.vectors, query, top_k, mask=mask)
+        return self.embeddings.search(query, top_k, mask=mask)
+
+    def search_batch(self, queries: np.ndarray, top_k: int, mask: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        return self.embeddings.search_batch(queries, top_k, mask=mask)
+
+    def lexical_search(self, query: str, top_k: int, mask: np.ndarray,
+                       stats: Optional[CorpusStats] = None) -> Tuple[List[int], List[float]]:
+        return self.lexical_index.search(query, top_k, mask=mask, stats=stats)
+
+
+class IndexSnapshot(Sequence):
+    """
+    Consistent, immutable view of a segmented index.
+
+    Holds the segments, one visibility mask per segment and the document
+    records chunks refer to. A mask's length is the number of rows
+    published in its segment, so rows appended later stay invisible.
+    Snapshot rows number the published rows of all segments consecutively
+    and only address chunks within the snapshot that returned them.
+
+    Writers never modify a snapshot: they build the next one and swap it in
+    with a single assignment. A search that reads the current snapshot once
+    is isolated from concurrent ingestion, deletions and merges.
+
+    As a Sequence, the snapshot holds its published chunk records in row order.
+    """
+
+    def __init__(self, segments=(), masks=(), documents=()):
+        self.segments = tuple(segments)
+        self.masks = tuple(masks)
+        self.documents = documents
+        self.starts = [0]
+        for mask in self.masks:
+            self.starts.append(self.starts[-1] + len(mask))
+
+    def __len__(self) -> int:
+        return self.starts[-1]
+
+    def __getitem__(self, row: int) -> ChunkRecord:
+        if row < 0:
+            row += len(self)
+        if not 0 <= row < len(self):
+            raise IndexError("snapshot row out of range")
+        i = bisect_right(self.starts, row) - 1
+        return self.segments[i].chunk(row - self.starts[i])
+
+    def __iter__(self):
+        for segment, mask in zip(self.segments, self.masks):
+            for row in range(len(mask)):
+                yield segment.chunk(row)
+
+    @property
+    def live_rows(self) -> int:
+        return sum(int(np.count_nonzero(mask)) for mask in self.masks)
+
+    @property
+    def vocabulary_size(self) -> int:
+        """Distinct terms across all segments"""
+        return len(set().union(*(segment.lexical_index.vocabulary for segment in self.segments)))
+
+    def filtered(self, document_mask: np.ndarray) -> 'IndexSnapshot':
+        """
+        The same snapshot restricted to chunks of the documents a mask over
+        document ordinals selects. Rows keep their numbers, so the filtered
+        snapshot formats results exactly like this one.
+        """
+        masks = [mask & segment.visibility(document_mask)[:len(mask)]
+                 for segment, mask in zip(self.segments, self.masks)]
+        return IndexSnapshot(self.segments, masks, self.documents)
+
+    def _parts(self):
+        """(first snapshot row, segment, mask) of every segment with visible rows"""
+        return [(start, segment, mask) for start, segment, mask in zip(self.starts, self.segments, self.masks)
+                if mask.any()]
+
+    @staticmethod
+    def _best(rows: List[np.ndarray], scores: List[np.ndarray], top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        if not rows:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        rows, scores = np.concatenate(rows), np.concatenate(scores)
+        idx = top_k_indices(scores, top_k)
+        return rows[idx], scores[idx]
+
+    def search(self, query: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Dense search over every segment, merged by score.
+
+        Returns:
+            Tuple of (snapshot rows, scores), best match first
+        """
+        rows, scores = [], []
+        for start, segment, mask in self._parts():
+            seg_rows, seg_scores = segment.search(query, top_k, mask)
+            rows.append(np.asarray(seg_rows, dtype=np.int64) + start)
+            scores.append(np.asarray(seg_scores, dtype=np.float32))
+        return self._best(rows, scores, top_k)
+
+    def search_batch(self, queries: np.ndarray, top_k: int) -> Tuple[List[np.ndarray], List[np.ndarray]]:
+        """
+        Dense search for many embedded queries, merged by score.
+
+        Batchable segments are scored with matrix products over blocks of
+        queries; ANN and compressed segments are searched query by query
+        with the same embeddings.
+
+        Returns:
+            Tuple of (snapshot rows, scores): one array per query, best match first
+        """
+        n = len(queries)
+        rows, scores = [np.empty((n, 0), dtype=np.int64)], [np.empty((n, 0), dtype=np.float32)]
+        for start, segment, mask in self._parts():
+            if segment.batchable:
+                seg_rows, seg_scores = segment.search_batch(queries, top_k, mask)
+            else:
+                # Short per-query results are padded with -1 rows scoring -inf
+                seg_rows = np.full((n, top_k), -1 - start, dtype=np.int64)
+                seg_scores = np.full((n, top_k), -np.inf, dtype=np.float32)
+                for i, query in enumerate(queries):
+                    found, found_scores = segment.search(query, top_k, mask)
+                    seg_rows[i, :len(found)] = found
+                    seg_scores[i, :len(found)] = found_scores
+            rows.append(seg_rows + start)
+            scores.append(seg_scores)
+        rows, scores = np.concatenate(rows, axis=1), np.concatenate(scores, axis=1)
+        idx = top_k_indices_2d(scores, top_k)
+        rows, scores = np.take_along_axis(rows, idx, axis=1), np.take_along_axis(scores, idx, axis=1)
+        found = rows >= 0
+        return [r[f] for r, f in zip(rows, found)], [s[f] for s, f in zip(scores, found)]
+
+    def lexical_search(self, query: str, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        BM25 search over every segment. Term statistics are summed across
+        segments so scores from different segments are comparable.
+
+        Returns:
+            Tuple of (snapshot rows, scores), best match first
+        """
+        stats = CorpusStats([segment.lexical_index for segment in self.segments])
+        rows, scores = [], []
+        for start, segment, mask in self._parts():
+            seg_rows, seg_scores = segment.lexical_search(query, top_k, mask, stats)
+            rows.append(np.asarray(seg_rows, dtype=np.int64) + start)
+            scores.append(np.asarray(seg_scores, dtype=np.float32))
+        return self._best(rows, scores, top_k)
@@ -0,0 +1,198 @@
+"""
+Text Extraction Service
+Plain-text extraction for uploaded document formats
+
+Functions are module-level so extraction can run in a process pool. Each
+accepts either the file's bytes or the path of a spooled copy; paths are
+parsed as streams or through a read-only mmap, so the raw file is never
+copied into the heap.
+"""
+
+from contextlib import contextmanager
+from typing import AsyncIterator, List, Optional, Union
+import asyncio
+import io
+import logging
+import mmap
+import os
+
+logger = logging.getLogger(__name__)
+
+# File content, or the path of a spooled file
+Source = Union[bytes, str]
+
+
+@contextmanager
+def open_source(source: Source):
+    """Binary file object over the source"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        yield io.BytesIO(source)
+    else:
+        with open(source, 'rb') as f:
+            yield f
+
+
+@contextmanager
+def source_buffer(source: Source):
+    """Buffer over the source: the bytes themselves or a read-only mmap of the file"""
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        yield source
+    elif os.path.getsize(source) == 0:
+        yield b""
+    else:
+        with open(source, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+PDF_PLACEHOLDER = "PDF content placeholder - install PyPDF2 for actual extraction"
+
+
+def pdf_page_count(content: Source) -> Optional[int]:
+    """Number of pages, or None if PyPDF2 is not installed"""
+    try:
+        import PyPDF2
+    except ImportError:
+        logger.warning("PyPDF2 not available, using placeholder text")
+        return None
+    with open_source(content) as pdf_file:
+        return len(PyPDF2.PdfReader(pdf_file).pages)
+
+
+def extract_pdf_pages(content: Source, start: int, stop: int) -> List[str]:
+    """Text of pages [start, stop); module-level so page ranges can run in a process pool"""
+    import PyPDF2
+    with open_source(content) as pdf_file:
+        pages = PyPDF2.PdfReader(pdf_file).pages
+        return [pages[i].extract_text() or "" for i in range(start, min(stop, len(pages)))]
+
+
+def _capped(pages, max_chars: Optional[int]):
+    """Yield pages until max_chars characters have been produced, truncating the last one"""
+    remaining = max_chars
+    for page in pages:
+        if remaining is not None:
+            if remaining <= 0:
+                return
+            page = page[:remaining]
+            remaining -= len(page)
+        yield page
+
+
+def extract_pdf(content: Source, max_pages: Optional[int] = None, max_chars: Optional[int] = None) -> str:
+    """Extract text from PDF, optionally capped at a number of pages or characters"""
+    count = pdf_page_count(content)
+    if count is None:
+        return PDF_PLACEHOLDER
+    if max_pages:
+        count = min(count, max_pages)
+
+    # Collect pages and join once: repeated string concatenation is quadratic
+    pages = _capped(extract_pdf_pages(content, 0, count), max_chars)
+    return "".join(page + "\n" for page in pages)
+
+
+async def iter_pdf_pages(content: Source, executor=None, pages_per_task: int = 8,
+                         max_pages: Optional[int] = None, max_chars: Optional[int] = None,
+                         max_in_flight: int = 4) -> AsyncIterator[str]:
+    """
+    Stream page texts in order while later page ranges are still being parsed.
+
+    Ranges of `pages_per_task` pages are extracted in `executor` (a process
+    pool parses them in parallel), keeping at most `max_in_flight` ranges
+    ahead of the consumer. Pass a spooled path rather than bytes when the
+    executor is a process pool, so only the path is pickled.
+    """
+    loop = asyncio.get_running_loop()
+    count = await loop.run_in_executor(executor, pdf_page_count, content)
+    if count is None:
+        yield PDF_PLACEHOLDER
+        return
+    if max_pages:
+        count = min(count, max_pages)
+
+    ranges = iter(range(0, count, pages_per_task))
+    in_flight = []
+
+    def submit_next() -> None:
+        start = next(ranges, None)
+        if start is not None:
+            in_flight.append(loop.run_in_executor(executor, extract_pdf_pages, content,
+                                                  start, min(start + pages_per_task, count)))
+
+    for _ in range(max_in_flight):
+        submit_next()
+
+    remaining = max_chars
+    try:
+        while in_flight:
+            batch = await in_flight.pop(0)
+            submit_next()
+            for page in batch:
+                if remaining is not None:
+                    if remaining <= 0:
+                        return
+                    page = page[:remaining]
+                    remaining -= len(page)
+                yield page
+    finally:
+        for future in in_flight:
+            future.cancel()
+
+
+def extract_docx(content: Source) -> str:
+    """Extract text from DOCX"""
+    try:
+        import docx
+        with open_source(content) as docx_file:
+            doc = docx.Document(docx_file)
+        return "\n".join([paragraph.text for paragraph in doc.paragraphs])
+    except ImportError:
+        logger.warning("python-docx not available, using placeholder text")
+        return "DOCX content placeholder - install python-docx for actual extraction"
+
+
+def extract_txt(content: Source) -> str:
+    """Extract text from plain text file"""
+    with source_buffer(content) as buffer:
+        try:
+            return str(buffer, 'utf-8')
+        except UnicodeDecodeError:
+            return str(buffer, 'latin-1')
+
+
+def extract_csv(content: Source) -> str:
+    """Extract text from CSV"""
+    try:
+        import csv
+        with open_source(content) as raw:
+            reader = csv.DictReader(io.TextIOWrapper(raw, encoding='utf-8', newline=''))
+
+            # Convert CSV to readable text
+            rows = []
+            for row in reader:
+                row_text = ", ".join([f"{k}: {v}" for k, v in row.items()])
+                rows.append(row_text)
+
+        return "\n".join(rows)
+    except Exception as e:
+        logger.error(f"CSV processing error: {str(e)}")
+        return extract_txt(content)
+
+
+HANDLERS = {
+    'application/pdf': extract_pdf,
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document': extract_docx,
+    'text/plain': extract_txt,
+    'text/csv': extract_csv,
+}
+
+# Formats whose parsers are CPU-heavy enough to be worth a process hop
+PROCESS_POOL_TYPES = {
+    'application/pdf',
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+}
+
+
+def extract_text(content: Source, content_type: str) -> str:
+    """Extract text with the handler for `content_type` (plain text by default)"""
+    return HANDLERS.get(content_type, extract_txt)(content)
@@ -0,0 +1,87 @@
+"""
+Upload Spool Service
+Streams uploads to disk in fixed-size chunks with incremental hashing and size limits
+"""
+
+from typing import Optional
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+SPOOL_CHUNK_SIZE = 1024 * 1024
+
+
+class FileTooLargeError(ValueError):
+    """Raised when an upload exceeds the configured size limit"""
+
+    def __init__(self, filename: str, max_bytes: int):
+        super().__init__(f"{filename} exceeds the {max_bytes // (1024 * 1024)}MB upload limit")
+        self.filename = filename
+        self.max_bytes = max_bytes
+
+
+class SpooledUpload:
+    """An upload copied to the spool directory"""
+
+    __slots__ = ('filename', 'content_type', 'path', 'size', 'sha256')
+
+    def __init__(self, filename: str, content_type: str, path: str, size: int, sha256: str):
+        self.filename = filename
+        self.content_type = content_type
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+
+    def remove(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+async def spool_upload(file, spool_dir: Optional[str], max_bytes: int,
+                       chunk_size: int = SPOOL_CHUNK_SIZE) -> SpooledUpload:
+    """
+    Copy an upload to the spool directory without holding it in memory.
+
+    The content is read `chunk_size` bytes at a time and hashed as it is
+    written (disk writes run on the default executor, off the event loop);
+    the copy stops, and its partial file is removed, as soon as
+    more than `max_bytes` have been seen.
+
+    Args:
+        file: Object with async read(n), `filename` and `content_type` (e.g. UploadFile)
+        spool_dir: Directory for spooled files (None = system temp directory)
+        max_bytes: Largest accepted upload
+
+    Raises:
+        FileTooLargeError: The upload is larger than max_bytes
+    """
+    filename = file.filename or 'upload'
+    declared = getattr(file, 'size', None)
+    if declared is not None and declared > max_bytes:
+        raise FileTooLargeError(filename, max_bytes)
+
+    if spool_dir:
+        os.makedirs(spool_dir, exist_ok=True)
+    fd, path = tempfile.mkstemp(prefix='upload_', suffix=os.path.splitext(filename)[1], dir=spool_dir)
+    loop = asyncio.get_running_loop()
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with os.fdopen(fd, 'wb') as out:
+            while chunk := await file.read(chunk_size):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise FileTooLargeError(filename, max_bytes)
+                digest.update(chunk)
+                await loop.run_in_executor(None, out.write, chunk)
+    except BaseException:
+        os.remove(path)
+        raise
+
+    return SpooledUpload(filename, file.content_type, path, size, digest.hexdigest())
@@ -0,0 +1,912 @@
+"""
+Vector Index Service
+Dense embedding storage and similarity search primitives for document chunks
+"""
+
+import numpy as np
+from typing import Dict, List, Optional, Tuple
+import heapq
+import logging
+import math
+import os
+import tempfile
+
+from api.services.quantization import BinaryQuantizer, ProductQuantizer, ScalarQuantizer
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    """
+    L2-normalize vectors row-wise as float32.
+
+    Zero vectors are left as zeros so they score 0 against any query.
+    """
+    vectors = np.atleast_2d(np.asarray(vectors, dtype=np.float32))
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+def top_k_indices(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Return indices of the k highest scores, best first.
+
+    Uses a partial selection (argpartition) so only the k winners are
+    sorted, instead of sorting the whole score vector.
+    """
+    n = scores.shape[0]
+    if k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+    if k >= n:
+        return np.argsort(-scores, kind='stable')
+    candidates = np.argpartition(-scores, k - 1)[:k]
+    return candidates[np.argsort(-scores[candidates], kind='stable')]
+
+
+def top_k_indices_2d(scores: np.ndarray, k: int) -> np.ndarray:
+    """Row-wise top_k_indices for a (queries, rows) score matrix"""
+    n = scores.shape[1]
+    k = min(k, n)
+    if k <= 0:
+        return np.empty((scores.shape[0], 0), dtype=np.int64)
+    if k < n:
+        candidates = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    else:
+        candidates = np.broadcast_to(np.arange(n), scores.shape)
+    picked = np.take_along_axis(scores, candidates, axis=1)
+    order = np.argsort(-picked, axis=1, kind='stable')
+    return np.take_along_axis(candidates, order, axis=1)
+
+
+def visible_rows(rows: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """
+    Boolean selector of the rows a visibility mask lets through.
+
+    Rows at or past the end of the mask are hidden, so rows appended after
+    the mask was published stay invisible until a longer mask replaces it.
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    inside = rows < len(mask)
+    keep = np.zeros(rows.shape, dtype=bool)
+    keep[inside] = mask[rows[inside]]
+    return keep
+
+
+def selected_rows(mask: np.ndarray, max_fraction: float = 0.1) -> Optional[np.ndarray]:
+    """
+    Ids of the visible rows when a mask hides most of them, else None.
+
+    Gathering and scoring only the visible rows costs less than scoring
+    every row and masking once at most `max_fraction` of them remain.
+    """
+    if mask is None:
+        return None
+    rows = np.flatnonzero(mask)
+    return rows if len(rows) <= max_fraction * len(mask) else None
+
+
+def mask_scores(scores: np.ndarray, mask: np.ndarray) -> Tuple[np.ndarray, int]:
+    """
+    Hide masked-out rows from a score vector (or the columns of a score matrix)
+    computed over the first len(mask) rows.
+
+    Returns:
+        Tuple of (scores with hidden rows at -inf, number of visible rows)
+    """
+    return np.where(mask, scores, -np.inf).astype(np.float32, copy=False), int(np.count_nonzero(mask))
+
+
+class EmbeddingMatrix:
+    """
+    Growable, contiguous float32 matrix of pre-normalized embeddings.
+
+    Row i holds the embedding of chunk i. Capacity grows geometrically so
+    appends are amortized O(1), and search scores every row with a single
+    matrix-vector product.
+    """
+
+    def __init__(self, dim: int = None, initial_capacity: int = 1024):
+        self.dim = dim
+        self.initial_capacity = initial_capacity
+        self._data = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """View of the populated rows (no copy)"""
+        if self._data is None:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        return self._data[:self._size]
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes allocated for the matrix, including spare capacity"""
+        return 0 if self._data is None else self._data.nbytes
+
+    def _reserve(self, capacity: int) -> None:
+        """Ensure room for at least `capacity` rows"""
+        if self._data is not None and self._data.shape[0] >= capacity:
+            return
+
+        new_capacity = max(capacity, self.initial_capacity)
+        if self._data is not None:
+            new_capacity = max(new_capacity, self._data.shape[0] * 2)
+
+        data = np.empty((new_capacity, self.dim), dtype=np.float32)
+        if self._data is not None:
+            data[:self._size] = self._data[:self._size]
+        self._data = data
+
+    def append(self, vectors) -> range:
+        """
+        Normalize and append embeddings.
+
+        Args:
+            vectors: Sequence of embedding vectors or a 2-D array
+
+        Returns:
+            Range of row ids assigned to the new vectors
+        """
+        if len(vectors) == 0:
+            return range(self._size, self._size)
+
+        block = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        if self.dim is None:
+            self.dim = block.shape[1]
+        elif block.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension mismatch: expected {self.dim}, got {block.shape[1]}")
+
+        start = self._size
+        self._reserve(start + block.shape[0])
+        self._data[start:start + block.shape[0]] = block
+        self._size += block.shape[0]
+        return range(start, self._size)
+
+    def take(self, rows) -> np.ndarray:
+        """Copy of the stored (normalized) vectors of the given rows"""
+        return np.array(self.vectors[rows])
+
+    def search(self, query: np.ndarray, top_k: int,
+               mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Exact cosine-similarity search.
+
+        Args:
+            query: Query embedding (need not be normalized)
+            top_k: Number of results to return
+            mask: Boolean row visibility (see visible_rows); None = all rows
+
+        Returns:
+            Tuple of (row ids, scores), best match first
+        """
+        if len(self) == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        q = normalize_rows(query)[0]
+        rows = selected_rows(mask)
+        if rows is not None:
+            scores = self.vectors[rows] @ q
+            idx = top_k_indices(scores, top_k)
+            return rows[idx], scores[idx]
+        if mask is None:
+            scores = self.vectors @ q
+        else:
+            scores, visible = mask_scores(self.vectors[:len(mask)] @ q, mask)
+            top_k = min(top_k, visible)
+        idx = top_k_indices(scores, top_k)
+        return idx, scores[idx]
+
+    def search_batch(self, queries: np.ndarray, top_k: int, block_size: int = 64,
+                     mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Exact search for many queries with matrix-matrix products.
+
+        Queries are scored in blocks so the score matrix stays bounded at
+        block_size x corpus size.
+
+        Args:
+            queries: (num_queries, dim) query embeddings
+            top_k: Number of results per query
+            block_size: Queries scored per matrix product
+            mask: Boolean row visibility (see visible_rows); None = all rows
+
+        Returns:
+            Tuple of (row ids, scores), each shaped (num_queries, k)
+        """
+        q = normalize_rows(queries)
+        vectors = self.vectors if mask is None else self.vectors[:len(mask)]
+        k = min(top_k, len(vectors) if mask is None else int(np.count_nonzero(mask)))
+        rows = np.empty((q.shape[0], k), dtype=np.int64)
+        scores = np.empty((q.shape[0], k), dtype=np.float32)
+        if k <= 0:
+            return rows, scores
+
+        for start in range(0, q.shape[0], block_size):
+            block_scores = q[start:start + block_size] @ vectors.T
+            if mask is not None:
+                block_scores, _ = mask_scores(block_scores, mask)
+            idx = top_k_indices_2d(block_scores, k)
+            rows[start:start + block_size] = idx
+            scores[start:start + block_size] = np.take_along_axis(block_scores, idx, axis=1)
+        return rows, scores
+
+
+def _grow_rows(array: Optional[np.ndarray], size: int, needed: int, width: int,
+               dtype, min_capacity: int = 1024) -> np.ndarray:
+    """Return an array with room for `needed` rows, doubling capacity as required"""
+    if array is not None and array.shape[0] >= needed:
+        return array
+
+    capacity = max(needed, min_capacity)
+    if array is not None:
+        capacity = max(capacity, array.shape[0] * 2)
+
+    grown = np.empty((capacity, width), dtype=dtype)
+    if array is not None:
+        grown[:size] = array[:size]
+    return grown
+
+
+class DiskVectorFile:
+    """
+    Append-only float32 vectors on disk, read back through a memory map.
+
+    Compressed stores keep their exact vectors here for rescoring, so the
+    full-precision copy costs page cache rather than process memory.
+    """
+
+    def __init__(self, dim: int, path: str = None):
+        """
+        Args:
+            dim: Vector dimension
+            path: File to write; a temporary file is used (and removed on close) if omitted
+        """
+        self.dim = dim
+        self._owns_file = path is None
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix='embeddings_', suffix='.f32')
+            os.close(fd)
+        else:
+            open(path, 'wb').close()
+
+        self.path = path
+        self._size = 0
+        self._map = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, vectors: np.ndarray) -> None:
+        block = np.ascontiguousarray(vectors, dtype=np.float32)
+        with open(self.path, 'ab') as f:
+            f.write(block.tobytes())
+        self._size += block.shape[0]
+        self._map = None
+
+    def take(self, rows) -> np.ndarray:
+        """Read the given rows into memory"""
+        if self._map is None:
+            self._map = np.memmap(self.path, dtype=np.float32, mode='r', shape=(self._size, self.dim))
+        return np.asarray(self._map[rows])
+
+    def close(self) -> None:
+        self._map = None
+        if self._owns_file and os.path.exists(self.path):
+            os.remove(self.path)
+
+    def __del__(self):
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class QuantizedEmbeddingStore:
+    """
+    Compressed embedding storage with the EmbeddingMatrix interface.
+
+    Rows are buffered as float32 until `train_size` embeddings exist; the
+    quantizer is then trained and every row is kept as a compact code.
+    Search ranks all codes with the quantizer's inner-product estimates
+    and, if `rescore_k` > 0, re-ranks the best `rescore_k` candidates
+    exactly against float vectors kept in a DiskVectorFile.
+    """
+
+    def __init__(self, quantizer, train_size: int = 5000, rescore_k: int = 100, rescore_path: str = None):
+        """
+        Args:
+            quantizer: Untrained quantizer (ProductQuantizer or ScalarQuantizer)
+            train_size: Number of embeddings to buffer before training
+            rescore_k: Candidates re-ranked exactly (0 disables rescoring)
+            rescore_path: File for exact vectors (temporary file if omitted)
+        """
+        self.quantizer = quantizer
+        self.train_size = train_size
+        self.rescore_k = rescore_k
+        self.rescore_path = rescore_path
+        self.dim = None
+        self._buffer = EmbeddingMatrix()
+        self._codes = None
+        self._size = 0
+        self._exact = None
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def is_trained(self) -> bool:
+        return self.quantizer.is_trained
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes of embedding data held in memory"""
+        codes = 0 if self._codes is None else self._codes.nbytes
+        return self._buffer.nbytes + codes
+
+    def _train(self) -> None:
+        vectors = self._buffer.vectors
+        self.quantizer.train(vectors)
+        self._codes = _grow_rows(None, 0, len(vectors), self.quantizer.code_size, self.quantizer.code_dtype)
+        self._codes[:len(vectors)] = self.quantizer.encode(vectors)
+
+        if self.rescore_k > 0:
+            self._exact = DiskVectorFile(self.dim, self.rescore_path)
+            self._exact.append(vectors)
+
+        # Release the float buffer; from here on only codes stay in memory
+        self._buffer = EmbeddingMatrix()
+
+    def append(self, vectors) -> range:
+        """Normalize, encode and append embeddings"""
+        if len(vectors) == 0:
+            return range(self._size, self._size)
+
+        if not self.is_trained:
+            rows = self._buffer.append(vectors)
+            self.dim = self._buffer.dim
+            self._size = len(self._buffer)
+            if self._size >= self.train_size:
+                self._train()
+            return rows
+
+        block = normalize_rows(np.asarray(vectors, dtype=np.float32))
+        start = self._size
+        self._codes = _grow_rows(self._codes, start, start + block.shape[0], self.quantizer.code_size,
+                                 self.quantizer.code_dtype)
+        self._codes[start:start + block.shape[0]] = self.quantizer.encode(block)
+        if self._exact is not None:
+            self._exact.append(block)
+
+        self._size += block.shape[0]
+        return range(start, self._size)
+
+    def take(self, rows) -> Optional[np.ndarray]:
+        """Exact vectors of the given rows, or None once only lossy codes are kept"""
+        if not self.is_trained:
+            return self._buffer.take(rows)
+        if self._exact is None:
+            return None
+        return self._exact.take(rows)
+
+    def reconstruct(self, rows) -> np.ndarray:
+        """Vectors of the given rows: exact if kept, else decoded from the codes"""
+        vectors = self.take(rows)
+        if vectors is None:
+            vectors = normalize_rows(self.quantizer.decode(self._codes[rows]))
+        return vectors
+
+    def search(self, query: np.ndarray, top_k: int,
+               mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate search over the codes with optional exact rescoring.
+
+        Args:
+            mask: Boolean row visibility (see visible_rows); None = all rows
+
+        Returns:
+            Tuple of (row ids, scores), best match first
+        """
+        if not self.is_trained:
+            return self._buffer.search(query, top_k, mask)
+
+        q = normalize_rows(query)[0]
+        rows = selected_rows(mask)
+        if rows is not None:
+            approx = self.quantizer.estimate(q, self._codes[rows])
+            shortlist = top_k_indices(approx, max(top_k, self.rescore_k))
+            if self._exact is None:
+                idx = shortlist[:top_k]
+                return rows[idx], approx[idx]
+            exact = self._exact.take(rows[shortlist]) @ q
+            order = top_k_indices(exact, top_k)
+            return rows[shortlist[order]], exact[order]
+        if mask is None:
+            approx = self.quantizer.estimate(q, self._codes[:self._size])
+        else:
+            approx, visible = mask_scores(self.quantizer.estimate(q, self._codes[:len(mask)]), mask)
+            top_k = min(top_k, visible)
+            if top_k <= 0:
+                return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        shortlist = top_k_indices(approx, max(top_k, self.rescore_k))
+        if self._exact is None:
+            idx = shortlist[:top_k]
+            return idx, approx[idx]
+
+        if mask is not None:
+            shortlist = shortlist[np.isfinite(approx[shortlist])]
+        exact = self._exact.take(shortlist) @ q
+        order = top_k_indices(exact, top_k)
+        return shortlist[order], exact[order]
+
+
+class PQEmbeddingStore(QuantizedEmbeddingStore):
+    """
+    Product-quantized embedding storage: `m` uint8 codes per row, ranked
+    with asymmetric distance tables.
+    """
+
+    def __init__(self, m: int = 48, train_size: int = 5000, rescore_k: int = 100,
+                 rescore_path: str = None):
+        """
+        Args:
+            m: PQ subspaces, i.e. bytes per stored embedding
+            train_size: Number of embeddings to buffer before training
+            rescore_k: Candidates re-ranked exactly (0 disables rescoring)
+            rescore_path: File for exact vectors (temporary file if omitted)
+        """
+        super().__init__(ProductQuantizer(m=m), train_size, rescore_k, rescore_path)
+
+
+class Int8EmbeddingStore(QuantizedEmbeddingStore):
+    """
+    Scalar-quantized embedding storage: one int8 per dimension, a quarter
+    of the float32 bytes, ranked with integer dot products.
+    """
+
+    def __init__(self, train_size: int = 1000, rescore_k: int = 200, rescore_path: str = None):
+        """
+        Args:
+            train_size: Number of embeddings to buffer before fitting the scales
+            rescore_k: Candidates re-ranked exactly (0 disables rescoring)
+            rescore_path: File for exact vectors (temporary file if omitted)
+        """
+        super().__init__(ScalarQuantizer(), train_size, rescore_k, rescore_path)
+
+
+class IVFIndex:
+    """
+    Inverted-file approximate nearest-neighbour index.
+
+    A spherical k-means coarse quantizer partitions the embedding space into
+    `nlist` cells; each cell keeps the row ids assigned to it. A query only
+    scores the rows in its `nprobe` closest cells. Vectors themselves stay in
+    the EmbeddingMatrix, the index stores row ids only.
+    """
+
+    requires_training = True
+
+    def __init__(self, nlist: int = None, nprobe: int = 8, kmeans_iters: int = 20,
+                 max_train_points: int = 50000, seed: int = 0):
+        """
+        Initialize an untrained IVF index.
+
+        Args:
+            nlist: Number of cells (None = ~4 * sqrt(training size))
+            nprobe: Cells scanned per query
+            kmeans_iters: Lloyd iterations during training
+            max_train_points: Cap on vectors sampled for training
+            seed: Random seed for centroid initialization
+        """
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.kmeans_iters = kmeans_iters
+        self.max_train_points = max_train_points
+        self.seed = seed
+        self.centroids = None
+        self._lists = []
+
+    @property
+    def is_trained(self) -> bool:
+        return self.centroids is not None
+
+    def __len__(self) -> int:
+        return sum(len(ids) for ids in self._lists)
+
+    def train(self, vectors: np.ndarray) -> None:
+        """
+        Fit the coarse quantizer with spherical k-means.
+
+        Args:
+            vectors: Normalized training vectors
+        """
+        rng = np.random.default_rng(self.seed)
+        n = vectors.shape[0]
+        nlist = self.nlist or max(1, int(4 * np.sqrt(n)))
+        nlist = min(nlist, n)
+
+        sample = vectors
+        if n > self.max_train_points:
+            sample = vectors[rng.choice(n, self.max_train_points, replace=False)]
+
+        centroids = sample[rng.choice(sample.shape[0], nlist, replace=False)].copy()
+        for _ in range(self.kmeans_iters):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, sample)
+            counts = np.bincount(assign, minlength=nlist)
+            empty = counts == 0
+            # Re-seed empty cells so every cell stays useful
+            if empty.any():
+                sums[empty] = sample[rng.choice(sample.shape[0], int(empty.sum()))]
+            centroids = normalize_rows(sums)
+
+        self.centroids = centroids
+        self._lists = [[] for _ in range(nlist)]
+        logger.info(f"IVF index trained: {nlist} cells on {sample.shape[0]} vectors")
+
+    def add(self, vectors: np.ndarray, row_ids) -> None:
+        """
+        Assign rows to their nearest cell.
+
+        Args:
+            vectors: Full embedding matrix the row ids refer to
+            row_ids: Rows to index
+        """
+        if not self.is_trained:
+            raise RuntimeError("IVF index must be trained before adding vectors")
+        if len(row_ids) == 0:
+            return
+
+        rows = np.asarray(row_ids, dtype=np.int64)
+        assign = np.argmax(vectors[rows] @ self.centroids.T, axis=1)
+        for row_id, cell in zip(rows, assign):
+            self._lists[cell].append(int(row_id))
+
+    def search(self, vectors: np.ndarray, query: np.ndarray, top_k: int,
+               nprobe: int = None, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate cosine-similarity search.
+
+        Args:
+            vectors: Full embedding matrix the row ids refer to
+            query: Query embedding
+            top_k: Number of results to return
+            nprobe: Override for the number of cells to scan
+            mask: Boolean row visibility (see visible_rows); None = all rows
+
+        Returns:
+            Tuple of (row ids, scores), best match first
+        """
+        q = normalize_rows(query)[0]
+        nprobe = min(nprobe or self.nprobe, len(self._lists))
+        cells = top_k_indices(self.centroids @ q, nprobe)
+
+        candidate_lists = [self._lists[c] for c in cells if self._lists[c]]
+        if not candidate_lists:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        candidates = np.fromiter(
+            (row for ids in candidate_lists for row in ids), dtype=np.int64
+        )
+        if mask is not None:
+            candidates = candidates[visible_rows(candidates, mask)]
+        scores = vectors[candidates] @ q
+        idx = top_k_indices(scores, top_k)
+        return candidates[idx], scores[idx]
+
+
+class HNSWIndex:
+    """
+    Hierarchical navigable small-world graph index.
+
+    Each row is inserted into a layered proximity graph as soon as it is
+    added, so there is no training step. Search descends greedily through
+    the sparse upper layers and runs a beam search of width `ef_search` on
+    the dense bottom layer. Rows hidden by a search mask keep routing
+    queries through the graph but are never returned.
+    """
+
+    requires_training = False
+    is_trained = True
+
+    def __init__(self, M: int = 16, ef_construction: int = 100, ef_search: int = 50, seed: int = 0):
+        """
+        Initialize an empty HNSW graph.
+
+        Args:
+            M: Neighbours per node on upper layers (2*M on layer 0)
+            ef_construction: Beam width used while inserting
+            ef_search: Beam width used while searching
+            seed: Random seed for level assignment
+        """
+        self.M = M
+        self.M0 = 2 * M
+        self.ef_construction = ef_construction
+        self.ef_search = ef_search
+        self._level_mult = 1 / math.log(max(M, 2))
+        self._rng = np.random.default_rng(seed)
+        self._layers: List[Dict[int, List[int]]] = []
+        self._entry_point = None
+
+    def __len__(self) -> int:
+        return len(self._layers[0]) if self._layers else 0
+
+    def _random_level(self) -> int:
+        return int(-math.log(1.0 - self._rng.random()) * self._level_mult)
+
+    def _search_layer(self, vectors: np.ndarray, q: np.ndarray, entry_points: List[int],
+                      ef: int, level: int) -> List[Tuple[float, int]]:
+        """
+        Beam search on one layer.
+
+        Returns:
+            Up to `ef` (similarity, node) pairs, unordered
+        """
+        layer = self._layers[level]
+        visited = set(entry_points)
+        entry_scores = vectors[entry_points] @ q
+
+        # candidates: max-heap on similarity; results: min-heap of the best ef
+        candidates = [(-float(s), n) for s, n in zip(entry_scores, entry_points)]
+        heapq.heapify(candidates)
+        results = [(float(s), n) for s, n in zip(entry_scores, entry_points)]
+        heapq.heapify(results)
+        while len(results) > ef:
+            heapq.heappop(results)
+
+        while candidates:
+            neg_sim, node = heapq.heappop(candidates)
+            if -neg_sim < results[0][0] and len(results) >= ef:
+                break
+
+            neighbours = [n for n in layer.get(node, ()) if n not in visited]
+            if not neighbours:
+                continue
+            visited.update(neighbours)
+
+            for sim, n in zip(vectors[neighbours] @ q, neighbours):
+                sim = float(sim)
+                if len(results) < ef or sim > results[0][0]:
+                    heapq.heappush(candidates, (-sim, n))
+                    heapq.heappush(results, (sim, n))
+                    if len(results) > ef:
+                        heapq.heappop(results)
+
+        return results
+
+    def _select_neighbours(self, vectors: np.ndarray, candidates: List[Tuple[float, int]],
+                           m: int) -> List[int]:
+        """
+        Neighbour selection heuristic: keep a candidate only if it is closer
+        to the new node than to any neighbour already kept, which preserves
+        links across clusters.
+        """
+        ordered = sorted(candidates, reverse=True)
+        nodes = [node for _, node in ordered]
+        pairwise = vectors[nodes] @ vectors[nodes].T
+
+        kept = []
+        for i, (sim, _) in enumerate(ordered):
+            if len(kept) >= m:
+                break
+            if kept and pairwise[i, kept].max() > sim:
+                continue
+            kept.append(i)
+
+        # Top up with the closest remaining candidates if the heuristic was too strict
+        if len(kept) < m:
+            chosen = set(kept)
+            kept.extend([i for i in range(len(nodes)) if i not in chosen][:m - len(kept)])
+        return [nodes[i] for i in kept]
+
+    def _link(self, vectors: np.ndarray, node: int, neighbours: List[int], level: int) -> None:
+        """Connect node to its neighbours, shrinking any overfull neighbour lists"""
+        layer = self._layers[level]
+        layer[node] = list(neighbours)
+        max_links = self.M0 if level == 0 else self.M
+
+        for n in neighbours:
+            links = layer[n]
+            links.append(node)
+            if len(links) > max_links:
+                sims = vectors[links] @ vectors[n]
+                layer[n] = [links[i] for i in top_k_indices(sims, max_links)]
+
+    def _insert(self, vectors: np.ndarray, node: int) -> None:
+        q = vectors[node]
+        level = self._random_level()
+        top_level = len(self._layers) - 1
+
+        while len(self._layers) <= level:
+            self._layers.append({})
+
+        if self._entry_point is None:
+            for l in range(level + 1):
+                self._layers[l][node] = []
+            self._entry_point = node
+            return
+
+        entry = [self._entry_point]
+
+        # Greedy descent through layers above the new node's level
+        for l in range(top_level, level, -1):
+            entry = [max(self._search_layer(vectors, q, entry, 1, l))[1]]
+
+        for l in range(min(level, top_level), -1, -1):
+            candidates = self._search_layer(vectors, q, entry, self.ef_construction, l)
+            neighbours = self._select_neighbours(vectors, candidates, self.M0 if l == 0 else self.M)
+            self._link(vectors, node, neighbours, l)
+            entry = [n for _, n in candidates]
+
+        for l in range(top_level + 1, level + 1):
+            self._layers[l][node] = []
+        if level > top_level:
+            self._entry_point = node
+
+    def add(self, vectors: np.ndarray, row_ids) -> None:
+        """
+        Insert rows into the graph; they are searchable immediately.
+
+        Args:
+            vectors: Full embedding matrix the row ids refer to
+            row_ids: Rows to index
+        """
+        for row_id in row_ids:
+            self._insert(vectors, int(row_id))
+
+    def search(self, vectors: np.ndarray, query: np.ndarray, top_k: int,
+               ef_search: int = None, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Approximate cosine-similarity search.
+
+        Args:
+            vectors: Full embedding matrix the row ids refer to
+            query: Query embedding
+            top_k: Number of results to return
+            ef_search: Override for the search beam width
+            mask: Boolean row visibility (see visible_rows); None = all rows.
+                Hidden rows are traversed but never returned.
+
+        Returns:
+            Tuple of (row ids, scores), best match first
+        """
+        if self._entry_point is None:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        q = normalize_rows(query)[0]
+        entry = [self._entry_point]
+        for l in range(len(self._layers) - 1, 0, -1):
+            entry = [max(self._search_layer(vectors, q, entry, 1, l))[1]]
+
+        # Widen the beam while hidden rows crowd out visible results
+        ef = max(ef_search or self.ef_search, top_k)
+        while True:
+            found = self._search_layer(vectors, q, entry, ef, 0)
+            if mask is not None and found:
+                keep = visible_rows([n for _, n in found], mask)
+                found = [item for item, k in zip(found, keep) if k]
+            if len(found) >= top_k or ef >= len(self._layers[0]):
+                break
+            ef *= 2
+        found = sorted(found, reverse=True)[:top_k]
+
+        rows = np.array([n for _, n in found], dtype=np.int64)
+        scores = np.array([s for s, _ in found], dtype=np.float32)
+        return rows, scores
+
+
+class BinaryHashIndex:
+    """
+    Binary-hash prefilter index.
+
+    Every row is kept as a sign-bit code packed into uint64 words (see
+    BinaryQuantizer), 1/32 of its float32 size. A query scans all codes by
+    Hamming distance in blocks, shortlists the `rerank_k` closest visible
+    rows and re-ranks only those with exact inner products against the
+    full vectors.
+    """
+
+    requires_training = True
+
+    def __init__(self, rerank_k: int = 200, block_size: int = 1 << 16):
+        """
+        Initialize an untrained binary index.
+
+        Args:
+            rerank_k: Hamming candidates re-ranked exactly (at least top_k)
+            block_size: Code rows scanned per vectorized block
+        """
+        self.rerank_k = rerank_k
+        self.block_size = block_size
+        self.quantizer = BinaryQuantizer()
+        self._codes = None
+        self._size = 0
+
+    @property
+    def is_trained(self) -> bool:
+        return self.quantizer.is_trained
+
+    def __len__(self) -> int:
+        return self._size
+
+    @property
+    def nbytes(self) -> int:
+        return 0 if self._codes is None else self._codes[:self._size].nbytes
+
+    def train(self, vectors: np.ndarray) -> None:
+        """
+        Fit the per-dimension bit thresholds.
+
+        Args:
+            vectors: Normalized training vectors
+        """
+        self.quantizer.train(vectors)
+        logger.info(f"Binary index trained on {vectors.shape[0]} vectors")
+
+    def add(self, vectors: np.ndarray, row_ids) -> None:
+        """
+        Encode rows into binary codes.
+
+        Args:
+            vectors: Full embedding matrix the row ids refer to
+            row_ids: Rows to index
+        """
+        if not self.is_trained:
+            raise RuntimeError("Binary index must be trained before adding vectors")
+        if len(row_ids) == 0:
+            return
+
+        rows = np.asarray(row_ids, dtype=np.int64)
+        needed = int(rows.max()) + 1
+        self._codes = _grow_rows(self._codes, self._size, needed, self.quantizer.code_size, np.uint64)
+        if needed > self._size:
+            self._codes[self._size:needed] = 0
+        self._codes[rows] = self.quantizer.encode(vectors[rows])
+        self._size = max(self._size, needed)
+
+    def _distances(self, query_code: np.ndarray) -> np.ndarray:
+        """Hamming distance from the query code to every row, block by block"""
+        distances = np.empty(self._size, dtype=np.int32)
+        for start in range(0, self._size, self.block_size):
+            stop = min(start + self.block_size, self._size)
+            distances[start:stop] = self.quantizer.hamming(query_code, self._codes[start:stop])
+        return distances
+
+    def search(self, vectors: np.ndarray, query: np.ndarray, top_k: int,
+               rerank_k: int = None, mask: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Hamming prefilter followed by exact re-ranking.
+
+        Args:
+            vectors: Full embedding matrix the row ids refer to
+            query: Query embedding
+            top_k: Number of results to return
+            rerank_k: Override for the number of candidates re-ranked exactly
+            mask: Boolean row visibility (see visible_rows); None = all rows
+
+        Returns:
+            Tuple of (row ids, scores), best match first
+        """
+        if self._size == 0 or top_k <= 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+
+        q = normalize_rows(query)[0]
+        distances = self._distances(self.quantizer.encode(q)[0])
+        if mask is not None:
+            hidden = ~visible_rows(np.arange(self._size), mask)
+            distances[hidden] = np.iinfo(np.int32).max
+
+        shortlist = max(rerank_k or self.rerank_k, top_k)
+        candidates = top_k_indices(-distances.astype(np.float32), shortlist)
+        if mask is not None:
+            candidates = candidates[~hidden[candidates]]
+        candidates = np.sort(candidates)
+
+        scores = vectors[candidates] @ q
+        idx = top_k_indices(scores, top_k)
+        return candidates[idx], scores[idx]
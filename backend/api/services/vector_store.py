@@ -0,0 +1,419 @@
+"""
+Vector Store Service
+Append-only, memory-mapped on-disk storage for documents, chunks and embeddings
+"""
+
+import numpy as np
+from contextlib import contextmanager
+import copy
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional
+import json
+import logging
+import mmap
+import os
+import threading
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+from api.services.chunk_table import ChunkRecord
+from api.services.vector_index import EmbeddingMatrix, normalize_rows
+
+logger = logging.getLogger(__name__)
+
+# Version 2: chunks reference documents by integer 'doc_ord' instead of string ids
+FORMAT_VERSION = 2
+
+
+def _fsync_path(path: str) -> None:
+    """fsync a file or directory by path"""
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+class RecordLog:
+    """
+    Offset-indexed file of JSON records.
+
+    `<name>.dat` holds UTF-8 JSON records back to back and `<name>.idx` holds
+    the uint64 end offset of each record, so record i is a single slice of
+    the memory-mapped data file. Only the first `count` records (as committed
+    in the store metadata) are visible. Records are decoded with `decode`
+    (plain dicts if omitted).
+    """
+
+    def __init__(self, directory: str, name: str, decode: Optional[Callable[[Dict[str, Any]], Any]] = None):
+        self.data_path = os.path.join(directory, f"{name}.dat")
+        self.index_path = os.path.join(directory, f"{name}.idx")
+        for path in (self.data_path, self.index_path):
+            if not os.path.exists(path):
+                open(path, 'wb').close()
+
+        self.decode = decode
+        self._count = 0
+        self._offsets = None
+        self._data = None
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i: int) -> Any:
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError("record index out of range")
+
+        start = int(self._offsets[i - 1]) if i > 0 else 0
+        end = int(self._offsets[i])
+        record = json.loads(self._data[start:end])
+        return record if self.decode is None else self.decode(record)
+
+    def __iter__(self) -> Iterator[Any]:
+        for i in range(self._count):
+            yield self[i]
+
+    @property
+    def end_offset(self) -> int:
+        return int(self._offsets[self._count - 1]) if self._count else 0
+
+    def remap(self, count: int) -> None:
+        """
+        Map the first `count` committed records. The count is published
+        last, so a concurrent reader never indexes past the mapped files.
+        """
+        if count == 0:
+            self._count = 0
+            self._offsets = None
+            self._data = None
+            return
+
+        self._offsets = np.memmap(self.index_path, dtype=np.uint64, mode='r', shape=(count,))
+        with open(self.data_path, 'rb') as f:
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._count = count
+
+    def write(self, records: List[Dict[str, Any]]) -> None:
+        """Write records after the committed tail; invisible until meta.json is committed"""
+        offset = self.end_offset
+        payloads = [json.dumps(r, separators=(',', ':')).encode('utf-8') for r in records]
+        ends = np.cumsum([len(p) for p in payloads], dtype=np.uint64) + np.uint64(offset)
+
+        with open(self.data_path, 'r+b') as f:
+            f.seek(offset)
+            f.write(b''.join(payloads))
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+        with open(self.index_path, 'r+b') as f:
+            f.seek(self._count * 8)
+            f.write(ends.tobytes())
+            f.truncate()
+            f.flush()
+            os.fsync(f.fileno())
+
+
+class PersistentVectorStore:
+    """
+    On-disk segment holding documents, chunks and their embeddings.
+
+    Layout of the store directory:
+    - meta.json: committed counts, embedding dimension, file generation and
+      the ordinals of deleted documents
+    - embeddings.f32: row-major normalized float32 vectors, memory-mapped read-only
+    - chunks.dat/.idx and documents.dat/.idx: offset-indexed JSON records
+
+    Appends write the data files, fsync them, then atomically replace
+    meta.json; the counts in meta.json are the commit point, so a crash
+    mid-append leaves only invisible trailing bytes. Readers in several
+    worker processes map the same files and share page cache with zero copies.
+    Within a process, appends may run on a worker thread while other threads
+    refresh; refreshes are serialized so the mapped counts never go back.
+
+    Compaction writes the surviving documents to a new generation of files
+    (embeddings.<n>.f32, chunks.<n>.dat, ...) and commits it the same way.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.meta_path = os.path.join(path, 'meta.json')
+        self.lock_path = os.path.join(path, 'store.lock')
+
+        self.dim = None
+        self.generation = None
+        self.deleted = frozenset()
+        self._vectors = None
+        self._num_vectors = 0
+        self._meta_version = object()  # Matches no meta.json state, so the first refresh reads it
+        self._refresh_lock = threading.Lock()
+
+        # Opens the generation recorded in meta.json (generation 0 for a new store)
+        self.refresh()
+        logger.info(f"Vector store opened at {path}: {len(self.documents)} documents, {len(self.chunks)} chunks")
+
+    def _files(self, generation: int) -> Dict[str, str]:
+        """Names of a generation's vector file and record logs (generation 0 is unsuffixed)"""
+        suffix = f".{generation}" if generation else ""
+        return {'vectors': f"embeddings{suffix}.f32", 'documents': f"documents{suffix}",
+                'chunks': f"chunks{suffix}"}
+
+    def _open_generation(self, generation: int) -> None:
+        files = self._files(generation)
+        self.vectors_path = os.path.join(self.path, files['vectors'])
+        if not os.path.exists(self.vectors_path):
+            open(self.vectors_path, 'wb').close()
+        self.documents = RecordLog(self.path, files['documents'])
+        self.chunks = RecordLog(self.path, files['chunks'], decode=ChunkRecord.from_dict)
+        self.generation = generation
+
+    @contextmanager
+    def _locked(self):
+        """Exclusive inter-process lock for writers"""
+        with open(self.lock_path, 'a') as lock_file:
+            if FCNTL_AVAILABLE:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if FCNTL_AVAILABLE:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _read_meta(self) -> Dict[str, Any]:
+        if not os.path.exists(self.meta_path):
+            return {'version': FORMAT_VERSION, 'dim': None, 'num_documents': 0, 'num_chunks': 0,
+                    'generation': 0, 'deleted': []}
+        with open(self.meta_path) as f:
+            meta = json.load(f)
+        if meta.get('version') != FORMAT_VERSION:
+            raise ValueError(f"Unsupported vector store version: {meta.get('version')}")
+        return meta
+
+    def _write_meta(self, meta: Dict[str, Any]) -> None:
+        tmp_path = self.meta_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(meta, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.meta_path)
+        _fsync_path(self.path)
+
+    def refresh(self) -> bool:
+        """
+        Pick up appends committed by this or another process.
+
+        Returns:
+            True if new data was mapped
+        """
+        with self._refresh_lock:
+            return self._refresh()
+
+    def _refresh(self) -> bool:
+        try:
+            st = os.stat(self.meta_path)
+            version = (st.st_ino, st.st_mtime_ns)
+        except FileNotFoundError:
+            version = None
+        if version == self._meta_version:
+            return False
+
+        meta = self._read_meta()
+        self._meta_version = version
+        self.dim = meta['dim']
+        self.deleted = frozenset(meta.get('deleted', ()))
+        if meta.get('generation', 0) != self.generation:
+            # Compacted by this or another process: switch to the new files.
+            # Record logs are replaced, not remapped, so holders of the old
+            # ones keep a consistent view until they rebuild.
+            self._open_generation(meta.get('generation', 0))
+        self.documents.remap(meta['num_documents'])
+        self.chunks.remap(meta['num_chunks'])
+
+        self._num_vectors = meta['num_chunks']
+        if self._num_vectors:
+            self._vectors = np.memmap(self.vectors_path, dtype=np.float32, mode='r',
+                                      shape=(self._num_vectors, self.dim))
+        else:
+            self._vectors = None
+        return True
+
+    @property
+    def vectors(self) -> np.ndarray:
+        """Memory-mapped view of the committed embeddings"""
+        if self._vectors is None:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        return self._vectors
+
+    def append(self, documents: List[Dict[str, Any]], chunks: List[Dict[str, Any]], vectors) -> None:
+        """
+        Durably append documents with their chunks and embeddings.
+
+        Args:
+            documents: Document metadata records
+            chunks: Chunk records, one per embedding row. Their 'doc_ord'
+                indexes into `documents` and is rebased to the store-wide
+                document ordinal under the writer lock.
+            vectors: Chunk embeddings (normalized on write)
+        """
+        block = normalize_rows(np.asarray(vectors, dtype=np.float32)) if len(chunks) else None
+        if block is not None and block.shape[0] != len(chunks):
+            raise ValueError("Each chunk needs exactly one embedding")
+
+        with self._locked():
+            self.refresh()
+            dim = self.dim
+            if block is not None:
+                if dim is not None and block.shape[1] != dim:
+                    raise ValueError(f"Embedding dimension mismatch: expected {dim}, got {block.shape[1]}")
+                dim = block.shape[1]
+
+                with open(self.vectors_path, 'r+b') as f:
+                    f.seek(self._num_vectors * dim * 4)
+                    f.write(block.tobytes())
+                    f.truncate()
+                    f.flush()
+                    os.fsync(f.fileno())
+
+            base = len(self.documents)
+            self.chunks.write([dict(c, doc_ord=base + c['doc_ord']) for c in chunks])
+            self.documents.write(documents)
+            self._write_meta({
+                'version': FORMAT_VERSION,
+                'dim': dim,
+                'num_documents': len(self.documents) + len(documents),
+                'num_chunks': len(self.chunks) + len(chunks),
+                'generation': self.generation,
+                'deleted': sorted(self.deleted),
+            })
+            self.refresh()
+
+    def _ordinals(self, doc_ids: Iterable[str]) -> List[int]:
+        """Current ordinals of documents by id (ids not in the store are ignored)"""
+        wanted = set(doc_ids)
+        return [o for o, document in enumerate(self.documents) if document['id'] in wanted]
+
+    def delete(self, doc_ids: Iterable[str]) -> None:
+        """
+        Durably tombstone documents; their rows stay on disk until compact().
+
+        Documents are named by id and resolved under the writer lock, since
+        ordinals change when another process compacts the store.
+        """
+        with self._locked():
+            self.refresh()
+            self._write_meta({
+                'version': FORMAT_VERSION,
+                'dim': self.dim,
+                'num_documents': len(self.documents),
+                'num_chunks': len(self.chunks),
+                'generation': self.generation,
+                'deleted': sorted(self.deleted.union(self._ordinals(doc_ids))),
+            })
+            self.refresh()
+
+    def compact(self, drop: Iterable[str] = (), block_size: int = 65536) -> None:
+        """
+        Rewrite the store without deleted documents and the given ordinals.
+
+        Survivors keep their order and are renumbered densely. Documents
+        appended by other processes before the lock was taken are kept.
+        Processes still mapping the previous generation read it undisturbed
+        (its files are unlinked, not truncated) until their next refresh.
+
+        Args:
+            drop: Ids of documents to discard besides deleted ones (e.g.
+                superseded versions)
+            block_size: Vectors copied per read
+        """
+        with self._locked():
+            self.refresh()
+            drop = self.deleted.union(self._ordinals(drop))
+            keep = [o for o in range(len(self.documents)) if o not in drop]
+            renumber = {old: new for new, old in enumerate(keep)}
+
+            rows, chunks = [], []
+            for row, chunk in enumerate(self.chunks):
+                if chunk.doc_ord in renumber:
+                    rows.append(row)
+                    chunks.append(dict(chunk.as_dict(), doc_ord=renumber[chunk.doc_ord]))
+
+            old_files = self._files(self.generation)
+            generation = self.generation + 1
+            files = self._files(generation)
+            with open(os.path.join(self.path, files['vectors']), 'wb') as f:
+                for start in range(0, len(rows), block_size):
+                    f.write(np.ascontiguousarray(self.vectors[rows[start:start + block_size]]).tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+            for name, records in (('chunks', chunks), ('documents', [self.documents[o] for o in keep])):
+                RecordLog(self.path, files[name]).write(records)
+
+            self._write_meta({
+                'version': FORMAT_VERSION,
+                'dim': self.dim,
+                'num_documents': len(keep),
+                'num_chunks': len(rows),
+                'generation': generation,
+                'deleted': [],
+            })
+            self.refresh()
+
+        for name in (old_files['vectors'], *(f"{old_files[n]}.{ext}" for n in ('documents', 'chunks')
+                                            for ext in ('dat', 'idx'))):
+            try:
+                os.remove(os.path.join(self.path, name))
+            except FileNotFoundError:
+                pass
+        logger.info(f"Vector store compacted to generation {generation}: "
+                    f"{len(keep)} documents, {len(rows)} chunks")
+
+
+class MappedEmbeddingMatrix(EmbeddingMatrix):
+    """
+    EmbeddingMatrix over the memory-mapped vectors of a PersistentVectorStore,
+    or over the store rows [start, stop) (stop=None follows the store as it grows).
+
+    Rows are added through PersistentVectorStore.append so that documents,
+    chunks and embeddings are committed together. The view stays on the
+    store generation it was created for: once the store switches to a
+    compacted generation, it keeps the last vectors mapped before the switch,
+    so searches over it stay correct until the index is rebuilt.
+    """
+
+    def __init__(self, store: PersistentVectorStore, start: int = 0, stop: Optional[int] = None):
+        super().__init__(dim=store.dim)
+        self.store = store
+        self.start = start
+        self.stop = stop
+        self.generation = store.generation
+        self._mapped = store.vectors
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    @property
+    def vectors(self) -> np.ndarray:
+        # Read the vectors before the generation: refresh() switches the generation first
+        vectors = self.store.vectors
+        if self.store.generation == self.generation:
+            self._mapped = vectors
+        return self._mapped[self.start:self.stop]
+
+    def view(self, start: int, stop: Optional[int] = None) -> 'MappedEmbeddingMatrix':
+        """Matrix over the store rows [start, stop) of the same generation"""
+        view = copy.copy(self)
+        view.start, view.stop = start, stop
+        return view
+
+    @property
+    def nbytes(self) -> int:
+        """Mapped pages live in the shared page cache, not the process heap"""
+        return 0
+
+    def append(self, vectors) -> range:
+        raise TypeError("Append to a persistent store through PersistentVectorStore.append")
@@ -10,8 +10,50 @@ class Config:
     API_PORT = int(os.getenv("API_PORT", 8000))
     DEBUG = os.getenv("DEBUG", "True").lower() == "true"
     MAX_FILE_SIZE_MB = int(os.getenv("MAX_FILE_SIZE_MB", 10))
+    MAX_UPLOAD_SIZE_MB = int(os.getenv("MAX_UPLOAD_SIZE_MB", 50))
     CACHE_ENABLED = os.getenv("CACHE_ENABLED", "True").lower() == "true"
     CACHE_TTL_SECONDS = int(os.getenv("CACHE_TTL_SECONDS", 300))
     CACHE_MAX_SIZE = int(os.getenv("CACHE_MAX_SIZE", 1000))
+    DOCUMENT_INDEX_TYPE = os.getenv("DOCUMENT_INDEX_TYPE", "flat")
+    IVF_NLIST = int(os.getenv("IVF_NLIST", 0)) or None
+    IVF_NPROBE = int(os.getenv("IVF_NPROBE", 8))
+    HNSW_M = int(os.getenv("HNSW_M", 16))
+    HNSW_EF_CONSTRUCTION = int(os.getenv("HNSW_EF_CONSTRUCTION", 100))
+    HNSW_EF_SEARCH = int(os.getenv("HNSW_EF_SEARCH", 50))
+    BINARY_RERANK_K = int(os.getenv("BINARY_RERANK_K", 200))
+    ANN_MIN_SIZE = int(os.getenv("ANN_MIN_SIZE", 10000))
+    EMBEDDING_STORAGE = os.getenv("EMBEDDING_STORAGE", "float32")
+    PQ_SUBSPACES = int(os.getenv("PQ_SUBSPACES", 48))
+    PQ_TRAIN_SIZE = int(os.getenv("PQ_TRAIN_SIZE", 5000))
+    PQ_RESCORE_K = int(os.getenv("PQ_RESCORE_K", 100))
+    INT8_TRAIN_SIZE = int(os.getenv("INT8_TRAIN_SIZE", 1000))
+    INT8_RESCORE_K = int(os.getenv("INT8_RESCORE_K", 200))
+    VECTOR_STORE_PATH = os.getenv("VECTOR_STORE_PATH") or None
+    DOCUMENT_SEARCH_MODE = os.getenv("DOCUMENT_SEARCH_MODE", "dense")
+    HYBRID_DENSE_CANDIDATES = int(os.getenv("HYBRID_DENSE_CANDIDATES", 100))
+    HYBRID_LEXICAL_CANDIDATES = int(os.getenv("HYBRID_LEXICAL_CANDIDATES", 100))
+    HYBRID_STAGE_TIMEOUT_MS = float(os.getenv("HYBRID_STAGE_TIMEOUT_MS", 0)) or None
+    RRF_K = int(os.getenv("RRF_K", 60))
+    BATCH_SEARCH_MAX_QUERIES = int(os.getenv("BATCH_SEARCH_MAX_QUERIES", 1000))
+    QUERY_EMBEDDING_CACHE_SIZE = int(os.getenv("QUERY_EMBEDDING_CACHE_SIZE", 1024))
+    CHUNK_EMBEDDING_CACHE_PATH = os.getenv("CHUNK_EMBEDDING_CACHE_PATH") or None
+    CHUNK_EMBEDDING_CACHE_SIZE = int(os.getenv("CHUNK_EMBEDDING_CACHE_SIZE", 200000))
+    EMBEDDING_MODEL_LOADING = os.getenv("EMBEDDING_MODEL_LOADING", "background")
+    MODEL_WAIT_TIMEOUT_SECONDS = float(os.getenv("MODEL_WAIT_TIMEOUT_SECONDS", 30)) or None
+    EMBEDDING_EXECUTOR = os.getenv("EMBEDDING_EXECUTOR", "thread")
+    EMBEDDING_WORKERS = int(os.getenv("EMBEDDING_WORKERS", 0)) or None
+    EMBEDDING_QUEUE_SIZE = int(os.getenv("EMBEDDING_QUEUE_SIZE", 64))
+    QUERY_BATCH_SIZE = int(os.getenv("QUERY_BATCH_SIZE", 32))
+    QUERY_BATCH_WAIT_MS = float(os.getenv("QUERY_BATCH_WAIT_MS", 2))
+    COMPACTION_THRESHOLD = float(os.getenv("COMPACTION_THRESHOLD", 0.3)) or None
+    SEGMENT_SIZE = int(os.getenv("SEGMENT_SIZE", 2048))
+    MERGE_FACTOR = int(os.getenv("MERGE_FACTOR", 4))
+    INGEST_PARSE_WORKERS = int(os.getenv("INGEST_PARSE_WORKERS", 0)) or None
+    INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", 8))
+    INGEST_EMBED_BATCH_SIZE = int(os.getenv("INGEST_EMBED_BATCH_SIZE", 256))
+    UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR") or None
+    PDF_PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", 8))
+    PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", 0)) or None
+    PDF_MAX_CHARS = int(os.getenv("PDF_MAX_CHARS", 0)) or None
 
 config = Config()
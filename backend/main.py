@@ -3,22 +3,28 @@ NLP Query Engine - Main FastAPI Application
 Production-ready implementation with schema discovery, document processing, and query execution
 """
 
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks
+from fastapi import FastAPI, UploadFile, File, Form, HTTPException, BackgroundTasks, Request
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any
 import asyncio
+import json
 from datetime import datetime
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+from config import config
+
 # Import our custom services
 from api.services.schema_discovery import SchemaDiscovery
 from api.services.document_processor import DocumentProcessor
 from api.services.query_engine import QueryEngine
 from api.services.cache_manager import QueryCache
+from api.services.ingestion_pipeline import IngestionPipeline
+from api.services.upload_spool import FileTooLargeError, spool_upload
 
 # Initialize FastAPI app
 app = FastAPI(
@@ -27,7 +33,24 @@ app = FastAPI(
     version="1.0.0"
 )
 
-# CORS middleware for frontend integration
+@app.middleware("http")
+async def limit_upload_size(request: Request, call_next):
+    """
+    Reject an oversize upload from its Content-Length header, before the
+    multipart body is received and parsed. Requests without the header
+    are still held to the per-file limit while they are spooled.
+    """
+    if request.url.path == "/api/upload-documents":
+        length = request.headers.get("content-length", "")
+        limit = config.MAX_UPLOAD_SIZE_MB * 1024 * 1024
+        if length.isdigit() and int(length) > limit:
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"Upload exceeds the {config.MAX_UPLOAD_SIZE_MB}MB request limit"}
+            )
+    return await call_next(request)
+
+# CORS middleware for frontend integration (added last, so it also wraps rejected uploads)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000"],  # React frontend URL
@@ -40,7 +63,50 @@ app.add_middleware(
 class AppState:
     def __init__(self):
         self.schema_discovery = None
-        self.document_processor = DocumentProcessor()
+        self.document_processor = DocumentProcessor(
+            index_type=config.DOCUMENT_INDEX_TYPE,
+            ivf_nlist=config.IVF_NLIST,
+            ivf_nprobe=config.IVF_NPROBE,
+            hnsw_m=config.HNSW_M,
+            hnsw_ef_construction=config.HNSW_EF_CONSTRUCTION,
+            hnsw_ef_search=config.HNSW_EF_SEARCH,
+            binary_rerank_k=config.BINARY_RERANK_K,
+            ann_min_size=config.ANN_MIN_SIZE,
+            storage=config.EMBEDDING_STORAGE,
+            pq_subspaces=config.PQ_SUBSPACES,
+            pq_train_size=config.PQ_TRAIN_SIZE,
+            pq_rescore_k=config.PQ_RESCORE_K,
+            int8_train_size=config.INT8_TRAIN_SIZE,
+            int8_rescore_k=config.INT8_RESCORE_K,
+            store_path=config.VECTOR_STORE_PATH,
+            search_mode=config.DOCUMENT_SEARCH_MODE,
+            hybrid_dense_candidates=config.HYBRID_DENSE_CANDIDATES,
+            hybrid_lexical_candidates=config.HYBRID_LEXICAL_CANDIDATES,
+            hybrid_stage_timeout_ms=config.HYBRID_STAGE_TIMEOUT_MS,
+            rrf_k=config.RRF_K,
+            query_cache_size=config.QUERY_EMBEDDING_CACHE_SIZE,
+            chunk_cache_path=config.CHUNK_EMBEDDING_CACHE_PATH,
+            chunk_cache_size=config.CHUNK_EMBEDDING_CACHE_SIZE,
+            model_loading=config.EMBEDDING_MODEL_LOADING,
+            model_wait_timeout=config.MODEL_WAIT_TIMEOUT_SECONDS,
+            embedding_executor=config.EMBEDDING_EXECUTOR,
+            embedding_workers=config.EMBEDDING_WORKERS,
+            embedding_queue_size=config.EMBEDDING_QUEUE_SIZE,
+            query_batch_size=config.QUERY_BATCH_SIZE,
+            query_batch_wait_ms=config.QUERY_BATCH_WAIT_MS,
+            compaction_threshold=config.COMPACTION_THRESHOLD,
+            segment_size=config.SEGMENT_SIZE,
+            merge_factor=config.MERGE_FACTOR
+        )
+        self.ingestion_pipeline = IngestionPipeline(
+            self.document_processor,
+            parse_workers=config.INGEST_PARSE_WORKERS,
+            queue_size=config.INGEST_QUEUE_SIZE,
+            embed_batch_size=config.INGEST_EMBED_BATCH_SIZE,
+            pdf_pages_per_task=config.PDF_PAGES_PER_TASK,
+            pdf_max_pages=config.PDF_MAX_PAGES,
+            pdf_max_chars=config.PDF_MAX_CHARS
+        )
         self.query_engine = None
         self.cache = QueryCache(ttl_seconds=300, max_size=1000)
         self.connected = False
@@ -56,6 +122,8 @@ class DatabaseConnection(BaseModel):
 class QueryRequest(BaseModel):
     query: str
     use_cache: Optional[bool] = True
+    mode: Optional[str] = None
+    filters: Optional[Dict[str, Any]] = None
 
 class QueryResponse(BaseModel):
     query_type: str
@@ -64,6 +132,30 @@ class QueryResponse(BaseModel):
     cache_hit: bool
     response_time_ms: int
     generated_sql: Optional[str] = None
+    retrieval_timings: Optional[Dict[str, Any]] = None
+
+@app.on_event("startup")
+async def open_vector_store():
+    """Index the persistent vector store (if configured) in the background while serving requests"""
+    state.document_processor.start_store_loading()
+
+@app.on_event("startup")
+async def warm_up_embedding_model():
+    """Load the embedding model in the background so the worker can serve immediately"""
+    state.document_processor.start_model_loading()
+
+@app.on_event("shutdown")
+async def stop_embedding_workers():
+    """Release the parse pool, the query batcher and the embedding worker pool"""
+    state.ingestion_pipeline.shutdown()
+    state.document_processor.query_batcher.shutdown()
+    state.document_processor.embedding_executor.shutdown()
+
+class BatchSearchRequest(BaseModel):
+    queries: List[str]
+    top_k: int = Field(5, ge=1)
+    mode: Optional[str] = None
+    filters: Optional[Dict[str, Any]] = None
 
 # API Endpoints
 
@@ -74,7 +166,8 @@ async def root():
         "status": "healthy",
         "version": "1.0.0",
         "connected": state.connected,
-        "documents_indexed": len(state.document_processor.documents)
+        "documents_indexed": state.document_processor.document_count,
+        "embedding_model": state.document_processor.model_load_status()
     }
 
 @app.post("/api/connect-database")
@@ -118,13 +211,27 @@ async def connect_database(connection: DatabaseConnection):
 @app.post("/api/upload-documents")
 async def upload_documents(
     background_tasks: BackgroundTasks,
-    files: List[UploadFile] = File(...)
+    files: List[UploadFile] = File(...),
+    doc_keys: List[str] = Form(None)
 ):
     """
     Upload and process multiple documents.
-    Processing happens in background for better performance.
+    Uploads are streamed to the spool directory (oversize files are rejected
+    with 413 before anything is processed); processing happens in background.
+    A file replaces the stored document with the same key (one optional
+    `doc_keys` entry per file, defaulting to the filename); only its changed
+    chunks are embedded again.
     """
+    if doc_keys and len(doc_keys) != len(files):
+        raise HTTPException(status_code=400, detail="doc_keys must have one entry per file")
+    keys = doc_keys or [None] * len(files)
+    
+    spooled = []
     try:
+        for file in files:
+            spooled.append(await spool_upload(file, config.UPLOAD_SPOOL_DIR,
+                                              config.MAX_FILE_SIZE_MB * 1024 * 1024))
+        
         job_id = f"job_{datetime.now().timestamp()}"
         state.ingestion_jobs[job_id] = {
             "status": "processing",
@@ -133,22 +240,20 @@ async def upload_documents(
             "errors": []
         }
         
-        # Process documents in background
+        # Process documents in background through the staged pipeline
         async def process_files():
-            for idx, file in enumerate(files):
-                try:
-                    content = await file.read()
-                    await state.document_processor.process_document(
-                        file.filename,
-                        content,
-                        file.content_type
-                    )
-                    state.ingestion_jobs[job_id]["processed"] += 1
-                except Exception as e:
-                    state.ingestion_jobs[job_id]["errors"].append(
-                        f"{file.filename}: {str(e)}"
-                    )
-                    logger.error(f"Error processing {file.filename}: {str(e)}")
+            try:
+                await state.ingestion_pipeline.run(
+                    [(upload.filename, upload.content_type, upload.path, upload.sha256, key)
+                     for upload, key in zip(spooled, keys)],
+                    state.ingestion_jobs[job_id]
+                )
+            except Exception as e:
+                state.ingestion_jobs[job_id]["errors"].append(str(e))
+                logger.error(f"Ingestion job {job_id} failed: {str(e)}")
+            finally:
+                for upload in spooled:
+                    upload.remove()
             
             state.ingestion_jobs[job_id]["status"] = "completed"
         
@@ -160,7 +265,13 @@ async def upload_documents(
             "total_files": len(files)
         }
         
+    except FileTooLargeError as e:
+        for upload in spooled:
+            upload.remove()
+        raise HTTPException(status_code=413, detail=str(e))
     except Exception as e:
+        for upload in spooled:
+            upload.remove()
         logger.error(f"Document upload failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Upload failed: {str(e)}")
 
@@ -172,6 +283,17 @@ async def get_ingestion_status(job_id: str):
     
     return state.ingestion_jobs[job_id]
 
+@app.delete("/api/documents/{doc_id}")
+async def delete_document(doc_id: str):
+    """
+    Delete a document. Its chunks leave search results immediately; storage
+    is reclaimed by background compaction.
+    """
+    result = await state.document_processor.delete_document(doc_id)
+    if not result['success']:
+        raise HTTPException(status_code=404, detail=result['error'])
+    return result
+
 @app.post("/api/query")
 @app.post("/api/query")
 async def process_query(request: QueryRequest) -> QueryResponse:
@@ -179,6 +301,8 @@ async def process_query(request: QueryRequest) -> QueryResponse:
     """
     Process natural language query and return results.
     Handles SQL queries, document searches, and hybrid queries.
+    Document searches take the same optional `mode` and metadata `filters`
+    as /api/search/batch.
     """
     if not state.connected:
         raise HTTPException(
@@ -187,11 +311,16 @@ async def process_query(request: QueryRequest) -> QueryResponse:
         )
     
     start_time = datetime.now()
+    # Results depend on the search options, so they are part of the cache key
+    cache_key = request.query
+    if request.mode or request.filters:
+        cache_key += "\0" + json.dumps({"mode": request.mode, "filters": request.filters},
+                                       sort_keys=True, default=str)
     try:
         # Check cache first
         cache_hit = False
         if request.use_cache:
-            cached_result = state.cache.get(request.query)
+            cached_result = state.cache.get(cache_key)
             if cached_result:
                 cache_hit = True
                 cached_result["cache_hit"] = True
@@ -231,7 +360,7 @@ async def process_query(request: QueryRequest) -> QueryResponse:
 
             # Cache it too
             if request.use_cache:
-                state.cache.set(request.query, response)
+                state.cache.set(cache_key, response)
 
             return QueryResponse(**response)
         # -----------------------------------------------------------------
@@ -239,7 +368,9 @@ async def process_query(request: QueryRequest) -> QueryResponse:
         # -----------------------------------------------------------------
         result = await state.query_engine.process_query(
             request.query,
-            state.document_processor
+            state.document_processor,
+            mode=request.mode,
+            filters=request.filters
         )
         
         response_time = (datetime.now() - start_time).total_seconds() * 1000
@@ -250,19 +381,59 @@ async def process_query(request: QueryRequest) -> QueryResponse:
             "document_results": result.get("document_results"),
             "cache_hit": cache_hit,
             "response_time_ms": int(response_time),
-            "generated_sql": result.get("generated_sql")
+            "generated_sql": result.get("generated_sql"),
+            "retrieval_timings": result.get("retrieval_timings")
         }
         
         if request.use_cache:
-            state.cache.set(request.query, response)
+            state.cache.set(cache_key, response)
         
         return QueryResponse(**response)
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Query processing failed: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Query failed: {str(e)}")
 
 
+@app.post("/api/search/batch")
+async def search_documents_batch(request: BatchSearchRequest):
+    """
+    Search documents for many queries in one request.
+    Queries are embedded together and scored as one matrix product.
+    Optional metadata filters (e.g. {"doc_type": "resume"}) restrict every query.
+    While the embedding model is unavailable, queries are served by keyword
+    search and retrieval_timings carries "degraded_from".
+    """
+    if not request.queries:
+        raise HTTPException(status_code=400, detail="At least one query is required")
+    if len(request.queries) > config.BATCH_SEARCH_MAX_QUERIES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {config.BATCH_SEARCH_MAX_QUERIES} queries per batch"
+        )
+    
+    start_time = datetime.now()
+    try:
+        retrieval = await state.document_processor.retrieve_batch(
+            request.queries,
+            top_k=request.top_k,
+            mode=request.mode,
+            filters=request.filters
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return {
+        "results": [
+            {"query": query, "document_results": results}
+            for query, results in zip(request.queries, retrieval["results"])
+        ],
+        "response_time_ms": int((datetime.now() - start_time).total_seconds() * 1000),
+        "retrieval_timings": retrieval["timings"]
+    }
+
 @app.get("/api/schema")
 async def get_schema():
     """Return the currently discovered database schema"""
@@ -285,7 +456,7 @@ async def get_metrics():
         "cache_misses": state.cache.stats["cache_misses"],
         "cache_hit_rate": state.cache.get_hit_rate(),
         "avg_response_time": state.cache.stats["avg_response_time"],
-        "documents_indexed": len(state.document_processor.documents),
+        "documents_indexed": state.document_processor.document_count,
         "active_connections": 1 if state.connected else 0
     }
 
@@ -0,0 +1,106 @@
+"""
+Endpoint tests for the FastAPI application
+Tests request parsing and validation of the document and search endpoints over HTTP
+"""
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from api.services.document_processor import DocumentProcessor
+from api.services.ingestion_pipeline import IngestionPipeline
+from api.services.query_engine import QueryEngine
+
+
+class TestDocumentEndpoints:
+    """Test suite for the document upload and search endpoints"""
+
+    @pytest.fixture
+    def client(self, monkeypatch):
+        processor = DocumentProcessor()
+        monkeypatch.setattr(main.state, 'document_processor', processor)
+        monkeypatch.setattr(main.state, 'ingestion_pipeline', IngestionPipeline(processor, parse_workers=1))
+        monkeypatch.setattr(main.state, 'ingestion_jobs', {})
+        return TestClient(main.app)
+
+    def upload(self, client, text, doc_keys):
+        response = client.post(
+            '/api/upload-documents',
+            files=[('files', ('notes.txt', text.encode(), 'text/plain'))],
+            data={'doc_keys': doc_keys}
+        )
+        assert response.status_code == 200, response.text
+        job = client.get(f"/api/ingestion-status/{response.json()['job_id']}").json()
+        assert job['status'] == 'completed' and job['errors'] == []
+        return job
+
+    def test_upload_with_doc_key_replaces_document(self, client):
+        """A second upload with the same doc_keys entry replaces the first document"""
+        processor = main.state.document_processor
+        self.upload(client, "First draft of the onboarding notes.", ['handbook'])
+        first = processor.current_document('handbook')
+
+        self.upload(client, "Final version of the onboarding notes.", ['handbook'])
+        second = processor.current_document('handbook')
+
+        assert second['id'] != first['id']
+        assert processor.document_count == 1
+        assert [c.text for c in processor.chunks] == ["Final version of the onboarding notes."]
+
+    def test_doc_keys_must_match_files(self, client):
+        """One doc_keys entry per uploaded file"""
+        response = client.post(
+            '/api/upload-documents',
+            files=[('files', ('a.txt', b'alpha', 'text/plain')), ('files', ('b.txt', b'beta', 'text/plain'))],
+            data={'doc_keys': ['only-one']}
+        )
+        assert response.status_code == 400
+
+    def test_oversize_upload_rejected_before_parsing(self, client, monkeypatch):
+        """A request whose Content-Length exceeds the limit gets 413 without being spooled"""
+        async def fail_spool(*args, **kwargs):
+            raise AssertionError("oversize upload was parsed")
+        monkeypatch.setattr(main.config, 'MAX_UPLOAD_SIZE_MB', 1)
+        monkeypatch.setattr(main, 'spool_upload', fail_spool)
+
+        response = client.post(
+            '/api/upload-documents',
+            files=[('files', ('big.txt', b'x' * (2 * 1024 * 1024), 'text/plain'))]
+        )
+        assert response.status_code == 413
+
+    @pytest.mark.parametrize('top_k', [None, 0, -3])
+    def test_batch_search_rejects_invalid_top_k(self, client, top_k):
+        """top_k must be a positive integer"""
+        response = client.post('/api/search/batch', json={'queries': ['python'], 'top_k': top_k})
+        assert response.status_code == 422
+
+    def test_batch_search(self, client):
+        """Each query gets at most top_k results"""
+        self.upload(client, "Alice writes Python services.", ['alice'])
+        response = client.post('/api/search/batch', json={'queries': ['python', 'services'], 'top_k': 1})
+        assert response.status_code == 200
+        assert [len(r['document_results']) for r in response.json()['results']] == [1, 1]
+        assert 'degraded_from' not in response.json()['retrieval_timings']
+
+    def test_query_with_filters_and_mode(self, client, monkeypatch, tmp_path):
+        """/api/query passes mode and metadata filters through to the document search"""
+        monkeypatch.setattr(main.state, 'connected', True)
+        monkeypatch.setattr(main.state, 'query_engine', QueryEngine(f"sqlite:///{tmp_path / 'q.db'}", {}, None))
+        response = client.post(
+            '/api/upload-documents',
+            files=[('files', ('alice_resume.txt', b'Alice writes Python services.', 'text/plain')),
+                   ('files', ('handbook.txt', b'Parking is available on site for Python meetups.', 'text/plain'))]
+        )
+        assert response.status_code == 200
+
+        response = client.post('/api/query', json={'query': 'document mentioning python', 'use_cache': False,
+                                                   'mode': 'lexical', 'filters': {'doc_type': 'resume'}})
+        assert response.status_code == 200, response.text
+        body = response.json()
+        assert [r['doc_name'] for r in body['document_results']] == ['alice_resume.txt']
+        assert body['retrieval_timings']['mode'] == 'lexical'
+
+        response = client.post('/api/query', json={'query': 'document mentioning python', 'use_cache': False,
+                                                   'mode': 'bogus'})
+        assert response.status_code == 400
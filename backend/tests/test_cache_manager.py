@@ -0,0 +1,111 @@
+"""
+Unit tests for Cache Manager Service
+Tests the content-addressed chunk embedding cache
+"""
+
+import os
+import threading
+import numpy as np
+from api.services.cache_manager import ChunkEmbeddingCache
+
+
+class TestChunkEmbeddingCache:
+    """Test suite for ChunkEmbeddingCache"""
+
+    def test_hits_and_misses(self):
+        """Only texts added before are served; stored vectors are normalized"""
+        cache = ChunkEmbeddingCache(model_name='m')
+        cache.add_many(['a'], [np.array([3.0, 4.0])])
+
+        found = cache.get_many(['a', 'b'])
+        assert np.allclose(found[0], [0.6, 0.8])
+        assert found[1] is None
+        assert cache.get_statistics()['dedup_ratio'] == 0.5
+
+    def test_keys_include_model(self):
+        """Embeddings from another model are never reused"""
+        assert ChunkEmbeddingCache(model_name='a').key('x') != ChunkEmbeddingCache(model_name='b').key('x')
+
+    def test_persistence_ignores_torn_tail(self, tmp_path):
+        """Entries survive reopening; a partially written record is dropped"""
+        path = str(tmp_path / "cache")
+        cache = ChunkEmbeddingCache(model_name='m', path=path)
+        cache.add_many(['a', 'b'], np.eye(2, 4))
+        with open(cache._records_path(), 'ab') as f:
+            f.write(b'\x01' * 10)
+
+        reopened = ChunkEmbeddingCache(model_name='m', path=path)
+        assert len(reopened) == 2
+        assert np.allclose(reopened.get_many(['b'])[0], [0, 1, 0, 0])
+
+    def test_append_after_torn_tail(self, tmp_path):
+        """A torn record is cut off before the next append, so later records stay readable"""
+        path = str(tmp_path / "cache")
+        ChunkEmbeddingCache(model_name='m', path=path).add_many(['a'], np.eye(1, 4))
+        with open(os.path.join(path, 'records.bin'), 'ab') as f:
+            f.write(b'\x01' * 10)
+        ChunkEmbeddingCache(model_name='m', path=path).add_many(['b'], np.eye(1, 4, 1))
+
+        reopened = ChunkEmbeddingCache(model_name='m', path=path)
+        assert len(reopened) == 2
+        assert np.allclose(reopened.get_many(['b'])[0], [0, 1, 0, 0])
+
+    def test_dimension_change_discards_entries(self, tmp_path):
+        """A model with another dimension starts the persisted cache afresh instead of failing"""
+        path = str(tmp_path / "cache")
+        ChunkEmbeddingCache(model_name='m', path=path).add_many(['a', 'b'], np.eye(2, 4))
+
+        cache = ChunkEmbeddingCache(model_name='m2', path=path)
+        assert len(cache) == 2
+        cache.add_many(['c'], np.eye(1, 8))
+        assert len(cache) == 1
+
+        reopened = ChunkEmbeddingCache(model_name='m2', path=path)
+        assert len(reopened) == 1
+        assert np.allclose(reopened.get_many(['c'])[0], np.eye(1, 8)[0])
+
+    def test_concurrent_writers_share_directory(self, tmp_path):
+        """Writers with their own cache instances (as in worker processes) append whole records"""
+        path = str(tmp_path / "cache")
+
+        def write(worker):
+            cache = ChunkEmbeddingCache(model_name='m', path=path)
+            rng = np.random.default_rng(worker)
+            for i in range(50):
+                cache.add_many([f"{worker}-{i}-{j}" for j in range(4)], rng.normal(size=(4, 8)))
+        errors = []
+
+        def run(worker):
+            try:
+                write(worker)
+            except Exception as e:
+                errors.append(e)
+        threads = [threading.Thread(target=run, args=(worker,)) for worker in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+
+        reopened = ChunkEmbeddingCache(model_name='m', path=path)
+        assert len(reopened) == 4 * 50 * 4
+        assert np.allclose(np.linalg.norm(reopened._vectors.vectors, axis=1), 1.0)
+
+    def test_missing_records_file(self, tmp_path):
+        """Metadata without a records file (e.g. after a crash) loads as an empty cache"""
+        path = str(tmp_path / "cache")
+        ChunkEmbeddingCache(model_name='m', path=path).add_many(['a'], np.eye(1, 4))
+        os.remove(os.path.join(path, 'records.bin'))
+
+        reopened = ChunkEmbeddingCache(model_name='m', path=path)
+        assert len(reopened) == 0
+        reopened.add_many(['b'], np.eye(1, 4))
+        assert len(ChunkEmbeddingCache(model_name='m', path=path)) == 1
+
+    def test_max_entries(self):
+        """A full cache stops admitting new entries"""
+        cache = ChunkEmbeddingCache(max_entries=1)
+        cache.add_many(['a', 'b'], np.eye(2))
+        assert len(cache) == 1
+        assert cache.get_many(['b']) == [None]
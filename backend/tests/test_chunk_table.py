@@ -0,0 +1,56 @@
+"""
+Unit tests for Chunk Table Service
+Tests columnar chunk storage and the UTF-8 text arena
+"""
+
+import pytest
+from api.services.chunk_table import ChunkRecord, ChunkTable
+
+
+class TestChunkTable:
+    """Test suite for ChunkTable"""
+
+    def test_append_and_read_back(self):
+        """Rows round-trip through the columns and the arena, including non-ASCII text"""
+        table = ChunkTable()
+        texts = ["First chunk.", "Zweiter Abschnitt – Größe", "", "最后一块"]
+        assert table.append([3] * len(texts), range(len(texts)), texts) == range(0, 4)
+
+        assert len(table) == 4
+        assert [record.text for record in table] == texts
+        assert table[-1] == ChunkRecord(3, 3, "最后一块")
+        assert list(table.doc_ords) == [3, 3, 3, 3]
+        assert list(table.chunk_indexes) == [0, 1, 2, 3]
+        with pytest.raises(IndexError):
+            table[4]
+
+    def test_growth_keeps_earlier_rows(self):
+        """Columns and arena grow past their initial capacity without moving rows"""
+        table = ChunkTable(initial_capacity=2, initial_arena=8)
+        for ordinal in range(50):
+            table.append([ordinal, ordinal], [0, 1], [f"doc {ordinal} a", f"doc {ordinal} b" * ordinal])
+
+        assert len(table) == 100
+        assert table[0] == ChunkRecord(0, 0, "doc 0 a")
+        assert table[99] == ChunkRecord(49, 1, "doc 49 b" * 49)
+
+        copy = ChunkTable()
+        copy.extend(table[row] for row in range(10, 20))
+        assert list(copy) == [table[row] for row in range(10, 20)]
+
+    def test_records_have_no_instance_dict(self):
+        """Materialized records use __slots__ and convert to the stored dict form"""
+        record = ChunkTable()
+        record.append([1], [0], ["text"])
+        record = record[0]
+        assert not hasattr(record, '__dict__')
+        assert ChunkRecord.from_dict(record.as_dict()) == record
+
+    def test_memory_usage(self):
+        """The text arena holds the UTF-8 bytes; integer columns are int32"""
+        table = ChunkTable(initial_capacity=4, initial_arena=16)
+        table.append([0] * 4, range(4), ["abcd"] * 4)
+        usage = table.memory_usage()
+        assert usage['text_arena'] == 16
+        assert usage['doc_ords'] == usage['chunk_indexes'] == 16
+        assert usage['offsets'] == 5 * 8
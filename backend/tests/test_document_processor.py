@@ -0,0 +1,644 @@
+"""
+Unit tests for Document Processor Service
+Tests ingestion, embedding storage and document search
+"""
+
+import asyncio
+import threading
+import time
+import numpy as np
+import pytest
+from api.services.chunk_table import ChunkRecord
+from api.services.document_processor import DocumentProcessor
+from api.services.vector_index import Int8EmbeddingStore, PQEmbeddingStore
+from api.services.vector_store import PersistentVectorStore
+
+
+SAMPLE_DOCS = {
+    'alice_resume.txt': "Alice Johnson. Skills: Python, Django and AWS. Experience: five years building APIs.",
+    'bob_resume.txt': "Bob Smith. Skills: Java and Kubernetes. Experience: data engineering pipelines.",
+    'handbook.txt': "The office opens at nine. Lunch is served at noon. Parking is available on site.",
+}
+
+
+class TestDocumentProcessor:
+    """Test suite for DocumentProcessor"""
+
+    @pytest.fixture
+    def processor(self):
+        """Create DocumentProcessor instance for testing"""
+        return DocumentProcessor()
+
+    async def _ingest(self, processor, docs=SAMPLE_DOCS):
+        for filename, text in docs.items():
+            result = await processor.process_document(filename, text.encode(), 'text/plain')
+            assert result['success']
+
+    @pytest.mark.asyncio
+    async def test_process_document_fills_matrix(self, processor):
+        """Every chunk has exactly one row in the embedding matrix"""
+        await self._ingest(processor)
+
+        assert len(processor.documents) == 3
+        assert sum(len(s.embeddings) for s in processor.segments) == len(processor.chunks)
+        assert not hasattr(processor.chunks[0], 'embedding')
+
+    @pytest.mark.asyncio
+    async def test_document_registry(self, processor):
+        """Chunks carry a document ordinal; ids resolve through the registry"""
+        await self._ingest(processor)
+
+        last = processor.chunks[-1]
+        assert isinstance(last, ChunkRecord) and not hasattr(last, '__dict__')
+        doc = processor.documents[last.doc_ord]
+        assert doc['filename'] == 'handbook.txt'
+        assert processor.get_document(doc['id']) is doc
+        assert processor.get_document('missing') is None
+        assert processor.get_chunk_id(last) == f"{doc['id']}_{last.chunk_index}"
+
+    @pytest.mark.asyncio
+    async def test_memory_breakdown(self, processor):
+        """Statistics report heap bytes per index component"""
+        await self._ingest(processor)
+        memory = processor.get_statistics()['memory_bytes']
+
+        text_bytes = sum(len(text.encode('utf-8')) for text in SAMPLE_DOCS.values())
+        assert memory['chunk_text'] >= text_bytes
+        assert memory['embeddings'] == sum(s.embeddings.nbytes for s in processor.segments)
+        assert memory['total'] == sum(v for k, v in memory.items() if k != 'total')
+
+    @pytest.mark.asyncio
+    async def test_search_documents(self, processor):
+        """Search returns formatted, score-ordered results"""
+        await self._ingest(processor)
+
+        results = await processor.search_documents("python developer", top_k=2)
+
+        assert len(results) == 2
+        assert results[0]['relevance_score'] >= results[1]['relevance_score']
+        assert results[0]['doc_name'] in SAMPLE_DOCS
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize('mode', ['dense', 'lexical', 'hybrid'])
+    async def test_filtered_search(self, mode):
+        """Metadata filters restrict every search mode to the selected documents"""
+        processor = DocumentProcessor(segment_size=2)
+        await self._ingest(processor)
+        assert [d['doc_type'] for d in processor.documents] == ['resume', 'resume', 'general']
+
+        retrieval = await processor.retrieve("parking python skills", top_k=5, mode=mode,
+                                             filters={'doc_type': 'resume', 'filename': {'$ne': 'bob_resume.txt'}})
+        assert {r['doc_name'] for r in retrieval['results']} == {'alice_resume.txt'}
+        assert retrieval['timings']['filtered_chunks'] == 1
+
+        results = await processor.search_documents("python", mode=mode, filters={'doc_type': 'contract'})
+        assert results == []
+        with pytest.raises(ValueError):
+            await processor.search_documents("python", mode=mode, filters={'author': 'alice'})
+
+    @pytest.mark.asyncio
+    async def test_filtered_batch_search_by_upload_time(self, processor):
+        """Time-range filters apply to batched searches too"""
+        await self._ingest(processor)
+        latest = processor.documents[-1]['processed_at']
+
+        batches = await processor.search_documents_batch(["python", "parking"], top_k=3,
+                                                         filters={'processed_at': {'$gte': latest}})
+        assert all(r['doc_name'] == 'handbook.txt' for results in batches for r in results)
+        assert all(len(results) == 1 for results in batches)
+
+    @pytest.mark.asyncio
+    async def test_dense_search_without_model_is_relevant(self, processor):
+        """The feature-hashing fallback ranks documents sharing the query's terms first"""
+        await self._ingest(processor)
+
+        for query, expected in (("python django", 'alice_resume.txt'), ("parking on site", 'handbook.txt')):
+            results = await processor.search_documents(query, top_k=1, mode='dense')
+            assert results[0]['doc_name'] == expected
+
+    @pytest.mark.asyncio
+    async def test_search_empty_corpus(self, processor):
+        """Searching before ingestion returns no results"""
+        assert await processor.search_documents("anything") == []
+
+    @pytest.mark.asyncio
+    async def test_ivf_falls_back_to_exact_until_trained(self):
+        """Small segments use exact search; sealed segments large enough get a trained IVF index"""
+        processor = DocumentProcessor(index_type='ivf', ivf_nlist=2, ivf_nprobe=2, ann_min_size=3,
+                                      segment_size=4, compaction_threshold=0)
+        exact = DocumentProcessor(compaction_threshold=0)
+        for p in (processor, exact):
+            await self._ingest(p, dict(list(SAMPLE_DOCS.items())[:1]))
+        assert not any(s.ann_index for s in processor.segments)
+
+        for p in (processor, exact):
+            await self._ingest(p)
+        await processor.merge_segments()
+        indexed = [s for s in processor.segments if s.ann_index is not None]
+        assert indexed and all(s.ann_index.is_trained and len(s.ann_index) == len(s) for s in indexed)
+
+        # With every cell probed the ANN results equal exact search
+        for query in ("python", "parking", "kubernetes"):
+            found = await processor.search_documents(query, top_k=3)
+            expected = await exact.search_documents(query, top_k=3)
+            assert [(r['doc_name'], r['chunk_index']) for r in found] == \
+                   [(r['doc_name'], r['chunk_index']) for r in expected]
+
+    def test_unknown_index_type(self):
+        """Unsupported index types are rejected at construction"""
+        with pytest.raises(ValueError):
+            DocumentProcessor(index_type='bogus')
+
+    @pytest.mark.asyncio
+    async def test_hnsw_indexes_sealed_segments(self):
+        """Sealed segments get an HNSW graph in the background; the head is searched exactly"""
+        processor = DocumentProcessor(index_type='hnsw', ann_min_size=1, segment_size=2)
+        await self._ingest(processor)
+        await processor.merge_segments()
+        assert all(len(s.ann_index) == len(s) for s in processor.segments if s.sealed)
+        assert processor.get_statistics()['ann_index_ready']
+
+        results = await processor.search_documents("Alice Johnson", top_k=len(processor.chunks))
+        assert len(results) == len(processor.chunks)
+
+    @pytest.mark.asyncio
+    async def test_binary_index_tier(self):
+        """Sealed segments get a binary prefilter that re-ranks to the exact results"""
+        processor = DocumentProcessor(index_type='binary', binary_rerank_k=10, ann_min_size=1, segment_size=2)
+        exact = DocumentProcessor(segment_size=2)
+        for p in (processor, exact):
+            await self._ingest(p)
+        await processor.merge_segments()
+        assert all(len(s.ann_index) == len(s) for s in processor.segments if s.sealed)
+
+        # A shortlist covering every row re-ranks to the exact order
+        for query in ("python", "parking"):
+            found = await processor.search_documents(query, top_k=3)
+            expected = await exact.search_documents(query, top_k=3)
+            assert [r['doc_name'] for r in found] == [r['doc_name'] for r in expected]
+
+    @pytest.mark.asyncio
+    async def test_pq_storage(self):
+        """PQ storage trains once enough chunks exist and still answers searches"""
+        processor = DocumentProcessor(storage='pq', pq_subspaces=8, pq_train_size=3, pq_rescore_k=10,
+                                      segment_size=3)
+        await self._ingest(processor)
+        await processor.merge_segments()
+
+        sealed = [s for s in processor.segments if s.sealed]
+        assert sealed and all(isinstance(s.embeddings, PQEmbeddingStore) for s in sealed)
+        assert any(s.embeddings.is_trained for s in sealed)
+        results = await processor.search_documents("python", top_k=2)
+        assert len(results) == 2
+        assert processor.get_statistics()['embedding_storage'] == 'pq'
+
+    @pytest.mark.asyncio
+    async def test_int8_storage(self):
+        """Int8 storage quantizes sealed segments and ranks like float32 storage"""
+        processor = DocumentProcessor(storage='int8', int8_train_size=2, int8_rescore_k=10, segment_size=3)
+        reference = DocumentProcessor(segment_size=3)
+        await self._ingest(processor)
+        await self._ingest(reference)
+        await processor.merge_segments()
+
+        sealed = [s for s in processor.segments if s.sealed]
+        assert sealed and all(isinstance(s.embeddings, Int8EmbeddingStore) for s in sealed)
+        assert all(s.embeddings.is_trained for s in sealed)
+        results = await processor.search_documents("python", top_k=2)
+        expected = await reference.search_documents("python", top_k=2)
+        assert [r['doc_name'] for r in results] == [r['doc_name'] for r in expected]
+        assert processor.get_statistics()['embedding_storage'] == 'int8'
+
+    def test_pq_storage_requires_flat_index(self):
+        """ANN graph/IVF indexes need full-precision vectors"""
+        with pytest.raises(ValueError):
+            DocumentProcessor(storage='pq', index_type='hnsw')
+
+    @pytest.mark.asyncio
+    async def test_lexical_search(self, processor):
+        """BM25 mode finds exact skill keywords regardless of embeddings"""
+        await self._ingest(processor)
+
+        results = await processor.search_documents("Kubernetes", top_k=3, mode='lexical')
+        assert results[0]['doc_name'] == 'bob_resume.txt'
+        assert sum(len(s.lexical_index) for s in processor.segments) == len(processor.chunks)
+
+    @pytest.mark.asyncio
+    async def test_unknown_search_mode(self, processor):
+        with pytest.raises(ValueError):
+            await processor.search_documents("python", mode='bogus')
+
+    @pytest.mark.asyncio
+    async def test_hybrid_retrieval_reports_timings(self, processor):
+        """Hybrid mode fuses both stages and reports per-stage timings"""
+        await self._ingest(processor)
+
+        retrieval = await processor.retrieve("Kubernetes", top_k=2, mode='hybrid')
+        timings = retrieval['timings']
+
+        assert len(retrieval['results']) == 2
+        assert {'dense_ms', 'lexical_ms', 'fusion_ms', 'total_ms'} <= set(timings)
+        assert timings['dense_candidates'] == len(processor.chunks)
+        assert timings['lexical_candidates'] >= 1
+
+    @pytest.mark.asyncio
+    async def test_hybrid_stage_budget(self):
+        """A stage that overruns its latency budget is dropped from fusion"""
+        processor = DocumentProcessor(hybrid_stage_timeout_ms=50)
+        await self._ingest(processor)
+
+        def slow_dense(snapshot, query, top_k, query_embedding=None):
+            time.sleep(0.3)
+            return [], []
+        processor._dense_search = slow_dense
+
+        retrieval = await processor.retrieve("Kubernetes", top_k=3, mode='hybrid')
+        assert retrieval['timings']['dense_timed_out']
+        assert retrieval['results'][0]['doc_name'] == 'bob_resume.txt'
+
+    def test_reciprocal_rank_fusion(self, processor):
+        """Rows ranked well in both lists win; scores follow 1 / (k + rank)"""
+        rows, scores = processor._reciprocal_rank_fusion([[1, 2, 3], [3, 1, 4]], top_k=3)
+        assert rows[:2] == [1, 3]
+        assert scores[0] == pytest.approx(1 / 61 + 1 / 62)
+
+    @pytest.mark.asyncio
+    async def test_batch_search_matches_single_queries(self, processor):
+        """Batched dense search returns the same hits as one search per query"""
+        await self._ingest(processor)
+        queries = ["python developer", "kubernetes", "parking"]
+
+        batch = await processor.search_documents_batch(queries, top_k=2)
+        assert len(batch) == 3
+        for query, results in zip(queries, batch):
+            single = await processor.search_documents(query, top_k=2)
+            assert [r['doc_id'] for r in results] == [r['doc_id'] for r in single]
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("mode", ['dense', 'hybrid'])
+    async def test_batch_search_embeds_queries_once(self, mode):
+        """ANN segments and hybrid mode reuse one batch embedding of all queries"""
+        processor = DocumentProcessor(index_type='hnsw', ann_min_size=1, segment_size=2)
+        await self._ingest(processor)
+        await processor.merge_segments()
+        assert any(segment.ann_index is not None for segment in processor.segments)
+        queries = ["python developer", "kubernetes", "parking"]
+        singles = [await processor.search_documents(query, top_k=2, mode=mode) for query in queries]
+
+        calls = []
+        embed = processor._embed_queries
+
+        def counting_embed(texts):
+            calls.append(list(texts))
+            return embed(texts)
+        processor._embed_queries = counting_embed
+
+        batch = await processor.search_documents_batch(queries, top_k=2, mode=mode)
+        assert calls == [queries]
+        assert [[r['doc_id'] for r in results] for results in batch] == \
+            [[r['doc_id'] for r in results] for results in singles]
+
+    @pytest.mark.asyncio
+    async def test_batch_search_other_modes(self, processor):
+        """Lexical batches are searched per query without the model"""
+        await self._ingest(processor)
+        batch = await processor.search_documents_batch(["Kubernetes", "nothing"], top_k=1, mode='lexical')
+        assert batch[0][0]['doc_name'] == 'bob_resume.txt'
+        assert batch[1] == []
+
+    @pytest.mark.asyncio
+    async def test_query_embedding_cache(self, processor):
+        """Repeated queries, modulo case and whitespace, reuse the cached embedding"""
+        await self._ingest(processor)
+
+        first = await processor.search_documents("Python developer", top_k=2)
+        second = await processor.search_documents("  python   DEVELOPER ", top_k=2)
+        assert [r['doc_id'] for r in first] == [r['doc_id'] for r in second]
+
+        stats = processor.get_statistics()['query_embedding_cache']
+        assert stats['hits'] == 1
+        assert stats['misses'] == 1
+        assert stats['current_size'] == 1
+
+    @pytest.mark.asyncio
+    async def test_duplicate_chunks_are_not_re_embedded(self, processor):
+        """Uploading a copy of a document serves every chunk from the content-hash cache"""
+        calls = []
+        encode = processor._encode_texts
+
+        async def counting_encode(texts, batch_size=32):
+            calls.append(list(texts))
+            return await encode(texts, batch_size)
+        processor._encode_texts = counting_encode
+
+        text = SAMPLE_DOCS['alice_resume.txt'].encode()
+        first = await processor.process_document('alice_resume.txt', text, 'text/plain')
+        again = await processor.process_document('alice_copy.txt', text, 'text/plain')
+
+        assert first['chunks_embedded'] == first['chunks_created']
+        assert again['chunks_embedded'] == 0
+        assert again['dedup_ratio'] == 1.0
+        assert len(calls) == 1
+        vectors = processor.segments[0].embeddings.vectors
+        assert np.allclose(vectors[0], vectors[len(calls[0])])
+        assert processor.get_statistics()['chunk_embedding_cache']['dedup_ratio'] == 0.5
+
+    def test_query_embedding_cache_is_bounded(self):
+        """The least recently used embedding is evicted once the cache is full"""
+        processor = DocumentProcessor(query_cache_size=2)
+        processor._embed_queries(["a", "b"])
+        processor._embed_queries(["a", "c"])
+
+        assert list(processor.query_cache.cache) == ["a", "c"]
+
+    @pytest.mark.asyncio
+    async def test_background_model_loading(self):
+        """The constructor returns before the model loads; requests wait on the warm-up"""
+        processor = DocumentProcessor(model_loading='background')
+        assert processor.model_load_status()['status'] == 'pending'
+
+        await self._ingest(processor)
+
+        status = processor.model_load_status()
+        assert status['ready'] and status['backend'] == 'hashing'
+
+    @pytest.mark.asyncio
+    async def test_requests_degrade_while_model_loads(self, tmp_path):
+        """Ingestion is refused and dense search falls back to BM25 until the model is ready"""
+        store_path = str(tmp_path / "store")
+        await self._ingest(DocumentProcessor(store_path=store_path))
+
+        loaded = threading.Event()
+        processor = DocumentProcessor(store_path=store_path, model_loading='background',
+                                      model_wait_timeout=0.05)
+        load = processor._init_embedding_model
+        processor._init_embedding_model = lambda: (loaded.wait(5), load())
+
+        result = await processor.process_document('new.txt', b"text", 'text/plain')
+        assert not result['success']
+        assert processor.model_load_status()['status'] == 'pending'
+
+        retrieval = await processor.retrieve("Kubernetes", top_k=1, mode='dense')
+        assert retrieval['timings']['degraded_from'] == 'dense'
+        assert retrieval['results'][0]['doc_name'] == 'bob_resume.txt'
+        batch = await processor.retrieve_batch(["Kubernetes", "parking"], top_k=1, mode='dense')
+        assert batch['timings']['degraded_from'] == 'dense' and batch['timings']['mode'] == 'lexical'
+        assert [r[0]['doc_name'] for r in batch['results']] == ['bob_resume.txt', 'handbook.txt']
+
+        loaded.set()
+        assert await processor.wait_for_model(5)
+        assert 'degraded_from' not in (await processor.retrieve("Kubernetes", mode='dense'))['timings']
+        assert 'degraded_from' not in (await processor.retrieve_batch(["Kubernetes"], mode='dense'))['timings']
+
+    CONTRACT_V1 = ("1. The parties agree to the terms below.\n"
+                   "2. Payment is due within thirty days.\n"
+                   "3. Either party may terminate with notice.")
+    CONTRACT_V2 = CONTRACT_V1.replace("thirty days", "fourteen days of invoice")
+
+    @pytest.mark.asyncio
+    async def test_reupload_replaces_changed_chunks_only(self):
+        """A re-uploaded document replaces its old version and only changed chunks are embedded"""
+        processor = DocumentProcessor(chunk_cache_size=0, compaction_threshold=0)
+        calls = []
+        encode = processor._encode_texts
+
+        async def counting_encode(texts, batch_size=32):
+            calls.append(list(texts))
+            return await encode(texts, batch_size)
+        processor._encode_texts = counting_encode
+
+        first = await processor.process_document('contract.txt', self.CONTRACT_V1.encode(), 'text/plain')
+        second = await processor.process_document('contract.txt', self.CONTRACT_V2.encode(), 'text/plain')
+
+        assert second['replaced_doc_id'] == first['doc_id']
+        assert second['chunks_reused'] == 2 and second['chunks_embedded'] == 1
+        assert calls[-1] == ["Payment is due within fourteen days of invoice."]
+        assert processor.document_count == 1
+        stats = processor.get_statistics()
+        assert stats['total_chunks'] == 3 and stats['tombstoned_chunks'] == 3
+
+        for mode in DocumentProcessor.SEARCH_MODES:
+            results = await processor.search_documents("payment due days", top_k=10, mode=mode)
+            assert {r['doc_id'] for r in results} == {second['doc_id']}
+        batch = await processor.search_documents_batch(["payment"], top_k=10)
+        assert {r['doc_id'] for r in batch[0]} == {second['doc_id']}
+
+    @pytest.mark.asyncio
+    async def test_explicit_document_key(self, processor):
+        """Documents with different filenames replace each other when they share a key"""
+        first = await processor.process_document('handbook-2025.txt', b"Old handbook.", 'text/plain',
+                                                 doc_key='handbook')
+        second = await processor.process_document('handbook-2026.txt', b"New handbook.", 'text/plain',
+                                                  doc_key='handbook')
+        other = await processor.process_document('handbook-2026.txt', b"Unrelated.", 'text/plain')
+
+        assert second['replaced_doc_id'] == first['doc_id']
+        assert 'replaced_doc_id' not in other
+        assert processor.current_document('handbook')['filename'] == 'handbook-2026.txt'
+        assert processor.document_count == 2
+
+    @pytest.mark.asyncio
+    async def test_replacement_persists_in_store(self, tmp_path):
+        """Reopening a persistent store serves only the current version of each document"""
+        store_path = str(tmp_path / "store")
+        processor = DocumentProcessor(store_path=store_path)
+        await processor.process_document('contract.txt', self.CONTRACT_V1.encode(), 'text/plain')
+        second = await processor.process_document('contract.txt', self.CONTRACT_V2.encode(), 'text/plain')
+        assert second['chunks_reused'] == 2
+
+        reopened = DocumentProcessor(store_path=store_path)
+        results = await reopened.search_documents("payment", top_k=10)
+        assert {r['doc_id'] for r in results} == {second['doc_id']}
+        assert reopened.document_count == 1
+
+    @pytest.mark.asyncio
+    async def test_delete_document(self):
+        """Deleted documents disappear from every search mode at once"""
+        processor = DocumentProcessor(compaction_threshold=0)
+        await self._ingest(processor)
+        bob = processor.current_document('bob_resume.txt')['id']
+
+        result = await processor.delete_document(bob)
+        assert result['success'] and result['chunks_deleted'] >= 1
+        assert not (await processor.delete_document(bob))['success']
+        assert processor.document_count == 2
+
+        for mode in DocumentProcessor.SEARCH_MODES:
+            results = await processor.search_documents("Kubernetes", top_k=10, mode=mode)
+            assert bob not in {r['doc_id'] for r in results}
+        stats = processor.get_statistics()
+        assert stats['deleted_documents'] == 1 and stats['tombstone_ratio'] > 0
+
+    @pytest.mark.asyncio
+    async def test_compaction_reclaims_tombstones(self):
+        """Compaction keeps only current documents and rebuilds the ANN and lexical indexes"""
+        processor = DocumentProcessor(index_type='hnsw', ann_min_size=1, compaction_threshold=0)
+        await self._ingest(processor)
+        await processor.process_document('handbook.txt', b"The office now opens at eight.", 'text/plain')
+        await processor.delete_document(processor.current_document('bob_resume.txt')['id'])
+        expected = {r['doc_id'] for r in await processor.search_documents("office", top_k=10)}
+
+        assert await processor.compact()
+        assert not await processor.compact()
+        assert {processor.documents[c.doc_ord]['filename'] for c in processor.chunks} == \
+               {'alice_resume.txt', 'handbook.txt'}
+        for segment in processor.segments:
+            assert segment.built
+            assert len(segment.embeddings) == len(segment.ann_index) == len(segment.lexical_index) == len(segment)
+        assert processor.tombstone_ratio == 0
+        assert {r['doc_id'] for r in await processor.search_documents("office", top_k=10)} == expected
+        assert processor.get_statistics()['compactions'] == 1
+
+    @pytest.mark.asyncio
+    async def test_compaction_runs_in_background(self, processor):
+        """Crossing the tombstone threshold schedules a compaction"""
+        await self._ingest(processor)
+        for filename in ('alice_resume.txt', 'bob_resume.txt'):
+            await processor.delete_document(processor.current_document(filename)['id'])
+
+        await processor._maintenance
+        assert processor.compactions == 1
+        assert processor.document_count == 1
+        assert {c.doc_ord for c in processor.chunks} == {2}
+
+    @pytest.mark.asyncio
+    async def test_delete_and_compact_persistent_store(self, tmp_path):
+        """Deletions survive a reopen, and compaction rewrites the store for every reader"""
+        store_path = str(tmp_path / "store")
+        processor = DocumentProcessor(store_path=store_path, compaction_threshold=0)
+        await self._ingest(processor)
+        await processor.delete_document(processor.current_document('alice_resume.txt')['id'])
+
+        reader = DocumentProcessor(store_path=store_path)
+        reader.open_store()
+        assert reader.document_count == 2
+        assert 'alice_resume.txt' not in {r['doc_name'] for r in await reader.search_documents("python", top_k=10)}
+
+        assert await processor.compact()
+        assert len(processor.documents) == 2 and processor.tombstone_ratio == 0
+        results = await reader.search_documents("Kubernetes", top_k=10, mode='lexical')
+        assert results[0]['doc_name'] == 'bob_resume.txt'
+        assert len(reader.chunks) == len(processor.chunks)
+
+    @pytest.mark.asyncio
+    async def test_store_loads_in_background(self, tmp_path):
+        """A server indexes the store on a worker thread and serves requests meanwhile"""
+        store_path = str(tmp_path / "store")
+        await self._ingest(DocumentProcessor(store_path=store_path))
+
+        processor = DocumentProcessor(store_path=store_path)
+        threads = []
+        index_store = processor._index_store
+        processor._index_store = lambda *args: (threads.append(threading.current_thread()), index_store(*args))[1]
+        processor.start_store_loading()
+        assert processor.document_count == 0
+        assert processor.get_statistics()['total_chunks'] == 0
+
+        await processor._store_loading
+        assert threads and threads[0] is not threading.main_thread()
+        assert processor.document_count == len(SAMPLE_DOCS)
+        results = await processor.search_documents("Kubernetes", top_k=1)
+        assert results[0]['doc_name'] == 'bob_resume.txt'
+
+    @pytest.mark.asyncio
+    async def test_search_served_while_compaction_holds_store_lock(self, tmp_path, monkeypatch):
+        """Uploads wait for the store's writer lock on a worker thread; searches keep being served"""
+        processor = DocumentProcessor(store_path=str(tmp_path / "store"), compaction_threshold=None)
+        await self._ingest(processor)
+        await processor.delete_document(processor.current_document('alice_resume.txt')['id'])
+
+        locked, release = threading.Event(), threading.Event()
+        compact = PersistentVectorStore.compact
+
+        def slow_compact(store, drop=(), block_size=65536):
+            with store._locked():
+                locked.set()
+                release.wait(5)
+            compact(store, drop, block_size)
+        monkeypatch.setattr(PersistentVectorStore, 'compact', slow_compact)
+
+        compaction = asyncio.create_task(processor.compact())
+        await asyncio.get_running_loop().run_in_executor(None, locked.wait, 5)
+        upload = asyncio.create_task(
+            processor.process_document('notes.txt', b"Notes on Kubernetes upgrades.", 'text/plain'))
+
+        results = await asyncio.wait_for(processor.search_documents("Kubernetes", top_k=10), 2)
+        assert results[0]['doc_name'] == 'bob_resume.txt'
+        assert not upload.done() and not compaction.done()
+
+        release.set()
+        assert (await upload)['success'] and await compaction
+        results = await processor.search_documents("Kubernetes upgrades", top_k=10)
+        assert {r['doc_name'] for r in results} == {'bob_resume.txt', 'handbook.txt', 'notes.txt'}
+        assert 'alice_resume.txt' not in {processor.documents[c.doc_ord]['filename'] for c in processor.chunks}
+
+    @pytest.mark.asyncio
+    async def test_snapshot_isolated_from_ingestion(self, processor):
+        """A snapshot keeps answering from the documents it was taken with"""
+        first = await processor.process_document('contract.txt', self.CONTRACT_V1.encode(), 'text/plain')
+        snapshot = processor._snapshot
+        second = await processor.process_document('contract.txt', self.CONTRACT_V2.encode(), 'text/plain')
+        await self._ingest(processor)
+
+        query = processor._embed_queries(["payment"])[0]
+        rows, scores = snapshot.search(query, 10)
+        assert {r['doc_id'] for r in processor._format_results(snapshot, rows, scores)} == {first['doc_id']}
+        rows, scores = snapshot.lexical_search("payment", 10)
+        assert {r['doc_id'] for r in processor._format_results(snapshot, rows, scores)} == {first['doc_id']}
+
+        results = await processor.search_documents("payment", top_k=10)
+        assert second['doc_id'] in {r['doc_id'] for r in results}
+        assert first['doc_id'] not in {r['doc_id'] for r in results}
+
+    @pytest.mark.asyncio
+    async def test_size_tiered_merges(self):
+        """Sealed segments of one size tier are merged without changing search results"""
+        docs = {f"note_{i}.txt": f"Note {i} about topic {i % 3} and more." for i in range(8)}
+        processor = DocumentProcessor(segment_size=1, merge_factor=2)
+        flat = DocumentProcessor()
+        await self._ingest(processor, docs)
+        await self._ingest(flat, docs)
+        await processor.merge_segments()
+
+        stats = processor.get_statistics()
+        assert stats['segment_merges'] >= 4 and stats['segments'] < len(docs)
+        assert len(processor.chunks) == len(flat.chunks)
+        for mode in DocumentProcessor.SEARCH_MODES:
+            found = await processor.search_documents("topic 2 note", top_k=5, mode=mode)
+            expected = await flat.search_documents("topic 2 note", top_k=5, mode=mode)
+            assert [r['doc_name'] for r in found] == [r['doc_name'] for r in expected]
+            assert [r['relevance_score'] for r in found] == pytest.approx([r['relevance_score'] for r in expected])
+
+    @pytest.mark.asyncio
+    async def test_search_while_ingesting(self):
+        """Searches on other threads never observe a half-applied commit or merge"""
+        processor = DocumentProcessor(segment_size=4, merge_factor=2, compaction_threshold=0.2)
+        query = processor._embed_queries(["report"])[0]
+        stop, errors = threading.Event(), []
+
+        def reader():
+            while not stop.is_set():
+                try:
+                    snapshot = processor._snapshot
+                    for rows, _ in (snapshot.search(query, 5), snapshot.lexical_search("report", 5)):
+                        for row in rows:
+                            snapshot.documents[snapshot[int(row)].doc_ord]
+                except Exception as e:
+                    errors.append(e)
+                    return
+
+        thread = threading.Thread(target=reader)
+        thread.start()
+        try:
+            for i in range(60):
+                await processor.process_document(f"report_{i % 20}.txt", f"Report {i} text.".encode(), 'text/plain')
+        finally:
+            stop.set()
+            thread.join()
+        await processor.merge_segments()
+
+        assert errors == []
+        assert processor.document_count == 20
+        results = await processor.search_documents("report", top_k=40, mode='lexical')
+        assert len(results) == 20
+
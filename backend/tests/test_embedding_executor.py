@@ -0,0 +1,112 @@
+"""
+Unit tests for Embedding Executor Service
+Tests the bounded worker pool used for model calls and query micro-batching
+"""
+
+import asyncio
+import threading
+import numpy as np
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+from api.services.embedding_executor import EmbeddingExecutor, MicroBatcher, encode_in_worker, encode_texts
+
+
+class TestEmbeddingExecutor:
+    """Test suite for EmbeddingExecutor"""
+
+    def test_unknown_kind(self):
+        with pytest.raises(ValueError):
+            EmbeddingExecutor(kind='gpu')
+
+    @pytest.mark.asyncio
+    async def test_jobs_run_off_the_event_loop(self):
+        """Jobs execute on pool threads, not the loop's thread"""
+        executor = EmbeddingExecutor(workers=2)
+        loop_thread = threading.get_ident()
+
+        job_thread = await executor.run(threading.get_ident)
+        assert job_thread != loop_thread
+        executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_pending_jobs_are_bounded(self):
+        """Callers beyond max_pending wait for a slot instead of queueing"""
+        executor = EmbeddingExecutor(workers=1, max_pending=1)
+        release = threading.Event()
+        running = []
+
+        def job(i):
+            running.append(i)
+            release.wait(5)
+            return i
+
+        first = asyncio.ensure_future(executor.run(job, 0))
+        second = asyncio.ensure_future(executor.run(job, 1))
+        await asyncio.sleep(0.05)
+        assert executor.get_statistics()['pending'] == 1
+        assert executor.queue_waits == 1
+
+        release.set()
+        assert await asyncio.gather(first, second) == [0, 1]
+        assert executor.completed == 2
+        executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_process_pool_matches_thread_encoding(self):
+        """Process workers produce the same (mock) embeddings as in-process encoding"""
+        executor = EmbeddingExecutor(kind='process', workers=1)
+        texts = ["alpha", "beta"]
+
+        encoded = await executor.run(encode_in_worker, None, texts, 32, 16)
+        assert np.array_equal(encoded, encode_texts(None, texts, 32, 16))
+        executor.shutdown()
+
+
+class TestMicroBatcher:
+    """Test suite for MicroBatcher"""
+
+    def test_concurrent_encodes_share_a_batch(self):
+        """Requests arriving within the wait window are encoded in one call"""
+        calls = []
+
+        def encode(texts):
+            calls.append(list(texts))
+            return encode_texts(None, texts, dim=8)
+
+        batcher = MicroBatcher(encode, max_batch=8, max_wait_ms=200)
+        with ThreadPoolExecutor(4) as pool:
+            results = list(pool.map(lambda t: batcher.encode([t]), ["a", "b", "c", "d"]))
+
+        assert len(calls) == 1
+        for text, vectors in zip("abcd", results):
+            assert np.array_equal(vectors[0], encode_texts(None, [text], dim=8)[0])
+        stats = batcher.get_statistics()
+        assert stats['batch_size_histogram'] == {'4': 1}
+        batcher.shutdown()
+
+    def test_batches_are_capped(self):
+        """Merged batches never exceed max_batch; full batches bypass the queue"""
+        calls = []
+
+        def encode(texts):
+            calls.append(len(texts))
+            return encode_texts(None, texts, dim=4)
+
+        batcher = MicroBatcher(encode, max_batch=2, max_wait_ms=50)
+        with ThreadPoolExecutor(3) as pool:
+            list(pool.map(lambda t: batcher.encode([t]), ["a", "b", "c"]))
+        assert sum(calls) == 3 and max(calls) <= 2
+
+        calls.clear()
+        assert batcher.encode(["x", "y", "z"]).shape == (3, 4)
+        assert calls == [3]
+        batcher.shutdown()
+
+    def test_errors_reach_every_caller(self):
+        def encode(texts):
+            raise RuntimeError("model failed")
+
+        batcher = MicroBatcher(encode, max_batch=4, max_wait_ms=1)
+        with pytest.raises(RuntimeError):
+            batcher.encode(["a"])
+        batcher.shutdown()
@@ -0,0 +1,49 @@
+"""
+Unit tests for Hashing Embedder Service
+Tests determinism, normalization and relevance of feature-hashing embeddings
+"""
+
+import numpy as np
+from api.services.hashing_embedder import HashingEmbedder
+
+
+DOCS = [
+    "Alice Johnson. Skills: Python, Django and AWS. Experience: five years building APIs.",
+    "Bob Smith. Skills: Java and Kubernetes. Experience: data engineering pipelines.",
+    "The office opens at nine. Lunch is served at noon. Parking is available on site.",
+]
+
+
+class TestHashingEmbedder:
+    """Test suite for HashingEmbedder"""
+
+    def test_batch_matches_single_texts(self):
+        """A text embeds the same alone or in any batch, without touching the global RNG"""
+        embedder = HashingEmbedder(dim=64)
+        state = np.random.get_state()[1].copy()
+        batch = embedder.encode(DOCS)
+        assert batch.shape == (3, 64) and batch.dtype == np.float32
+        for text, vector in zip(DOCS, batch):
+            assert np.allclose(embedder.encode([text])[0], vector, atol=1e-6)
+        assert np.array_equal(np.random.get_state()[1], state)
+
+    def test_rows_are_normalized(self):
+        """Rows have unit norm; texts without word characters embed to zeros"""
+        vectors = HashingEmbedder(dim=32).encode(DOCS + ["", "?!"])
+        assert np.allclose(np.linalg.norm(vectors[:3], axis=1), 1.0)
+        assert not vectors[3:].any()
+        assert HashingEmbedder().encode([]).shape == (0, 384)
+
+    def test_shared_terms_rank_first(self):
+        """Queries are closest to the documents that share their words, case and punctuation aside"""
+        embedder = HashingEmbedder()
+        docs = embedder.encode(DOCS)
+        for query, expected in (("PYTHON django", 0), ("kubernetes pipelines", 1), ("where is parking?", 2)):
+            assert int(np.argmax(docs @ embedder.encode([query])[0])) == expected
+
+    def test_character_ngrams_match_inflections(self):
+        """Inflected forms share character n-grams even without a common word"""
+        embedder = HashingEmbedder()
+        developers, developer, gardening = embedder.encode(["developers", "developer", "gardening"])
+        assert developers @ developer > 0.3
+        assert developers @ developer > developers @ gardening + 0.3
@@ -0,0 +1,114 @@
+"""
+Unit tests for Ingestion Pipeline Service
+Tests staged multi-file ingestion, batching and job status reporting
+"""
+
+import pytest
+from api.services.document_processor import DocumentProcessor
+from api.services.ingestion_pipeline import IngestionPipeline
+from tests.test_text_extraction import make_pdf
+
+
+def make_files(docs):
+    return [(name, 'text/plain', text.encode(), None, None) for name, text in docs.items()]
+
+
+DOCS = {
+    f'doc_{i}.txt': f"Document {i} discusses topic {i}. It has a second sentence about item {i}."
+    for i in range(12)
+}
+
+
+class TestIngestionPipeline:
+    """Test suite for IngestionPipeline"""
+
+    @pytest.fixture
+    def processor(self):
+        return DocumentProcessor()
+
+    @pytest.mark.asyncio
+    async def test_ingests_every_file(self, processor):
+        """All files are committed and stage throughput is reported"""
+        pipeline = IngestionPipeline(processor, parse_workers=3, queue_size=2, embed_batch_size=4)
+        job = await pipeline.run(make_files(DOCS), {'status': 'processing', 'total': len(DOCS)})
+
+        assert job['processed'] == len(DOCS)
+        assert job['errors'] == []
+        assert len(processor.documents) == len(DOCS)
+        assert sum(len(s.embeddings) for s in processor.segments) == len(processor.chunks) == job['chunks_created']
+        assert {processor.documents[c.doc_ord]['filename'] for c in processor.chunks} == set(DOCS)
+        for stage in ('parse', 'chunk', 'embed'):
+            assert job['stages'][stage]['items'] > 0
+        assert job['stages']['parse']['items'] == len(DOCS)
+
+    @pytest.mark.asyncio
+    async def test_chunks_from_many_files_share_a_batch(self, processor):
+        """The embed stage packs chunks of several documents into one model pass"""
+        batches = []
+        embed = processor.embed_chunks
+
+        async def recording_embed(texts, batch_size=32, previous=None):
+            batches.append(len(texts))
+            return await embed(texts, batch_size, previous)
+        processor.embed_chunks = recording_embed
+
+        pipeline = IngestionPipeline(processor, parse_workers=4, queue_size=16, embed_batch_size=1000)
+        await pipeline.run(make_files(DOCS), {})
+
+        assert sum(batches) == len(processor.chunks)
+        assert len(batches) < len(DOCS)
+
+    @pytest.mark.asyncio
+    async def test_spooled_files_are_read_by_path(self, processor, tmp_path):
+        """Sources may be spooled file paths; the content hash is kept on the document"""
+        path = tmp_path / "spooled.txt"
+        path.write_bytes(DOCS['doc_0.txt'].encode())
+
+        job = await IngestionPipeline(processor).run([('doc_0.txt', 'text/plain', str(path), 'abc123', None)], {})
+
+        assert job['processed'] == 1
+        assert processor.documents[0]['content_sha256'] == 'abc123'
+        assert processor.chunks[0].text.startswith("Document 0")
+
+    @pytest.mark.asyncio
+    async def test_failed_file_does_not_stop_the_job(self, processor, tmp_path):
+        missing = str(tmp_path / "missing.txt")
+        files = make_files(DOCS)[:2] + [('missing.txt', 'text/plain', missing, None, None)]
+        job = await IngestionPipeline(processor, parse_workers=2).run(files, {})
+
+        assert job['processed'] == 2
+        assert len(job['errors']) == 1 and job['errors'][0].startswith("missing.txt:")
+
+    @pytest.mark.asyncio
+    async def test_pdf_pages_stream_through_the_pool(self, processor, tmp_path):
+        """PDF pages are parsed in parallel, chunked per page and committed as one document"""
+        path = tmp_path / "report.pdf"
+        path.write_bytes(make_pdf([f"Quarterly figure {i} rose." for i in range(6)]))
+
+        pipeline = IngestionPipeline(processor, parse_workers=2, embed_batch_size=1,
+                                     pdf_pages_per_task=2, pdf_max_pages=5)
+        try:
+            job = await pipeline.run([('report.pdf', 'application/pdf', str(path), None, None)], {})
+        finally:
+            pipeline.shutdown()
+
+        assert job['errors'] == []
+        assert len(processor.documents) == 1
+        assert [c.text for c in processor.chunks] == [f"Quarterly figure {i} rose." for i in range(5)]
+        assert processor.documents[0]['num_chunks'] == 5
+        assert job['stages']['parse']['items'] == 5
+
+    @pytest.mark.asyncio
+    async def test_reingest_reuses_unchanged_chunks(self, processor):
+        """Re-ingesting a file replaces its document and embeds only the chunks that changed"""
+        pipeline = IngestionPipeline(processor, parse_workers=3)
+        await pipeline.run(make_files(DOCS), {})
+
+        updated = {'doc_0.txt': DOCS['doc_0.txt'].replace("second sentence", "revised sentence")}
+        job = await pipeline.run(make_files(updated), {})
+
+        assert job['documents_replaced'] == 1
+        assert job['chunks_reused'] + job['chunks_embedded'] == job['chunks_created']
+        assert processor.document_count == len(DOCS)
+        results = await processor.search_documents("revised sentence", top_k=len(DOCS), mode='lexical')
+        assert [r['doc_name'] for r in results].count('doc_0.txt') == 1
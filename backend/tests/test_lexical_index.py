@@ -0,0 +1,86 @@
+"""
+Unit tests for Lexical Index Service
+Tests BM25 scoring, MaxScore retrieval and conjunctive matching
+"""
+
+import math
+import pytest
+import numpy as np
+from collections import Counter
+from api.services.lexical_index import BM25Index, CorpusStats, tokenize
+
+
+def brute_force_bm25(texts, query, k1=1.2, b=0.75):
+    """Reference BM25 scores for every text"""
+    docs = [Counter(tokenize(t)) for t in texts]
+    avg = sum(sum(d.values()) for d in docs) / len(docs)
+    scores = []
+    for d in docs:
+        length = sum(d.values())
+        score = 0.0
+        for term in set(tokenize(query)):
+            df = sum(1 for other in docs if term in other)
+            if not df or term not in d:
+                continue
+            idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+            score += idf * d[term] * (k1 + 1) / (d[term] + k1 * (1 - b + b * length / avg))
+        scores.append(score)
+    return scores
+
+
+class TestBM25Index:
+    """Test suite for BM25Index"""
+
+    @pytest.fixture
+    def corpus(self):
+        """Random texts over a small vocabulary with skewed term frequencies"""
+        rng = np.random.default_rng(0)
+        vocab = [f"w{i}" for i in range(60)]
+        weights = 1 / np.arange(1, 61)
+        weights /= weights.sum()
+        return [" ".join(rng.choice(vocab, size=rng.integers(3, 40), p=weights)) for _ in range(400)]
+
+    @pytest.fixture
+    def index(self, corpus):
+        index = BM25Index()
+        for row, text in enumerate(corpus):
+            index.add(row, text)
+        return index
+
+    @pytest.mark.parametrize("query", ["w1", "w3 w17", "w0 w5 w40 w59", "w2 w2 w9"])
+    def test_maxscore_matches_exhaustive_scoring(self, index, corpus, query):
+        """MaxScore early termination returns the exact BM25 top-k"""
+        expected = brute_force_bm25(corpus, query)
+        rows, scores = index.search(query, top_k=10)
+
+        top_expected = sorted(expected, reverse=True)[:10]
+        assert np.allclose(scores, top_expected)
+        assert np.allclose([expected[r] for r in rows], scores)
+
+    def test_match_all_intersects(self, index, corpus):
+        """Conjunctive search only returns rows containing every term"""
+        rows, _ = index.search("w1 w7", top_k=50, match_all=True)
+        assert rows
+        for row in rows:
+            assert {'w1', 'w7'} <= set(tokenize(corpus[row]))
+
+    def test_unknown_terms(self, index):
+        """Queries with no indexed terms return nothing"""
+        assert index.search("nothing here", top_k=5) == ([], [])
+        assert index.search("w1 nothing", top_k=5, match_all=True) == ([], [])
+
+    def test_statistics(self, index, corpus):
+        assert len(index) == len(corpus)
+        assert index.vocabulary_size <= 60
+
+    def test_corpus_stats_across_segments(self, corpus):
+        """Indexes searched with shared corpus statistics score like one index over all rows"""
+        segments = [BM25Index(), BM25Index()]
+        for row, text in enumerate(corpus):
+            segments[row % 2].add(row // 2, text)
+        stats = CorpusStats(segments)
+
+        expected = brute_force_bm25(corpus, "w3 w17")
+        for parity, segment in enumerate(segments):
+            rows, scores = segment.search("w3 w17", top_k=5, stats=stats)
+            assert np.allclose(scores, [expected[2 * r + parity] for r in rows])
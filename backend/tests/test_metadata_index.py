@@ -0,0 +1,94 @@
+"""
+Unit tests for Metadata Index Service
+Tests bitmap indexing and filter expression evaluation
+"""
+
+import pytest
+import numpy as np
+from api.services.metadata_index import MetadataIndex
+
+
+DOCUMENTS = [
+    {'doc_type': 'resume', 'content_type': 'application/pdf', 'filename': 'alice.pdf',
+     'processed_at': '2026-09-20T10:00:00'},
+    {'doc_type': 'review', 'content_type': 'text/plain', 'filename': 'q3_review.txt',
+     'processed_at': '2026-10-02T09:30:00'},
+    {'doc_type': 'resume', 'content_type': 'text/plain', 'filename': 'bob.txt',
+     'processed_at': '2026-10-05T16:45:00'},
+    {'doc_type': 'general', 'content_type': 'text/plain', 'filename': 'handbook.txt'},
+] * 3  # Twelve documents, so bitmaps span more than one byte
+
+
+class TestMetadataIndex:
+    """Test suite for MetadataIndex"""
+
+    @pytest.fixture
+    def index(self):
+        index = MetadataIndex()
+        for ordinal, document in enumerate(DOCUMENTS):
+            index.add(ordinal, document)
+        return index
+
+    def matches(self, index, expression):
+        return [i for i, hit in enumerate(index.evaluate(expression)) if hit]
+
+    def reference(self, predicate):
+        return [i for i, document in enumerate(DOCUMENTS) if predicate(document)]
+
+    def test_no_filter(self, index):
+        """An empty expression selects nothing to filter on"""
+        assert index.evaluate(None) is None
+        assert index.evaluate({}) is None
+
+    def test_categorical_filters(self, index):
+        """Equality, any-of and negations over value bitmaps"""
+        assert self.matches(index, {'doc_type': 'resume'}) == \
+               self.reference(lambda d: d['doc_type'] == 'resume')
+        assert self.matches(index, {'content_type': ['application/pdf', 'text/csv']}) == \
+               self.reference(lambda d: d['content_type'] == 'application/pdf')
+        assert self.matches(index, {'doc_type': {'$nin': ['resume', 'general']}}) == \
+               self.reference(lambda d: d['doc_type'] == 'review')
+        assert self.matches(index, {'doc_type': 'resume', 'content_type': {'$ne': 'text/plain'}}) == \
+               self.reference(lambda d: d['filename'] == 'alice.pdf')
+        assert self.matches(index, {'doc_type': 'contract'}) == []
+
+    def test_time_ranges(self, index):
+        """processed_at ranges; documents without a timestamp never match"""
+        october = {'processed_at': {'$gte': '2026-10-01', '$lt': '2026-11-01'}}
+        assert self.matches(index, october) == \
+               self.reference(lambda d: d.get('processed_at', '').startswith('2026-10'))
+        assert self.matches(index, {'doc_type': 'review', **october}) == \
+               self.reference(lambda d: d['doc_type'] == 'review')
+
+    def test_boolean_combinations(self, index):
+        """$or, $and and $not compose, and $not never selects padding bits"""
+        expression = {'$or': [{'doc_type': 'review'}, {'filename': 'handbook.txt'}]}
+        assert self.matches(index, expression) == \
+               self.reference(lambda d: d['doc_type'] in ('review', 'general'))
+        assert self.matches(index, {'$not': expression}) == \
+               self.reference(lambda d: d['doc_type'] == 'resume')
+        assert self.matches(index, {'$and': [{'doc_type': 'resume'}, {'content_type': 'text/plain'}]}) == \
+               self.reference(lambda d: d['filename'] == 'bob.txt')
+        assert len(index.evaluate({'$not': {'doc_type': 'resume'}})) == len(DOCUMENTS)
+
+    @pytest.mark.parametrize('expression', [
+        {'author': 'alice'},
+        {'doc_type': {'$gt': 'a'}},
+        {'processed_at': '2026-10-01'},
+        {'processed_at': {'$gte': 'last month'}},
+        {'$or': {'doc_type': 'resume'}},
+        {'doc_type': {'$in': 'resume'}},
+        {'doc_type': [['resume']]},
+    ])
+    def test_malformed_expressions(self, index, expression):
+        """Unknown fields, operators and values are rejected"""
+        with pytest.raises(ValueError):
+            index.evaluate(expression)
+
+    def test_bitmaps_are_packed(self, index):
+        """Each value keeps about one bit per document"""
+        stats = index.get_statistics()
+        assert stats['documents'] == len(DOCUMENTS)
+        assert stats['distinct_values']['doc_type'] == 3
+        assert all(bitmap.dtype == np.uint8 and bitmap.shape[0] <= 2
+                   for values in index._bitmaps.values() for bitmap in values.values())
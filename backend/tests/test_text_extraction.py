@@ -0,0 +1,62 @@
+"""
+Unit tests for Text Extraction Service
+Tests linear-time, capped and streamed PDF extraction
+"""
+
+import pytest
+from api.services.text_extraction import extract_pdf, iter_pdf_pages, pdf_page_count
+
+
+def make_pdf(page_texts):
+    """Minimal PDF with one line of Helvetica text per page"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in page_texts:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(kids)} >>"
+
+    out = b"%PDF-1.4\n"
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += f"{i} 0 obj\n{body}\nendobj\n".encode()
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += b"".join(f"{o:010d} 00000 n \n".encode() for o in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    return out
+
+
+PAGES = [f"Page {i} text" for i in range(10)]
+
+
+class TestPdfExtraction:
+    """Test suite for PDF extraction"""
+
+    def test_extract_all_pages(self):
+        pdf = make_pdf(PAGES)
+        assert pdf_page_count(pdf) == 10
+        assert extract_pdf(pdf) == "".join(page + "\n" for page in PAGES)
+
+    def test_page_and_character_caps(self):
+        pdf = make_pdf(PAGES)
+        assert extract_pdf(pdf, max_pages=2) == "Page 0 text\nPage 1 text\n"
+        assert extract_pdf(pdf, max_chars=15) == "Page 0 text\nPage\n"
+
+    @pytest.mark.asyncio
+    async def test_streamed_pages_stay_in_order(self, tmp_path):
+        """Page ranges parsed concurrently are still yielded in page order"""
+        path = tmp_path / "doc.pdf"
+        path.write_bytes(make_pdf(PAGES))
+
+        pages = [page async for page in iter_pdf_pages(str(path), pages_per_task=3, max_in_flight=2)]
+        assert pages == PAGES
+
+        capped = [page async for page in iter_pdf_pages(str(path), pages_per_task=3, max_pages=4, max_chars=30)]
+        assert "".join(capped) == "".join(PAGES)[:30]
+        assert len(capped) == 3
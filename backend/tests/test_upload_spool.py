@@ -0,0 +1,76 @@
+"""
+Unit tests for Upload Spool Service
+Tests chunked spooling, hashing and size enforcement
+"""
+
+import hashlib
+import io
+import os
+import pytest
+from api.services.text_extraction import extract_csv, extract_txt
+from api.services.upload_spool import FileTooLargeError, spool_upload
+
+
+class FakeUpload:
+    """Minimal async UploadFile stand-in"""
+
+    def __init__(self, filename, data, content_type='text/plain', size=None):
+        self.filename = filename
+        self.content_type = content_type
+        self.size = size
+        self._stream = io.BytesIO(data)
+        self.reads = []
+
+    async def read(self, n=-1):
+        chunk = self._stream.read(n)
+        self.reads.append(len(chunk))
+        return chunk
+
+
+class TestUploadSpool:
+    """Test suite for spool_upload"""
+
+    @pytest.mark.asyncio
+    async def test_spools_in_chunks_with_hash(self, tmp_path):
+        data = b"x" * 2500
+        upload = FakeUpload('a.txt', data)
+
+        spooled = await spool_upload(upload, str(tmp_path), max_bytes=10_000, chunk_size=1000)
+
+        assert max(upload.reads) == 1000
+        assert spooled.size == 2500
+        assert spooled.sha256 == hashlib.sha256(data).hexdigest()
+        with open(spooled.path, 'rb') as f:
+            assert f.read() == data
+        spooled.remove()
+        assert not os.path.exists(spooled.path)
+
+    @pytest.mark.asyncio
+    async def test_oversize_upload_is_rejected_early(self, tmp_path):
+        """Copying stops at the limit and leaves no partial file behind"""
+        upload = FakeUpload('big.txt', b"x" * 10_000)
+
+        with pytest.raises(FileTooLargeError):
+            await spool_upload(upload, str(tmp_path), max_bytes=2500, chunk_size=1000)
+
+        assert sum(upload.reads) <= 3000
+        assert os.listdir(tmp_path) == []
+
+    @pytest.mark.asyncio
+    async def test_declared_size_is_checked_before_reading(self, tmp_path):
+        upload = FakeUpload('big.txt', b"x", size=10_000)
+        with pytest.raises(FileTooLargeError):
+            await spool_upload(upload, str(tmp_path), max_bytes=100)
+        assert upload.reads == []
+
+    def test_parsers_read_spooled_paths(self, tmp_path):
+        text_path = tmp_path / "notes.txt"
+        text_path.write_bytes("café".encode('utf-8'))
+        csv_path = tmp_path / "people.csv"
+        csv_path.write_bytes(b"name,role\nAlice,Engineer\n")
+        empty_path = tmp_path / "empty.txt"
+        empty_path.write_bytes(b"")
+
+        assert extract_txt(str(text_path)) == "café"
+        assert extract_csv(str(csv_path)) == "name: Alice, role: Engineer"
+        assert extract_txt(str(empty_path)) == ""
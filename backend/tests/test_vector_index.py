@@ -0,0 +1,305 @@
+"""
+Unit tests for Vector Index Service
+Tests embedding storage, exact and approximate search backends
+"""
+
+import pytest
+import numpy as np
+from api.services.quantization import BinaryQuantizer, ProductQuantizer, ScalarQuantizer, popcount
+from api.services.vector_index import (
+    BinaryHashIndex, EmbeddingMatrix, HNSWIndex, Int8EmbeddingStore, IVFIndex, PQEmbeddingStore, normalize_rows, top_k_indices
+)
+
+
+def clustered_vectors(n, dim, clusters=8, noise=0.1, seed=0):
+    """Normalized vectors drawn around a handful of cluster centres"""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(size=(clusters, dim))
+    data = centres[rng.integers(0, clusters, size=n)] + noise * rng.normal(size=(n, dim))
+    return normalize_rows(data)
+
+
+class TestEmbeddingMatrix:
+    """Test suite for the contiguous embedding matrix"""
+
+    def test_append_normalizes_and_grows(self):
+        """Rows are L2-normalized and capacity grows past the initial size"""
+        matrix = EmbeddingMatrix(initial_capacity=2)
+        rng = np.random.default_rng(0)
+        rows = matrix.append(rng.normal(size=(5, 8)))
+
+        assert list(rows) == [0, 1, 2, 3, 4]
+        assert len(matrix) == 5
+        assert matrix.vectors.dtype == np.float32
+        assert np.allclose(np.linalg.norm(matrix.vectors, axis=1), 1.0, atol=1e-5)
+
+    def test_search_matches_brute_force(self):
+        """Vectorized top-k equals a full sort of cosine similarities"""
+        rng = np.random.default_rng(1)
+        data = rng.normal(size=(200, 16)).astype(np.float32)
+        query = rng.normal(size=16).astype(np.float32)
+
+        matrix = EmbeddingMatrix()
+        matrix.append(data)
+        rows, scores = matrix.search(query, top_k=10)
+
+        cosine = data @ query / (np.linalg.norm(data, axis=1) * np.linalg.norm(query))
+        expected = np.argsort(-cosine)[:10]
+        assert list(rows) == list(expected)
+        assert np.allclose(scores, cosine[expected], atol=1e-5)
+
+    def test_selective_mask_scores_only_visible_rows(self):
+        """A mask hiding most rows gives the same ranking as masking full scores"""
+        rng = np.random.default_rng(9)
+        matrix = EmbeddingMatrix()
+        matrix.append(rng.normal(size=(200, 16)))
+        query = rng.normal(size=16)
+        mask = np.zeros(200, dtype=bool)
+        mask[rng.choice(200, 8, replace=False)] = True
+
+        rows, scores = matrix.search(query, top_k=5, mask=mask)
+        masked = np.where(mask, matrix.vectors @ normalize_rows(query)[0], -np.inf)
+        assert list(rows) == list(top_k_indices(masked, 5))
+        assert np.allclose(scores, masked[rows])
+
+    def test_search_batch_matches_single_queries(self):
+        """Blocked matrix-matrix search equals per-query search"""
+        rng = np.random.default_rng(9)
+        matrix = EmbeddingMatrix()
+        matrix.append(rng.normal(size=(300, 16)))
+        queries = rng.normal(size=(10, 16))
+
+        rows, scores = matrix.search_batch(queries, top_k=7, block_size=4)
+        assert rows.shape == (10, 7)
+        for query, batch_rows, batch_scores in zip(queries, rows, scores):
+            single_rows, single_scores = matrix.search(query, 7)
+            assert list(batch_rows) == list(single_rows)
+            assert np.allclose(batch_scores, single_scores, atol=1e-5)
+
+    def test_zero_vector_scores_zero(self):
+        """Zero embeddings do not produce NaNs"""
+        matrix = EmbeddingMatrix()
+        matrix.append(np.zeros((1, 4)))
+        _, scores = matrix.search(np.ones(4), top_k=1)
+        assert scores[0] == 0.0
+
+    def test_top_k_indices_bounds(self):
+        """top_k larger than the corpus returns everything in order"""
+        scores = np.array([0.1, 0.9, 0.5], dtype=np.float32)
+        assert list(top_k_indices(scores, 10)) == [1, 2, 0]
+        assert list(top_k_indices(scores, 0)) == []
+
+
+class TestIVFIndex:
+    """Test suite for the inverted-file ANN index"""
+
+    def test_recall_against_exact(self):
+        """Probing a few cells recovers most exact neighbours"""
+        vectors = clustered_vectors(2000, 32, seed=2)
+        rng = np.random.default_rng(2)
+        index = IVFIndex(nlist=16, nprobe=4)
+        index.train(vectors)
+        index.add(vectors, range(len(vectors)))
+        assert len(index) == len(vectors)
+
+        hits = 0
+        for query in vectors[rng.choice(len(vectors), 20, replace=False)]:
+            exact = set(top_k_indices(vectors @ query, 10))
+            rows, _ = index.search(vectors, query, 10)
+            hits += len(exact & set(rows))
+        assert hits / 200 >= 0.9
+
+    def test_add_requires_training(self):
+        """Adding to an untrained index is an error"""
+        with pytest.raises(RuntimeError):
+            IVFIndex().add(np.ones((1, 4), dtype=np.float32), [0])
+
+
+class TestHNSWIndex:
+    """Test suite for the HNSW graph index"""
+
+    @pytest.fixture
+    def built(self):
+        """HNSW graph over random normalized vectors"""
+        rng = np.random.default_rng(3)
+        vectors = normalize_rows(rng.normal(size=(1000, 24)))
+        index = HNSWIndex(M=8, ef_construction=64, ef_search=64)
+        index.add(vectors, range(len(vectors)))
+        return index, vectors, rng
+
+    def test_recall_against_exact(self, built):
+        """Beam search recovers most exact neighbours"""
+        index, vectors, rng = built
+        assert len(index) == len(vectors)
+
+        hits = 0
+        for query in normalize_rows(rng.normal(size=(20, 24))):
+            exact = set(top_k_indices(vectors @ query, 10))
+            rows, scores = index.search(vectors, query, 10)
+            assert list(scores) == sorted(scores, reverse=True)
+            hits += len(exact & set(rows))
+        assert hits / 200 >= 0.9
+
+    def test_masked_rows_are_skipped(self):
+        """Rows hidden by the mask stay in the graph but are never returned"""
+        vectors = normalize_rows(np.random.default_rng(4).normal(size=(300, 24)))
+        index = HNSWIndex(M=8, ef_construction=32)
+        index.add(vectors, range(len(vectors)))
+        query = vectors[42]
+        rows, _ = index.search(vectors, query, 5)
+        assert rows[0] == 42
+
+        mask = np.ones(len(vectors), dtype=bool)
+        mask[rows[:3]] = False
+        rows_after, _ = index.search(vectors, query, 5, mask=mask)
+        assert not set(rows[:3]) & set(rows_after)
+        assert len(rows_after) == 5
+        assert len(index) == len(vectors)
+
+
+class TestBinaryHashIndex:
+    """Test suite for the sign-bit Hamming prefilter index"""
+
+    def test_codes_pack_sign_bits(self):
+        """One bit per dimension in uint64 words; Hamming distance counts differing signs"""
+        quantizer = BinaryQuantizer()
+        quantizer.train(np.zeros((1, 70), dtype=np.float32))
+        vectors = np.where(np.random.default_rng(5).random((2, 70)) > 0.5, 1.0, -1.0)
+        codes = quantizer.encode(vectors)
+        assert codes.dtype == np.uint64 and codes.shape == (2, 2)
+        assert quantizer.hamming(codes[0], codes)[1] == np.count_nonzero(vectors[0] != vectors[1])
+
+        words = np.random.default_rng(6).integers(0, 2 ** 63, size=100, dtype=np.uint64)
+        assert list(popcount(words)) == [bin(int(w)).count('1') for w in words]
+
+    def test_recall_against_exact(self):
+        """Re-ranking the Hamming shortlist recovers the exact neighbours"""
+        # Embeddings concentrate near a low-dimensional subspace
+        rng = np.random.default_rng(7)
+        vectors = normalize_rows(rng.normal(size=(2000, 16)) @ rng.normal(size=(16, 128)))
+        index = BinaryHashIndex(rerank_k=100, block_size=512)
+        index.train(vectors)
+        index.add(vectors, range(len(vectors)))
+        assert len(index) == len(vectors)
+        assert index.nbytes * 32 == vectors.nbytes
+
+        hits = 0
+        for query in vectors[rng.choice(len(vectors), 20, replace=False)]:
+            exact = set(top_k_indices(vectors @ query, 10))
+            rows, scores = index.search(vectors, query, 10)
+            assert list(scores) == sorted(scores, reverse=True)
+            hits += len(exact & set(rows))
+        assert hits / 200 >= 0.9
+
+    def test_masked_search(self):
+        """Hidden rows are never shortlisted"""
+        vectors = clustered_vectors(300, 32, seed=8)
+        index = BinaryHashIndex(rerank_k=20)
+        index.train(vectors)
+        index.add(vectors, range(len(vectors)))
+        mask = np.ones(len(vectors), dtype=bool)
+        mask[::2] = False
+        rows, _ = index.search(vectors, vectors[10], 5, mask=mask)
+        assert len(rows) == 5 and all(row % 2 == 1 for row in rows)
+
+
+class TestProductQuantization:
+    """Test suite for PQ codes and the PQ embedding store"""
+
+    def test_encode_decode_roundtrip(self):
+        """Reconstructions are much closer than the vectors are to each other"""
+        vectors = clustered_vectors(1000, 32, seed=5)
+        pq = ProductQuantizer(m=8)
+        pq.train(vectors)
+        codes = pq.encode(vectors)
+
+        assert codes.dtype == np.uint8 and codes.shape == (1000, 8)
+        error = np.linalg.norm(pq.decode(codes) - vectors, axis=1).mean()
+        assert error < 0.2
+
+    def test_adc_scores_match_decoded_inner_products(self):
+        """Lookup-table scores equal inner products with the reconstructions"""
+        vectors = clustered_vectors(500, 16, seed=6)
+        pq = ProductQuantizer(m=4)
+        pq.train(vectors)
+        codes = pq.encode(vectors)
+        query = vectors[0]
+
+        table = pq.inner_product_table(query)
+        assert np.allclose(pq.score(table, codes), pq.decode(codes) @ query, atol=1e-4)
+
+    def test_subspaces_must_divide_dimension(self):
+        """Incompatible subspace counts are rejected"""
+        with pytest.raises(ValueError):
+            ProductQuantizer(m=5).train(np.ones((10, 16), dtype=np.float32))
+
+    def test_store_compresses_and_keeps_recall(self):
+        """Codes replace float rows in memory; rescoring restores exact order"""
+        vectors = clustered_vectors(3000, 32, clusters=64, noise=0.3, seed=7)
+        store = PQEmbeddingStore(m=8, train_size=1000, rescore_k=50)
+        store.append(vectors[:500])
+        assert not store.is_trained
+
+        store.append(vectors[500:])
+        assert store.is_trained and len(store) == 3000
+        assert store.nbytes * 4 < vectors.nbytes
+
+        hits = 0
+        for query in vectors[:20]:
+            exact = top_k_indices(vectors @ query, 10)
+            rows, scores = store.search(query, 10)
+            assert np.allclose(scores, (vectors[rows] @ query), atol=1e-5)
+            hits += len(set(exact) & set(rows))
+        assert hits / 200 >= 0.9
+
+    def test_store_without_rescoring(self):
+        """With rescoring disabled no exact vectors are kept"""
+        vectors = clustered_vectors(600, 16, seed=8)
+        store = PQEmbeddingStore(m=4, train_size=300, rescore_k=0)
+        store.append(vectors)
+        rows, scores = store.search(vectors[3], 5)
+        assert store._exact is None
+        assert len(rows) == 5
+        assert list(scores) == sorted(scores, reverse=True)
+
+
+class TestScalarQuantization:
+    """Test suite for int8 codes and the int8 embedding store"""
+
+    def test_integer_scores_match_decoded_inner_products(self):
+        """Integer dot products estimate inner products with the reconstructions"""
+        vectors = clustered_vectors(500, 64, seed=9)
+        sq = ScalarQuantizer()
+        sq.train(vectors)
+        codes = sq.encode(vectors)
+
+        assert codes.dtype == np.int8 and codes.shape == (500, 64)
+        assert np.abs(sq.decode(codes) - vectors).max() <= sq.scales.max() / 2 + 1e-6
+        query = vectors[0]
+        assert np.allclose(sq.estimate(query, codes), sq.decode(codes) @ query, atol=1e-3)
+
+    def test_store_compresses_and_keeps_recall(self):
+        """Codes take a quarter of the float bytes; rescoring returns exact scores"""
+        vectors = clustered_vectors(3000, 32, clusters=64, noise=0.3, seed=10)
+        store = Int8EmbeddingStore(train_size=1000, rescore_k=50)
+        store.append(vectors)
+        assert store.is_trained and store.nbytes * 4 <= vectors.nbytes
+
+        hits = 0
+        for query in vectors[:20]:
+            exact = top_k_indices(vectors @ query, 10)
+            rows, scores = store.search(query, 10)
+            assert np.allclose(scores, (vectors[rows] @ query), atol=1e-5)
+            hits += len(set(exact) & set(rows))
+        assert hits / 200 >= 0.98
+
+    def test_masked_search(self):
+        """Hidden rows are never returned, with or without rescoring"""
+        vectors = clustered_vectors(400, 16, seed=11)
+        mask = np.arange(400) % 2 == 0
+        for rescore_k in (0, 20):
+            store = Int8EmbeddingStore(train_size=100, rescore_k=rescore_k)
+            store.append(vectors)
+            rows, _ = store.search(vectors[1], 10, mask=mask)
+            assert len(rows) == 10 and all(mask[rows])
+
@@ -0,0 +1,124 @@
+"""
+Unit tests for Vector Store Service
+Tests durable appends, reopening and sharing of the memory-mapped store
+"""
+
+import os
+import pytest
+import numpy as np
+from api.services.document_processor import DocumentProcessor
+from api.services.vector_store import MappedEmbeddingMatrix, PersistentVectorStore
+
+
+def make_chunks(doc_id, n):
+    return [{'doc_ord': 0, 'text': f"chunk {i} of {doc_id}", 'chunk_index': i} for i in range(n)]
+
+
+class TestPersistentVectorStore:
+    """Test suite for PersistentVectorStore"""
+
+    @pytest.fixture
+    def store_dir(self, tmp_path):
+        return str(tmp_path / "store")
+
+    def test_append_and_reopen(self, store_dir):
+        """Committed records and vectors survive reopening"""
+        rng = np.random.default_rng(0)
+        vectors = rng.normal(size=(3, 8))
+
+        store = PersistentVectorStore(store_dir)
+        store.append([{'id': 'a', 'filename': 'a.txt'}], make_chunks('a', 3), vectors)
+
+        reopened = PersistentVectorStore(store_dir)
+        assert len(reopened.documents) == 1
+        assert reopened.documents[0]['filename'] == 'a.txt'
+        assert [c.text for c in reopened.chunks] == [c['text'] for c in make_chunks('a', 3)]
+        assert isinstance(reopened.vectors, np.memmap)
+        expected = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+        assert np.allclose(reopened.vectors, expected, atol=1e-6)
+
+    def test_uncommitted_tail_is_invisible(self, store_dir):
+        """Bytes written without a metadata commit are ignored and later overwritten"""
+        store = PersistentVectorStore(store_dir)
+        store.append([{'id': 'a'}], make_chunks('a', 1), np.ones((1, 4)))
+
+        # Simulate a crash after the chunk data was written but before commit
+        store.chunks.write(make_chunks('b', 2))
+        reopened = PersistentVectorStore(store_dir)
+        assert len(reopened.chunks) == 1
+
+        reopened.append([{'id': 'c'}], make_chunks('c', 1), np.ones((1, 4)))
+        chunks = list(PersistentVectorStore(store_dir).chunks)
+        assert [c.text for c in chunks] == ['chunk 0 of a', 'chunk 0 of c']
+        assert [c.doc_ord for c in chunks] == [0, 1]
+
+    def test_refresh_sees_other_writers(self, store_dir):
+        """A second handle (e.g. another worker) picks up appends on refresh"""
+        writer = PersistentVectorStore(store_dir)
+        reader = PersistentVectorStore(store_dir)
+
+        writer.append([{'id': 'a'}], make_chunks('a', 2), np.ones((2, 4)))
+        assert len(reader.chunks) == 0
+        assert reader.refresh()
+        assert len(reader.chunks) == 2
+        assert not reader.refresh()
+
+    def test_delete_and_compact(self, store_dir):
+        """Deletions are durable; compaction renumbers survivors into a new file generation"""
+        store = PersistentVectorStore(store_dir)
+        for i, doc_id in enumerate('abc'):
+            store.append([{'id': doc_id}], make_chunks(doc_id, 2), np.full((2, 4), i + 1.0))
+        reader = PersistentVectorStore(store_dir)
+
+        store.delete(['b', 'missing'])
+        assert PersistentVectorStore(store_dir).deleted == {1}
+
+        store.compact(drop=['a'])
+        assert [d['id'] for d in store.documents] == ['c']
+        assert [c.doc_ord for c in store.chunks] == [0, 0]
+        assert store.generation == 1 and store.deleted == frozenset()
+        assert not os.path.exists(os.path.join(store_dir, 'embeddings.f32'))
+
+        # A reader still mapping generation 0 switches over on refresh
+        assert len(reader.chunks) == 6
+        assert reader.refresh()
+        assert reader.generation == 1 and len(reader.chunks) == 2
+        assert np.allclose(reader.vectors, 0.5)
+
+        # Reopening a compacted store does not recreate generation-0 files
+        reopened = PersistentVectorStore(store_dir)
+        assert reopened.generation == 1 and len(reopened.chunks) == 2
+        assert not {'embeddings.f32', 'chunks.dat', 'documents.idx'} & set(os.listdir(store_dir))
+
+    def test_dimension_mismatch(self, store_dir):
+        """All embeddings in a store share one dimension"""
+        store = PersistentVectorStore(store_dir)
+        store.append([{'id': 'a'}], make_chunks('a', 1), np.ones((1, 4)))
+        with pytest.raises(ValueError):
+            store.append([{'id': 'b'}], make_chunks('b', 1), np.ones((1, 5)))
+
+
+class TestDocumentProcessorPersistence:
+    """DocumentProcessor backed by a persistent store"""
+
+    @pytest.mark.asyncio
+    async def test_documents_survive_restart(self, tmp_path):
+        """A new processor on the same path serves previously ingested documents"""
+        path = str(tmp_path / "store")
+        processor = DocumentProcessor(store_path=path)
+        assert processor.store is None  # opened lazily
+
+        await processor.process_document('alice_resume.txt', b"Alice. Skills: Python and AWS.", 'text/plain')
+        assert isinstance(processor.segments[0].embeddings, MappedEmbeddingMatrix)
+
+        restarted = DocumentProcessor(store_path=path, index_type='hnsw', ann_min_size=1, segment_size=1)
+        results = await restarted.search_documents("python", top_k=1)
+        assert results[0]['doc_name'] == 'alice_resume.txt'
+
+        assert await restarted.merge_segments() == 1
+        assert len(restarted.segments[0].ann_index) == len(restarted.chunks)
+        assert (await restarted.search_documents("python", top_k=1)) == results
+
+    def test_store_requires_float_storage(self, tmp_path):
+        with pytest.raises(ValueError):
+            DocumentProcessor(store_path=str(tmp_path), storage='pq')